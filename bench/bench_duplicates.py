@@ -0,0 +1,135 @@
+"""
+Benchmark duplicate filtering in track_changes on synthetic snapshots.
+
+Run from the repository root:
+    python -m bench.bench_duplicates [--sizes 10000 50000 100000]
+
+Each size builds a previous snapshot of N offers and a current snapshot in
+which ~10% were removed, ~10% are new and half of the new ones are reposts
+(same building, price, floor and rooms under a new offer_id). The pairwise
+reference scan is only timed on the smaller sizes, where it finishes in
+reasonable time, and its output is checked against the indexed version.
+"""
+import argparse
+import contextlib
+import io
+import random
+import time
+
+from helpers import are_duplicate_offers, filter_duplicate_changes, track_changes
+
+
+def make_offer(offer_id, rng):
+    return {
+        "offer_id": str(offer_id),
+        "building_id": str(rng.randrange(5000)),
+        "price_numeric": rng.randrange(40, 200) * 1000,
+        "floor": rng.randrange(1, 25),
+        "rooms": rng.randrange(0, 5),
+        "price": "",
+        "metro": "",
+    }
+
+
+def make_snapshots(size, seed=0):
+    rng = random.Random(seed)
+    previous = [make_offer(i, rng) for i in range(size)]
+
+    removed = set(rng.sample(range(size), size // 10))
+    current = [offer for i, offer in enumerate(previous) if i not in removed]
+
+    next_id = size
+    removed_offers = [previous[i] for i in sorted(removed)]
+    for n in range(size // 10):
+        if n % 2 == 0 and removed_offers:
+            # Repost of a removed offer under a new id
+            offer = dict(rng.choice(removed_offers), offer_id=str(next_id))
+        else:
+            offer = make_offer(next_id, rng)
+        current.append(offer)
+        next_id += 1
+
+    return current, previous
+
+
+def pairwise_filter(new_changes, removed_changes, current_offers):
+    """The original O(new x current + removed x current) scan, as a reference"""
+    filtered_new, filtered_removed, removed_duplicates = [], [], set()
+    for new_change in new_changes:
+        new_offer = new_change["current_offer"]
+        is_duplicate = False
+        for i, removed_change in enumerate(removed_changes):
+            if i not in removed_duplicates and are_duplicate_offers(
+                new_offer, removed_change["previous_offer"]
+            ):
+                removed_duplicates.add(i)
+                is_duplicate = True
+                break
+        if not is_duplicate:
+            is_duplicate = any(
+                existing_id != new_offer["offer_id"]
+                and are_duplicate_offers(new_offer, existing)
+                for existing_id, existing in current_offers.items()
+            )
+        if not is_duplicate:
+            filtered_new.append(new_change)
+    for i, removed_change in enumerate(removed_changes):
+        if i in removed_duplicates:
+            continue
+        if not any(
+            are_duplicate_offers(removed_change["previous_offer"], current)
+            for current in current_offers.values()
+        ):
+            filtered_removed.append(removed_change)
+    return filtered_new, filtered_removed
+
+
+def split_changes(current, previous):
+    previous_offers = {o["offer_id"]: o for o in previous}
+    current_offers = {o["offer_id"]: o for o in current}
+    new = [{"current_offer": o} for k, o in current_offers.items() if k not in previous_offers]
+    removed = [{"previous_offer": o} for k, o in previous_offers.items() if k not in current_offers]
+    return new, removed, current_offers, previous_offers
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 10000, 25000, 50000, 100000]
+    )
+    ap.add_argument(
+        "--pairwise-limit",
+        type=int,
+        default=2000,
+        help="Largest size to also time the pairwise reference scan on",
+    )
+    args = ap.parse_args()
+
+    print(f"{'offers':>8} {'track_changes':>14} {'indexed filter':>15} {'pairwise filter':>16}")
+    for size in args.sizes:
+        current, previous = make_snapshots(size)
+        new, removed, current_offers, previous_offers = split_changes(current, previous)
+
+        track_time, _ = timed(track_changes, current, previous)
+        index_time, indexed = timed(
+            filter_duplicate_changes, new, removed, current_offers, previous_offers
+        )
+
+        pairwise_col = "skipped"
+        if size <= args.pairwise_limit:
+            pairwise_time, reference = timed(pairwise_filter, new, removed, current_offers)
+            assert indexed == reference, "indexed filter diverged from pairwise scan"
+            pairwise_col = f"{pairwise_time:.3f}s"
+
+        print(f"{size:>8} {track_time:>13.3f}s {index_time:>14.3f}s {pairwise_col:>16}")
+
+
+if __name__ == "__main__":
+    main()
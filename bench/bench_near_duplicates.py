@@ -0,0 +1,187 @@
+"""
+Benchmark repost detection with NearDuplicateIndex on synthetic offers.
+
+Run from the repository root:
+    python -m bench.bench_near_duplicates [--sizes 10000 50000] [--queries 1000]
+
+Each size fills a window of N offers whose descriptions are drawn from the
+vocabulary of data/current_data.json. A tenth of them reuse one of a few
+agent templates with a handful of words changed, but describe different
+flats, so only the structural check keeps them apart. Then `queries` new
+offers are looked up: half are reposts of a window offer (about 5% of the
+words edited, price within 5%), half are unrelated. Reported: time to fill
+the window (dominated by computing signatures), time per lookup, recall on
+reposts, false matches, and the growth of peak RSS while filling. Up to
+--reference-limit, every lookup is also done by a linear scan over all
+signatures, to show LSH finds the same originals.
+"""
+import argparse
+import json
+import random
+import resource
+import time
+
+from bench.listing_site import make_offer
+from near_duplicates import NearDuplicateIndex
+
+
+def load_vocabulary():
+    with open("data/current_data.json", "r", encoding="utf-8") as f:
+        offers = json.load(f)
+    return [word for offer in offers for word in (offer.get("description") or "").split()]
+
+
+def edit(text, rng, vocabulary, share=0.05):
+    """Replace, drop or insert about `share` of a text's words"""
+    words = text.split()
+    for _ in range(max(1, int(len(words) * share))):
+        i = rng.randrange(len(words))
+        roll = rng.random()
+        if roll < 0.5:
+            words[i] = rng.choice(vocabulary)
+        elif roll < 0.75 and len(words) > 10:
+            del words[i]
+        else:
+            words.insert(i, rng.choice(vocabulary))
+    return " ".join(words)
+
+
+def make_window(size, rng, vocabulary):
+    templates = [" ".join(rng.choices(vocabulary, k=rng.randrange(60, 150))) for _ in range(5)]
+    offers = []
+    for n in range(size):
+        offer = make_offer(n, rng)
+        if n % 10 == 0:
+            offer["description"] = edit(rng.choice(templates), rng, vocabulary, share=0.02)
+        else:
+            offer["description"] = " ".join(rng.choices(vocabulary, k=rng.randrange(40, 150)))
+        offers.append(offer)
+    return offers
+
+
+def make_queries(window, count, rng, vocabulary):
+    """[(offer, offer_id of its original or None)]"""
+    queries = []
+    for n in range(count):
+        offer_id = str(900_000_000 + n)
+        if n % 2 == 0:
+            original = rng.choice(window)
+            offer = dict(
+                original,
+                offer_id=offer_id,
+                description=edit(original["description"], rng, vocabulary),
+                price_numeric=int(original["price_numeric"] * rng.uniform(0.95, 1.05)),
+            )
+            queries.append((offer, original["offer_id"]))
+        else:
+            offer = make_offer(offer_id, rng)
+            offer["description"] = " ".join(rng.choices(vocabulary, k=rng.randrange(40, 150)))
+            queries.append((offer, None))
+    return queries
+
+
+def linear_find(index, offer, signature, signatures):
+    """index.find by comparing against every signature in the window"""
+    structure = (
+        offer.get("building_id"),
+        offer.get("rooms"),
+        offer.get("floor"),
+        offer.get("price_numeric"),
+    )
+    best = None
+    for other_id, other_structure, other_signature in signatures:
+        if not index._compatible(structure, other_structure):
+            continue
+        similarity = sum(x == y for x, y in zip(signature, other_signature)) / index.num_perm
+        if similarity >= index.threshold and (best is None or similarity > best[1]):
+            best = (other_id, similarity)
+    return best
+
+
+def run(size, args, vocabulary):
+    rng = random.Random(size)
+    window = make_window(size, rng, vocabulary)
+    queries = make_queries(window, args.queries, rng, vocabulary)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    index = NearDuplicateIndex({"file": ":memory:", "window": size + args.queries})
+    started = time.perf_counter()
+    for offer in window:
+        index.add(offer)
+    fill_seconds = time.perf_counter() - started
+    rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+
+    for offer, _ in queries:
+        index.add(offer)
+    started = time.perf_counter()
+    found = [index.find(offer) for offer, _ in queries]
+    lookup_seconds = time.perf_counter() - started
+
+    reposts = [(match, original) for match, (_, original) in zip(found, queries) if original]
+    recall = sum(match is not None and match[0] == original for match, original in reposts)
+    false_matches = sum(
+        match is not None for match, (_, original) in zip(found, queries) if original is None
+    )
+
+    result = {
+        "size": size,
+        "fill_s": fill_seconds,
+        "lookup_ms": lookup_seconds / len(queries) * 1000,
+        "recall": recall / len(reposts),
+        "false_matches": false_matches,
+        "rss_mb": rss_growth / 1024,
+    }
+
+    if size <= args.reference_limit:
+        # Signatures are computed up front, so only the comparisons are timed
+        query_signatures = [index.signature(offer["description"]) for offer, _ in queries]
+        signatures = [
+            (
+                offer["offer_id"],
+                (offer["building_id"], offer["rooms"], offer["floor"], offer["price_numeric"]),
+                index.signature(offer["description"]),
+            )
+            for offer in window
+        ]
+        started = time.perf_counter()
+        agree = sum(
+            linear_find(index, offer, signature, signatures) == match
+            for (offer, _), signature, match in zip(queries, query_signatures, found)
+        )
+        result["linear_ms"] = (time.perf_counter() - started) / len(queries) * 1000
+        result["agreement"] = agree / len(queries)
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000])
+    ap.add_argument("--queries", type=int, default=1000)
+    ap.add_argument(
+        "--reference-limit",
+        type=int,
+        default=10000,
+        help="Largest window also searched linearly",
+    )
+    args = ap.parse_args()
+    vocabulary = load_vocabulary()
+
+    print(
+        f"{'window':>7} {'fill':>8} {'lookup':>10} {'linear':>10} {'agree':>6} "
+        f"{'recall':>7} {'false':>6} {'RSS':>9}"
+    )
+    for size in args.sizes:
+        result = run(size, args, vocabulary)
+        linear = f"{result['linear_ms']:.2f}ms" if "linear_ms" in result else "-"
+        agreement = f"{result['agreement']:.0%}" if "agreement" in result else "-"
+        print(
+            f"{size:>7} {result['fill_s']:>7.1f}s {result['lookup_ms']:>8.2f}ms {linear:>10} "
+            f"{agreement:>6} {result['recall']:>7.1%} {result['false_matches']:>6} "
+            f"{result['rss_mb']:>7.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Memory held by a snapshot as plain dicts versus Offer objects.
+
+Run from the repository root:
+    python -m bench.bench_offer_memory [--size 50000]
+
+A synthetic snapshot is written to JSON and loaded back both ways, so every
+string is a separate object as after a real json.load: once as dicts, once
+with offer_hook into Offers. tracemalloc reports what stays allocated and
+the peak while loading; the round trip through to_dict() is checked to be
+loss-free.
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from bench.bench_pipeline import make_snapshots
+from offer import json_default, offer_hook
+
+
+def measure(load):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    snapshot = load()
+    seconds = time.perf_counter() - started
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return snapshot, held, peak, seconds
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--size", type=int, default=50000)
+    args = ap.parse_args()
+
+    _, previous = make_snapshots(args.size)
+    text = json.dumps(previous, ensure_ascii=False)
+    del previous
+
+    dicts, dict_held, dict_peak, dict_seconds = measure(lambda: json.loads(text))
+    offers, offer_held, offer_peak, offer_seconds = measure(
+        lambda: json.loads(text, object_hook=offer_hook)
+    )
+    assert json.dumps(offers, ensure_ascii=False, default=json_default) == text
+
+    mb = 1024 * 1024
+    print(f"{args.size} offers, {len(text) / mb:.1f} MB of JSON")
+    print(f"{'':>8} {'held':>10} {'per offer':>10} {'load peak':>10} {'load time':>10}")
+    for name, held, peak, seconds in (
+        ("dict", dict_held, dict_peak, dict_seconds),
+        ("Offer", offer_held, offer_peak, offer_seconds),
+    ):
+        print(
+            f"{name:>8} {held / mb:>8.1f}MB {held / args.size:>9.0f}B "
+            f"{peak / mb:>8.1f}MB {seconds:>9.3f}s"
+        )
+    print(f"Offers hold {1 - offer_held / dict_held:.0%} less memory than dicts")
+    del dicts, offers
+
+
+if __name__ == "__main__":
+    main()
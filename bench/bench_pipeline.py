@@ -0,0 +1,326 @@
+"""
+Offline end-to-end benchmark of scraping, change tracking and notifying.
+
+Run from the repository root:
+    python -m bench.bench_pipeline [--sizes 100 1000 10000] [--compare FILE]
+
+Three stages are measured at each size:
+  scrape    parse_with_auto_pagination against bench.listing_site, a local
+            stand-in serving generated result pages (needs Chromium)
+  track     track_changes between two generated snapshots (~10% removed,
+            ~10% new, ~5% repriced)
+  telegram  TelegramBot.send_tracking_updates_async for those changes
+            against bench.telegram_stub, which answers some sends with 429
+
+Each (stage, size) runs in its own process so peak RSS is per stage (it is
+the Python process only; Chromium's own processes are not counted).
+Results are written to bench/results/pipeline-<timestamp>.json; pass an
+earlier file as --compare to flag stages that got slower by more than
+--tolerance, in which case the exit status is 1.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import yaml
+
+from bench.listing_site import ListingSite, make_listing, make_offer
+from bench.telegram_stub import TelegramStub
+from helpers import normalize_offer_data, track_changes
+from telegram_bot import TelegramBot
+
+STAGES = ("scrape", "track", "telegram")
+RESULTS_DIR = os.path.join("bench", "results")
+# Slowdowns smaller than this many seconds are noise, whatever the ratio
+MIN_SLOWDOWN = 0.01
+
+
+def scraped_form(offer):
+    """A generated offer as primary_script returns it, for the track stage"""
+    address = ["Москва", "ЦАО", offer["sub_district"], f"м. {offer['metro']}"]
+    address += [offer["street"], offer["building"]]
+    price_info = [
+        "От года",
+        "комм. платежи включены (без счётчиков)",
+        offer["commission"],
+        offer["deposit"],
+    ]
+    return {
+        "offer_id": offer["offer_id"],
+        "price_numeric": offer["price_numeric"],
+        "time_label": offer["time_label"],
+        "title": f"{offer['rooms']}-комн. квартира, {offer['area']} м², "
+        f"{offer['floor']}/{offer['total_floors']} этаж",
+        "metro": f"м. {offer['metro']}",
+        "metro_id": offer["metro_id"],
+        "city": "Москва",
+        "city_id": "1",
+        "district": "ЦАО",
+        "district_id": "4",
+        "sub_district": offer["sub_district"],
+        "sub_district_id": offer["sub_district_id"],
+        "street": offer["street"],
+        "street_id": offer["street_id"],
+        "building": offer["building"],
+        "building_id": offer["building_id"],
+        "full_address": ", ".join(address),
+        "rental_period": price_info[0],
+        "utilities": price_info[1],
+        "commission": offer["commission"],
+        "deposit": offer["deposit"],
+        "description": offer["description"],
+        "price_info": ", ".join(price_info),
+        "price": f"{offer['price_numeric']:,} ₽/мес.".replace(",", " "),
+    }
+
+
+def make_snapshots(size, seed=0):
+    """(current, previous) normalized snapshots of `size` offers"""
+    rng = random.Random(seed)
+    previous = [scraped_form(offer) for offer in make_listing(size, seed)]
+    current = []
+    for offer in previous:
+        roll = rng.random()
+        if roll < 0.10:
+            continue  # removed
+        if roll < 0.15:
+            offer = dict(offer, price_numeric=offer["price_numeric"] + 5000)
+        current.append(offer)
+    for n in range(size // 10):
+        current.insert(0, scraped_form(make_offer(900_000_000 + n, rng)))
+    return normalize_offer_data(current), normalize_offer_data(previous)
+
+
+async def bench_scrape(size, args):
+    # Imported here so the other stages run without Playwright installed
+    from parser import parse_with_auto_pagination
+
+    with open("configs/config_browser.yaml", "r") as f:
+        browser_config = yaml.safe_load(f)
+    with open("configs/config_scripts.yaml", "r") as f:
+        scripts = yaml.safe_load(f)
+    browser_config["concurrency"] = args.concurrency
+    browser_config["extraction"] = "dom"
+
+    with ListingSite(make_listing(size), latency=args.latency) as site:
+        started = time.perf_counter()
+        offers = await parse_with_auto_pagination(
+            site.search_url(), browser_config, scripts, max_pages=site.pages + 1
+        )
+        seconds = time.perf_counter() - started
+        pages = site.requests
+
+    if len(offers) != size:
+        raise RuntimeError(f"scraped {len(offers)} offers out of {size}")
+    return {"seconds": seconds, "pages": pages, "pages_per_s": pages / seconds}
+
+
+def bench_track(size, args):
+    current, previous = make_snapshots(size)
+    best = None
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        changes = track_changes(current, previous)
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    return {"seconds": best, "changes": len(changes)}
+
+
+async def bench_telegram(size, args):
+    changes = track_changes(*make_snapshots(size))
+    with tempfile.TemporaryDirectory() as tmp_dir, TelegramStub(
+        latency=args.telegram_latency, flood_every=args.flood_every, retry_after=1
+    ) as stub:
+        bot = TelegramBot(
+            {
+                "token": "bench",
+                "chat_ids": [str(1000 + i) for i in range(args.chats)],
+                "api_url": stub.api_url,
+                "per_chat_rate": args.telegram_rate,
+                "global_rate": args.telegram_rate * args.chats,
+                "max_retries": 5,
+                "retry_delay": 0.1,
+                "message_log_file": os.path.join(tmp_dir, "telegram_messages.jsonl"),
+                "message_log_fsync": "never",
+            }
+        )
+        started = time.perf_counter()
+        await bot.send_tracking_updates_async(changes)
+        seconds = time.perf_counter() - started
+
+    return {
+        "seconds": seconds,
+        "changes": len(changes),
+        "messages": stub.delivered,
+        "messages_per_s": stub.delivered / seconds,
+        "flooded": stub.flooded,
+    }
+
+
+def run_worker(stage, size, args):
+    """Run one stage in this process and print its result as one JSON line"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        if stage == "scrape":
+            result = asyncio.run(bench_scrape(size, args))
+        elif stage == "track":
+            result = bench_track(size, args)
+        else:
+            result = asyncio.run(bench_telegram(size, args))
+    result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps(result))
+
+
+def run_stage(stage, size, args):
+    command = [sys.executable, "-m", "bench.bench_pipeline", "--worker", stage, str(size)]
+    for option in (
+        "latency",
+        "concurrency",
+        "chats",
+        "telegram_rate",
+        "telegram_latency",
+        "flood_every",
+        "repeat",
+    ):
+        command += [f"--{option.replace('_', '-')}", str(getattr(args, option))]
+    proc = subprocess.run(command, capture_output=True, text=True)
+    result = {"stage": stage, "offers": size}
+    if proc.returncode != 0:
+        errors = [
+            line for line in proc.stderr.splitlines() if "Error" in line or "Exception" in line
+        ]
+        result["skipped"] = (errors or ["unknown error"])[-1].strip()[:200]
+    else:
+        result.update(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        return None
+
+
+def format_row(result):
+    if "skipped" in result:
+        return f"{result['stage']:>9} {result['offers']:>7}  skipped: {result['skipped']}"
+    rate = ""
+    if "pages_per_s" in result:
+        rate = f"{result['pages_per_s']:.1f} pages/s"
+    elif "messages_per_s" in result:
+        rate = f"{result['messages_per_s']:.1f} msgs/s"
+    return (
+        f"{result['stage']:>9} {result['offers']:>7} {result['seconds']:>9.3f}s "
+        f"{rate:>16} {result['peak_rss_mb']:>9.1f}"
+    )
+
+
+def compare(results, baseline_file, tolerance):
+    """Print the change against a baseline file, return the regressed stages"""
+    with open(baseline_file, "r", encoding="utf-8") as f:
+        baseline = {
+            (r["stage"], r["offers"]): r for r in json.load(f)["results"] if "skipped" not in r
+        }
+
+    print(f"\nCompared with {baseline_file}:")
+    regressions = []
+    for result in results:
+        before = baseline.get((result["stage"], result["offers"]))
+        if before is None or "skipped" in result:
+            continue
+        change = result["seconds"] / before["seconds"] - 1
+        rss_change = result["peak_rss_mb"] - before["peak_rss_mb"]
+        flag = ""
+        if change > tolerance and result["seconds"] - before["seconds"] > MIN_SLOWDOWN:
+            flag = "  <-- REGRESSION"
+            regressions.append(result)
+        print(
+            f"{result['stage']:>9} {result['offers']:>7} {change:>+8.1%} time "
+            f"{rss_change:>+8.1f} MB peak RSS{flag}"
+        )
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    ap.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    ap.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    ap.add_argument("--latency", type=float, default=0.05, help="Listing site latency, s")
+    ap.add_argument("--concurrency", type=int, default=4, help="Pages fetched in parallel")
+    ap.add_argument("--chats", type=int, default=2, help="Chats every change is sent to")
+    ap.add_argument(
+        "--telegram-rate",
+        type=float,
+        default=1000,
+        help="Messages per second per chat (Telegram's real limit is 1, "
+        "which would only measure sleeping)",
+    )
+    ap.add_argument("--telegram-latency", type=float, default=0.01, help="Stub latency, s")
+    ap.add_argument(
+        "--flood-every", type=int, default=100, help="Answer every n-th send with 429"
+    )
+    ap.add_argument(
+        "--repeat", type=int, default=5, help="Best of this many track_changes runs"
+    )
+    ap.add_argument("--output", help="Results file (default: bench/results/pipeline-<time>.json)")
+    ap.add_argument("--compare", help="Earlier results file to compare against")
+    ap.add_argument(
+        "--tolerance", type=float, default=0.2, help="Allowed slowdown before flagging"
+    )
+    ap.add_argument("--worker", nargs=2, metavar=("STAGE", "SIZE"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        run_worker(args.worker[0], int(args.worker[1]), args)
+        return
+
+    print(f"{'stage':>9} {'offers':>7} {'time':>10} {'throughput':>16} {'RSS (MB)':>9}")
+    results = []
+    for size in args.sizes:
+        for stage in args.stages:
+            result = run_stage(stage, size, args)
+            print(format_row(result))
+            results.append(result)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"pipeline-{datetime.now().strftime('%Y%m%dT%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "created_at": datetime.now().isoformat(),
+                "commit": git_commit(),
+                "python": sys.version.split()[0],
+                "settings": {
+                    key: value
+                    for key, value in vars(args).items()
+                    if key not in ("output", "compare", "worker")
+                },
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"\n💾 Results written to {output}")
+
+    if args.compare and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
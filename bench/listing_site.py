@@ -0,0 +1,187 @@
+"""
+A local stand-in for the listing site, serving generated search results.
+
+Pages carry the markup primary_script and wait_for_function in
+configs/config_scripts.yaml read (`[data-name="Offers"]
+[data-name="CardComponent"]` cards with MainPrice, PriceInfo, TimeLabel,
+OfferTitle, GeoLabel and Description), `PER_PAGE` cards each, paginated
+with `&p=`. Like the real site, a page number past the end serves the last
+page again, so pagination stops on a page with nothing new.
+
+    with ListingSite(make_listing(1000), latency=0.05) as site:
+        url = site.search_url()
+"""
+import random
+import threading
+import time
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+PER_PAGE = 28
+
+METROS = [("46", "Киевская"), ("100", "Парк культуры"), ("112", "Фрунзенская"), ("236", "Смоленская")]
+SUB_DISTRICTS = [("21", "р-н Хамовники"), ("13", "р-н Арбат"), ("22", "р-н Якиманка")]
+STREETS = [("1836", "улица Плющиха"), ("685", "Бережковская набережная"), ("2306", "Украинский бульвар")]
+COMMISSIONS = ["без комиссии", "комиссия 50%", "комиссия 60%", "комиссия 100%"]
+DESCRIPTION_WORDS = (
+    "Сдаётся квартира в шаговой доступности от метро рядом школы детские сады "
+    "парк магазины евроремонт мебель техника кондиционер холодильник лоджия "
+    "тихий двор консьерж парковка длительный срок без животных"
+).split()
+
+
+def format_rubles(amount):
+    return f"{amount:,}".replace(",", " ")
+
+
+def make_offer(offer_id, rng):
+    """A generated offer, as the fields the page is rendered from"""
+    rooms = rng.choice([0, 1, 1, 2, 2, 3, 4])
+    total_floors = rng.randrange(5, 25)
+    metro_id, metro = rng.choice(METROS)
+    sub_district_id, sub_district = rng.choice(SUB_DISTRICTS)
+    street_id, street = rng.choice(STREETS)
+    price = rng.randrange(40, 300) * 1000
+    return {
+        "offer_id": str(offer_id),
+        "price_numeric": price,
+        "rooms": rooms,
+        "area": rng.randrange(20, 150),
+        "floor": rng.randrange(1, total_floors + 1),
+        "total_floors": total_floors,
+        "time_label": f"сегодня, {rng.randrange(24):02d}:{rng.randrange(60):02d}",
+        "metro_id": metro_id,
+        "metro": metro,
+        "sub_district_id": sub_district_id,
+        "sub_district": sub_district,
+        "street_id": street_id,
+        "street": street,
+        "building_id": str(rng.randrange(10000, 99999)),
+        "building": str(rng.randrange(1, 80)),
+        "commission": rng.choice(COMMISSIONS),
+        "deposit": f"залог {format_rubles(price)} ₽",
+        "description": " ".join(rng.choices(DESCRIPTION_WORDS, k=rng.randrange(30, 120))),
+    }
+
+
+def make_listing(size, seed=0):
+    """`size` generated offers, newest first"""
+    rng = random.Random(seed)
+    return [make_offer(300_000_000 + i, rng) for i in range(size)]
+
+
+def render_card(offer):
+    rooms = "Студия" if offer["rooms"] == 0 else f"{offer['rooms']}-комн. квартира"
+    title = f"{rooms}, {offer['area']} м², {offer['floor']}/{offer['total_floors']} этаж"
+    price_info = (
+        f"От года, комм. платежи включены (без счётчиков), "
+        f"{offer['commission']}, {offer['deposit']}"
+    )
+    geo = [
+        ("/cat.php?region=1", "Москва"),
+        ("/cat.php?district%5B0%5D=4", "ЦАО"),
+        (f"/cat.php?district%5B0%5D={offer['sub_district_id']}", offer["sub_district"]),
+        (f"/cat.php?metro%5B0%5D={offer['metro_id']}", f"м. {offer['metro']}"),
+        (f"/cat.php?street%5B0%5D={offer['street_id']}", offer["street"]),
+        (f"/dom/moskva-{offer['building_id']}/", offer["building"]),
+    ]
+    geo_labels = "".join(
+        f'<a data-name="GeoLabel" href="{escape(href)}">{escape(text)}</a>'
+        for href, text in geo
+    )
+    return (
+        '<article data-name="CardComponent">'
+        f'<a href="/rent/flat/{offer["offer_id"]}/">'
+        f'<span data-mark="OfferTitle"><span>{escape(title)}</span></span></a>'
+        f'<span data-mark="MainPrice"><span>{format_rubles(offer["price_numeric"])} ₽/мес.</span></span>'
+        f'<p data-mark="PriceInfo">{escape(price_info)}</p>'
+        f'<div data-name="GeneralInfoSectionRowComponent">{geo_labels}</div>'
+        f'<div data-name="Description"><p>{escape(offer["description"])}</p></div>'
+        '<div data-name="TimeLabel"><div class="_93444fe79c--absolute--yut0v">'
+        f'<span>{offer["time_label"]}</span></div></div>'
+        "</article>"
+    )
+
+
+def render_page(offers):
+    cards = "".join(render_card(offer) for offer in offers)
+    return (
+        '<!DOCTYPE html><html lang="ru"><head><meta charset="utf-8">'
+        "<title>Снять квартиру</title></head><body>"
+        f'<div data-name="Offers">{cards}</div></body></html>'
+    )
+
+
+class ListingSite:
+    """Threaded HTTP server on 127.0.0.1 serving `offers` as search results
+
+    `latency` seconds are slept before every response. `requests` counts
+    the search pages served.
+    """
+
+    def __init__(self, offers, latency=0.0, per_page=PER_PAGE):
+        self.offers = offers
+        self.latency = latency
+        self.per_page = per_page
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def search_url(self):
+        """A search URL in the shape construct_search_url builds"""
+        return (
+            f"{self.base_url}/cat.php?currency=2&engine_version=2&type=4"
+            "&deal_type=rent&sort=creation_date_desc&maxprice=300000"
+        )
+
+    @property
+    def pages(self):
+        return max(1, -(-len(self.offers) // self.per_page))
+
+    def page_offers(self, page_num):
+        page_num = min(max(page_num, 1), self.pages)
+        start = (page_num - 1) * self.per_page
+        return self.offers[start : start + self.per_page]
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path != "/cat.php":
+                    self.send_error(404)
+                    return
+                if site.latency:
+                    time.sleep(site.latency)
+                page_num = int(parse_qs(url.query).get("p", ["1"])[0])
+                body = render_page(site.page_offers(page_num)).encode("utf-8")
+                with site._lock:
+                    site.requests += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
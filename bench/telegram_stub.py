@@ -0,0 +1,125 @@
+"""
+A local stand-in for api.telegram.org answering sendMessage and
+editMessageText.
+
+Every `flood_every`-th request is refused with 429 and
+`parameters.retry_after`, the way Telegram's flood control answers;
+chats in `blocked` get 403 as if they had blocked the bot; everything else
+succeeds with an increasing message_id. Edits of a message the stub did
+not send to that chat fail with 400. Point TelegramBot
+at it with `api_url`:
+
+    with TelegramStub(flood_every=50, retry_after=1) as stub:
+        bot = TelegramBot({..., "api_url": stub.api_url})
+"""
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class TelegramStub:
+    def __init__(self, latency=0.0, flood_every=0, retry_after=1, blocked=()):
+        self.latency = latency
+        self.flood_every = flood_every
+        self.retry_after = retry_after
+        self.blocked = {str(chat_id) for chat_id in blocked}
+        self.sent_to = []
+        self.messages = {}  # message_id -> chat_id, text, reply_to
+        self.edited = 0
+        self.received = 0
+        self.delivered = 0
+        self.flooded = 0
+        self.flooded_at = []  # time.monotonic() of each 429
+        self.received_at = []  # time.monotonic() of every request
+        self._message_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def api_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def _answer(self, method, form):
+        """(status, payload) for the next sendMessage or editMessageText"""
+        chat_id = form.get("chat_id")
+        with self._lock:
+            self.received += 1
+            self.received_at.append(time.monotonic())
+            if chat_id in self.blocked:
+                return 403, {
+                    "ok": False,
+                    "error_code": 403,
+                    "description": "Forbidden: bot was blocked by the user",
+                }
+            if self.flood_every and self.received % self.flood_every == 0:
+                self.flooded += 1
+                self.flooded_at.append(self.received_at[-1])
+                return 429, {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                }
+            if method == "editMessageText":
+                message_id = int(form["message_id"])
+                message = self.messages.get(message_id)
+                if message is None or message["chat_id"] != chat_id:
+                    return 400, {
+                        "ok": False,
+                        "error_code": 400,
+                        "description": "Bad Request: message to edit not found",
+                    }
+                message["text"] = form.get("text")
+                self.edited += 1
+                return 200, {"ok": True, "result": {"message_id": message_id}}
+            message_id = next(self._message_ids)
+            reply_to = None
+            if "reply_parameters" in form:
+                reply_to = json.loads(form["reply_parameters"])["message_id"]
+            self.messages[message_id] = {
+                "chat_id": chat_id,
+                "text": form.get("text"),
+                "reply_to": reply_to,
+            }
+            self.delivered += 1
+            self.sent_to.append(chat_id)
+            return 200, {"ok": True, "result": {"message_id": message_id}}
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                form = {k: v[0] for k, v in parse_qs(body.decode("utf-8")).items()}
+                method = self.path.rsplit("/", 1)[-1]
+                if method not in ("sendMessage", "editMessageText"):
+                    self.send_error(404)
+                    return
+                if stub.latency:
+                    time.sleep(stub.latency)
+                status, payload = stub._answer(method, form)
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,47 @@
+import json
+import os
+from datetime import datetime
+
+
+class BlockedChats:
+    """Chats that blocked the bot, kept across runs in a JSON file
+
+    Telegram answers 403 to every message for a chat that blocked the bot
+    until the user unblocks it and presses /start, so senders skip these
+    chats instead of spending requests and retries on them. Delete an entry
+    (or run reintroduce.py --include-blocked) once a user has unblocked.
+    """
+
+    def __init__(self, path="data/blocked_chats.json"):
+        self.path = path
+        self.chats = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.chats = json.load(f)
+            except json.JSONDecodeError:
+                print(f"⚠️  Blocked chats file {path} is unreadable, starting empty")
+
+    def __contains__(self, chat_id):
+        return str(chat_id) in self.chats
+
+    def __len__(self):
+        return len(self.chats)
+
+    def add(self, chat_id, reason):
+        self.chats[str(chat_id)] = {
+            "blocked_at": datetime.now().isoformat(),
+            "reason": reason,
+        }
+        self._save()
+
+    def discard(self, chat_id):
+        if self.chats.pop(str(chat_id), None) is not None:
+            self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.chats, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,66 @@
+import os
+import shutil
+import time
+
+PROFILE_MARKER = ".last_used"
+
+
+class BrowserSession:
+    """Cookies, localStorage and HTTP cache carried from one run to the next
+
+    state_file is Playwright's storage state (cookies and localStorage),
+    restored into every new context and saved after each successful run,
+    so consent banners and anti-bot checks are not redone on every run.
+    profile_dir, if set, is a persistent Chromium profile instead: it also
+    keeps the disk cache, capped at max_cache_mb, unless resource blocking
+    is on (Playwright disables the HTTP cache for routed contexts, so the
+    profile then keeps cookies and localStorage only). Either one is dropped
+    when it was last used more than max_age_hours ago, which also gives a
+    session that got flagged a way to expire.
+    """
+
+    def __init__(self, config):
+        self.state_file = config.get("state_file")
+        self.profile_dir = config.get("profile_dir")
+        self.max_age = config.get("max_age_hours", 24) * 3600
+        self.max_cache_mb = config.get("max_cache_mb", 100)
+
+    def _expired(self, path):
+        return time.time() - os.path.getmtime(path) > self.max_age
+
+    def storage_state(self):
+        """Path of a storage state to restore, None if missing or expired"""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return None
+        if self._expired(self.state_file):
+            print(f"🧹 Browser state {self.state_file} expired, starting fresh")
+            os.remove(self.state_file)
+            return None
+        return self.state_file
+
+    def prepare_profile(self):
+        """The profile directory to launch with, wiped first if expired"""
+        marker = os.path.join(self.profile_dir, PROFILE_MARKER)
+        if os.path.exists(marker) and self._expired(marker):
+            print(f"🧹 Browser profile {self.profile_dir} expired, starting fresh")
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+        os.makedirs(self.profile_dir, exist_ok=True)
+        return self.profile_dir
+
+    def cache_args(self):
+        """Chromium switches capping the profile's disk cache"""
+        return [f"--disk-cache-size={self.max_cache_mb * 1024 * 1024}"]
+
+    async def save(self, context):
+        """Remember the session of a run that went well"""
+        try:
+            if self.state_file:
+                os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+                tmp_file = f"{self.state_file}.tmp"
+                await context.storage_state(path=tmp_file)
+                os.replace(tmp_file, self.state_file)
+            if self.profile_dir:
+                with open(os.path.join(self.profile_dir, PROFILE_MARKER), "w") as f:
+                    f.write(time.strftime("%Y-%m-%dT%H:%M:%S"))
+        except Exception as e:
+            print(f"⚠️  Failed to save browser session: {e}")
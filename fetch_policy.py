@@ -0,0 +1,136 @@
+import json
+import math
+import os
+import random
+import time
+from collections import deque
+
+OPERATIONS = ("goto", "wait_for_function")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of fetching while the circuit breaker is open"""
+
+
+class IncompleteScrape(Exception):
+    """A page failed after earlier pages were scraped
+
+    offers holds what the earlier pages found. The crawl did not see the
+    whole result list, so it cannot tell which offers were removed.
+    """
+
+    def __init__(self, offers, page_num, error):
+        super().__init__(f"page {page_num} failed: {error}")
+        self.offers = offers
+        self.page_num = page_num
+        self.error = error
+
+
+class FetchPolicy:
+    """Timeouts, retries and a circuit breaker for the page loads of a run
+
+    The durations of successful goto and wait_for_function calls are kept
+    in a rolling window of the last `window` samples (carried across runs
+    in state_file). Once min_samples are in, an operation's timeout is
+    `multiplier` times its `percentile` latency, kept between
+    min_timeout_ms and max_timeout_ms and doubled on each retry; until
+    then the static `timeouts` of config_browser.yaml apply. A failed page
+    is retried up to max_attempts times after a random delay of up to
+    backoff_base * 2**attempt seconds (full jitter, capped at backoff_max).
+    After failure_threshold failures in a row the circuit opens and
+    fetches fail at once for cooldown_seconds; after that fetches go
+    through again, and the next outcome closes or reopens the circuit.
+    """
+
+    def __init__(self, config, timeouts):
+        self.defaults = {
+            "goto": timeouts["wait_until"],
+            "wait_for_function": timeouts["wait_for_function"],
+        }
+        self.percentile = config.get("percentile", 95)
+        self.multiplier = config.get("multiplier", 3)
+        self.min_samples = config.get("min_samples", 10)
+        self.min_timeout = config.get("min_timeout_ms", 5000)
+        self.max_timeout = config.get("max_timeout_ms", 60000)
+        self.max_attempts = config.get("max_attempts", 3)
+        self.backoff_base = config.get("backoff_base", 1.0)
+        self.backoff_max = config.get("backoff_max", 30.0)
+        self.failure_threshold = config.get("failure_threshold", 5)
+        self.cooldown = config.get("cooldown_seconds", 60)
+        self.state_file = config.get("state_file")
+        self.rng = random.Random(config.get("seed"))
+
+        window = config.get("window", 200)
+        self.samples = {op: deque(maxlen=window) for op in OPERATIONS}
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+        if self.state_file and os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+                for op in OPERATIONS:
+                    self.samples[op].extend(state.get(op, []))
+            except json.JSONDecodeError:
+                pass
+
+    def observe(self, op, seconds):
+        """Record the duration of a successful operation"""
+        self.samples[op].append(round(seconds * 1000))
+
+    def latency(self, op):
+        """The op's `percentile` latency in ms, None until min_samples"""
+        samples = self.samples[op]
+        if len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        rank = math.ceil(self.percentile / 100 * len(ordered)) - 1
+        return ordered[max(0, rank)]
+
+    def timeout(self, op, attempt=0):
+        """Timeout in ms for the attempt-th try (from 0) of an operation"""
+        latency = self.latency(op)
+        if latency is None:
+            timeout = self.defaults[op]
+        else:
+            timeout = min(self.max_timeout, max(self.min_timeout, latency * self.multiplier))
+        return int(min(self.max_timeout, timeout * 2**attempt))
+
+    def backoff(self, attempt):
+        """Seconds to wait before retry number attempt + 1"""
+        return self.rng.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def check(self):
+        """Raise CircuitOpenError while the circuit is open"""
+        if self.opened_at is None:
+            return
+        remaining = self.opened_at + self.cooldown - time.monotonic()
+        if remaining > 0:
+            raise CircuitOpenError(
+                f"circuit open after {self.consecutive_failures} failed fetches, "
+                f"retrying in {remaining:.0f}s"
+            )
+
+    def succeeded(self):
+        if self.opened_at is not None:
+            print("🟢 Circuit closed: fetches are succeeding again")
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+    def failed(self):
+        self.consecutive_failures += 1
+        half_open = self.opened_at is not None
+        if half_open or self.consecutive_failures >= self.failure_threshold:
+            if not half_open:
+                print(f"🔴 Circuit open after {self.consecutive_failures} failed fetches")
+            self.opened_at = time.monotonic()
+
+    def save(self):
+        """Keep the latency samples for the next run"""
+        if not self.state_file:
+            return
+        os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({op: list(samples) for op, samples in self.samples.items()}, f)
+        os.replace(tmp_file, self.state_file)
@@ -1,13 +1,22 @@
+import hashlib
+import html
+import json
 import os
+from collections import deque
 from datetime import datetime, timedelta
 import re
 
 
-def print_change(current_offer=None, previous_offer=None):
+def print_change(current_offer=None, previous_offer=None, changed_fields=None):
     if previous_offer is not None and current_offer is not None:
-        print(f"\nPrice change: {current_offer['offer_id']}")
-        print(f"{previous_offer['offer_id']}")
-        print(f"{previous_offer['price']} → {current_offer['price']}")
+        if current_offer["price_numeric"] != previous_offer["price_numeric"]:
+            print(f"\nPrice change: {current_offer['offer_id']}")
+            print(f"{previous_offer['offer_id']}")
+            print(f"{previous_offer['price']} → {current_offer['price']}")
+        else:
+            print(f"\nTerms change: {current_offer['offer_id']}")
+        for field in changed_fields or ():
+            print(f"{field}: {previous_offer.get(field)} → {current_offer.get(field)}")
     elif previous_offer is None:
         print(f"\nNew: {current_offer['offer_id']}")
         print(f"{current_offer['price']}, {current_offer['metro']}")
@@ -18,59 +27,78 @@ def print_change(current_offer=None, previous_offer=None):
         print("No change")
 
 
+DUPLICATE_KEY_FIELDS = ("building_id", "price_numeric", "floor", "rooms")
+
+
+def duplicate_key(offer):
+    """Key of the attributes that identify a property, None if any is missing"""
+    if any(field not in offer for field in DUPLICATE_KEY_FIELDS):
+        return None
+    return tuple(offer[field] for field in DUPLICATE_KEY_FIELDS)
+
+
 def are_duplicate_offers(offer1, offer2):
     """Check if two offers are duplicates based on key attributes"""
-    # Required fields for comparison
-    required_fields = ["building_id", "price_numeric", "floor", "rooms"]
-
-    # Check if both offers have all required fields
-    for field in required_fields:
-        if field not in offer1 or field not in offer2:
-            return False
-
-    # Compare all required fields
-    return (
-        offer1["building_id"] == offer2["building_id"]
-        and offer1["price_numeric"] == offer2["price_numeric"]
-        and offer1["floor"] == offer2["floor"]
-        and offer1["rooms"] == offer2["rooms"]
-    )
+    key = duplicate_key(offer1)
+    return key is not None and key == duplicate_key(offer2)
 
 
-def filter_duplicate_changes(new_changes, removed_changes, current_offers, previous_offers):
-    """Filter out duplicate changes where new and removed offers are the same property"""
+def build_duplicate_index(offers):
+    """Map duplicate_key -> offers sharing it, in the original order"""
+    index = {}
+    for offer in offers:
+        key = duplicate_key(offer)
+        if key is not None:
+            index.setdefault(key, []).append(offer)
+    return index
+
+
+def filter_duplicate_changes(
+    new_changes, removed_changes, current_offers, previous_offers, near_duplicates=None
+):
+    """Filter out duplicate changes where new and removed offers are the same property
+
+    Candidates are looked up by duplicate_key in indexes built once per call,
+    which finds the same first match as a pairwise are_duplicate_offers scan.
+    With a NearDuplicateIndex, the new offers left are also checked for
+    reposts with an edited description or price (see filter_near_duplicates).
+    """
     filtered_new = []
     filtered_removed = []
 
     # Track which removed offers are duplicates of new offers
     removed_duplicates = set()
 
+    current_index = build_duplicate_index(current_offers.values())
+    removed_index = {}
+    for i, removed_change in enumerate(removed_changes):
+        key = duplicate_key(removed_change["previous_offer"])
+        if key is not None:
+            removed_index.setdefault(key, deque()).append(i)
+
     # Filter new offers: check against removed offers (existing logic)
     for new_change in new_changes:
         new_offer = new_change["current_offer"]
+        key = duplicate_key(new_offer)
         is_duplicate = False
 
-        # Check against removed offers in same run
-        for i, removed_change in enumerate(removed_changes):
-            if i in removed_duplicates:
-                continue
-
-            removed_offer = removed_change["previous_offer"]
-
-            if are_duplicate_offers(new_offer, removed_offer):
-                print(
-                    f"🔄 Filtering duplicate: New {new_offer['offer_id']} = Removed {removed_offer['offer_id']} "
-                    f"({new_offer.get('building_id', 'N/A')}, {new_offer.get('price_numeric', 'N/A')}₽, "
-                    f"Floor {new_offer.get('floor', 'N/A')}, {new_offer.get('rooms', 'N/A')} rooms)"
-                )
-                removed_duplicates.add(i)
-                is_duplicate = True
-                break
+        # Check against removed offers in same run, each can match only once
+        unmatched_removed = removed_index.get(key)
+        if unmatched_removed:
+            i = unmatched_removed.popleft()
+            removed_offer = removed_changes[i]["previous_offer"]
+            print(
+                f"🔄 Filtering duplicate: New {new_offer['offer_id']} = Removed {removed_offer['offer_id']} "
+                f"({new_offer.get('building_id', 'N/A')}, {new_offer.get('price_numeric', 'N/A')}₽, "
+                f"Floor {new_offer.get('floor', 'N/A')}, {new_offer.get('rooms', 'N/A')} rooms)"
+            )
+            removed_duplicates.add(i)
+            is_duplicate = True
 
         # Check against existing offers (new logic)
         if not is_duplicate:
-            for existing_offer_id, existing_offer in current_offers.items():
-                if existing_offer_id != new_offer['offer_id'] and are_duplicate_offers(new_offer, existing_offer):
+            for existing_offer in current_index.get(key, ()):
+                if existing_offer["offer_id"] != new_offer["offer_id"]:
                     print(
                         f"🔄 Filtering duplicate: New {new_offer['offer_id']} = Existing {existing_offer['offer_id']} "
                         f"({new_offer.get('building_id', 'N/A')}, {new_offer.get('price_numeric', 'N/A')}₽, "
@@ -86,45 +114,126 @@ def filter_duplicate_changes(new_changes, removed_changes, current_offers, previ
     for i, removed_change in enumerate(removed_changes):
         if i in removed_duplicates:
             continue
-            
+
         removed_offer = removed_change["previous_offer"]
-        is_duplicate = False
-        
+
         # Check if a duplicate still exists in current offers
-        for current_offer_id, current_offer in current_offers.items():
-            if are_duplicate_offers(removed_offer, current_offer):
-                print(
-                    f"🔄 Filtering duplicate: Removed {removed_offer['offer_id']} = Remaining {current_offer['offer_id']} "
-                    f"({removed_offer.get('building_id', 'N/A')}, {removed_offer.get('price_numeric', 'N/A')}₽, "
-                    f"Floor {removed_offer.get('floor', 'N/A')}, {removed_offer.get('rooms', 'N/A')} rooms)"
-                )
-                is_duplicate = True
-                break
-        
-        if not is_duplicate:
+        remaining = current_index.get(duplicate_key(removed_offer))
+        if remaining:
+            current_offer = remaining[0]
+            print(
+                f"🔄 Filtering duplicate: Removed {removed_offer['offer_id']} = Remaining {current_offer['offer_id']} "
+                f"({removed_offer.get('building_id', 'N/A')}, {removed_offer.get('price_numeric', 'N/A')}₽, "
+                f"Floor {removed_offer.get('floor', 'N/A')}, {removed_offer.get('rooms', 'N/A')} rooms)"
+            )
+        else:
             filtered_removed.append(removed_change)
 
+    if near_duplicates is not None:
+        return filter_near_duplicates(
+            filtered_new, filtered_removed, current_offers, near_duplicates
+        )
     return filtered_new, filtered_removed
 
 
-def track_changes(current_data, previous_data):
-    """Compare current data with previous run to detect changes"""
-    previous_offers = {item["offer_id"]: item for item in previous_data}
-    current_offers = {item["offer_id"]: item for item in current_data}
+def filter_near_duplicates(new_changes, removed_changes, current_offers, index):
+    """Tag or drop new offers that repost a recently seen offer
+
+    Removed and still listed offers are added to the index before the new
+    ones, which are added in order, so a new offer is only ever a repost of
+    something seen earlier. With index.action "tag" a repost is kept with
+    repost_of set to the original's offer_id; with "suppress" it is dropped,
+    together with the removal of its original if that happened in this run.
+    """
+    new_ids = {change["current_offer"]["offer_id"] for change in new_changes}
+    for change in removed_changes:
+        index.add(change["previous_offer"])
+    for offer_id, offer in current_offers.items():
+        if offer_id not in new_ids:
+            index.add(offer)
+
+    removed_positions = {
+        change["previous_offer"]["offer_id"]: i for i, change in enumerate(removed_changes)
+    }
+    reposted_removed = set()
+    filtered_new = []
+    for change in new_changes:
+        new_offer = change["current_offer"]
+        index.add(new_offer)
+        match = index.find(new_offer)
+        if match is None:
+            filtered_new.append(change)
+            continue
+
+        original_id, similarity = match
+        print(
+            f"🔁 Near-duplicate: New {new_offer['offer_id']} ≈ {original_id} "
+            f"({similarity:.0%} similar description, {new_offer.get('price_numeric', 'N/A')}₽)"
+        )
+        if index.action == "suppress":
+            if original_id in removed_positions:
+                reposted_removed.add(removed_positions[original_id])
+        else:
+            filtered_new.append(dict(change, repost_of=original_id))
+
+    filtered_removed = [
+        change for i, change in enumerate(removed_changes) if i not in reposted_removed
+    ]
+    return filtered_new, filtered_removed
+
+
+# Offer terms whose changes are reported besides the price; overridable
+# with tracked_fields in config_storage.yaml
+TRACKED_FIELDS = ("rental_period", "utilities", "commission", "deposit", "description")
+
+
+def content_hash(offer, tracked_fields=TRACKED_FIELDS):
+    """Short hash of an offer's tracked fields, stable across runs"""
+    values = json.dumps([offer.get(field) for field in tracked_fields], ensure_ascii=False)
+    return hashlib.blake2b(values.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def updated_change(current_offer, previous_offer, tracked_fields=TRACKED_FIELDS):
+    """Change between two versions of an offer
 
+    Only when their content hashes differ are the tracked fields compared;
+    the ones that differ go to changed_fields. An empty changed_fields
+    means the hash changed but no tracked value did (e.g. the previous
+    version was stored before it had a hash): nothing to notify.
+    """
+    change = {"current_offer": current_offer, "previous_offer": previous_offer}
+    if current_offer.get("content_hash") != previous_offer.get("content_hash"):
+        change["changed_fields"] = [
+            field
+            for field in tracked_fields
+            if current_offer.get(field) != previous_offer.get(field)
+        ]
+    return change
+
+
+def diff_offers(current_offers, previous_offers, tracked_fields=TRACKED_FIELDS):
+    """Raw new, updated and removed offers between two {offer_id: offer} maps
+
+    An offer is updated when its price or its content_hash changed, see
+    updated_change.
+    """
     new_changes = []
-    price_changes = []
+    updated_changes = []
     removed_changes = []
 
-    # Track new offers and price changes
+    # Track new offers, price and terms changes
     for offer_id, current_offer in current_offers.items():
         if offer_id not in previous_offers:
             new_changes.append({"current_offer": current_offer})
         else:
             previous_offer = previous_offers[offer_id]
-            if current_offer["price_numeric"] != previous_offer["price_numeric"]:
-                price_changes.append(
-                    {"current_offer": current_offer, "previous_offer": previous_offer}
+            price_changed = current_offer["price_numeric"] != previous_offer["price_numeric"]
+            hash_changed = current_offer.get("content_hash") != previous_offer.get(
+                "content_hash"
+            )
+            if price_changed or hash_changed:
+                updated_changes.append(
+                    updated_change(current_offer, previous_offer, tracked_fields)
                 )
 
     # Track removed offers
@@ -132,33 +241,138 @@ def track_changes(current_data, previous_data):
         if offer_id not in current_offers:
             removed_changes.append({"previous_offer": previous_offer})
 
+    return new_changes, updated_changes, removed_changes
+
+
+def report_changes(
+    new_changes,
+    updated_changes,
+    removed_changes,
+    current_offers,
+    previous_offers,
+    near_duplicates=None,
+):
+    """Filter duplicates out of a raw diff, print it and return the changes to notify"""
     # Filter out duplicates between new and removed
     filtered_new, filtered_removed = filter_duplicate_changes(
-        new_changes, removed_changes, current_offers, previous_offers
+        new_changes, removed_changes, current_offers, previous_offers, near_duplicates
     )
+    # Drop updates whose hash changed without any tracked value changing
+    updated_changes = [
+        change
+        for change in updated_changes
+        if change_type(change) == "price" or change["changed_fields"]
+    ]
 
     # Print changes for the filtered results
     for change in filtered_new:
         print_change(change["current_offer"])
 
-    for change in price_changes:
-        print_change(change["current_offer"], change["previous_offer"])
+    for change in updated_changes:
+        print_change(
+            change["current_offer"], change["previous_offer"], change.get("changed_fields")
+        )
 
     for change in filtered_removed:
         print_change(previous_offer=change["previous_offer"])
 
     # Combine all changes for return
-    all_changes = filtered_new + price_changes + filtered_removed
+    all_changes = filtered_new + updated_changes + filtered_removed
+    terms_changes = sum(change_type(change) == "terms" for change in updated_changes)
 
     print(f"\n🆕 NEW OFFERS: {len(filtered_new)}")
-    print(f"💰 PRICE CHANGES: {len(price_changes)}")
+    print(f"💰 PRICE CHANGES: {len(updated_changes) - terms_changes}")
+    print(f"📝 TERMS CHANGES: {terms_changes}")
     print(f"❌ REMOVED OFFERS: {len(filtered_removed)}")
     if len(new_changes) - len(filtered_new) > 0:
         print(f"🔄 FILTERED DUPLICATES: {len(new_changes) - len(filtered_new)}")
+    reposts = sum("repost_of" in change for change in filtered_new)
+    if reposts:
+        print(f"🔁 TAGGED REPOSTS: {reposts}")
 
     return all_changes
 
 
+class EarlyChanges:
+    """Changes safe to announce from the first pages, before the crawl ends
+
+    Fed each page's offers as they arrive, page() returns the new offers
+    and the price or terms changes that report_changes will report too,
+    so they can be notified while later pages still load. Removals need
+    the whole list and are never returned. A new offer is held back for
+    the end of the crawl when its duplicate_key matches a previous offer
+    or another offer seen so far, or when near_duplicates finds an
+    earlier offer it may repost, among the ones it keeps or the new
+    offers of this crawl so far. The one case where the two disagree is
+    a pair of identical new listings on different pages: the first is
+    announced here, while report_changes drops both.
+    """
+
+    def __init__(self, previous_offers, tracked_fields=TRACKED_FIELDS, near_duplicates=None):
+        self.previous_offers = {offer["offer_id"]: offer for offer in previous_offers}
+        self.tracked_fields = tracked_fields
+        self.near_duplicates = near_duplicates
+        self.previous_keys = {duplicate_key(offer) for offer in previous_offers}
+        self.previous_keys.discard(None)
+        self.seen_ids = set()
+        self.seen_keys = set()
+        # New offers of this crawl, not yet in near_duplicates
+        self.new_offers = []
+
+    def _held_back(self, offer):
+        key = duplicate_key(offer)
+        if key is not None:
+            if key in self.previous_keys or key in self.seen_keys:
+                return True
+        if self.near_duplicates is not None and self.near_duplicates.peek(
+            offer, self.new_offers
+        ):
+            return True
+        return False
+
+    def page(self, offers):
+        """Changes to announce now among one page's offers"""
+        # Offers without an id never make it into the crawl's results
+        fresh = [
+            offer
+            for offer in offers
+            if offer.get("offer_id") and offer["offer_id"] not in self.seen_ids
+        ]
+        self.seen_ids.update(offer["offer_id"] for offer in fresh)
+
+        page_keys = [duplicate_key(offer) for offer in fresh]
+        changes = []
+        for offer, key in zip(fresh, page_keys):
+            previous_offer = self.previous_offers.get(offer["offer_id"])
+            if previous_offer is None:
+                # Twins on the same page are held back as well
+                twin = key is not None and page_keys.count(key) > 1
+                if not twin and not self._held_back(offer):
+                    changes.append({"current_offer": offer})
+                self.new_offers.append(offer)
+                continue
+            price_changed = offer["price_numeric"] != previous_offer["price_numeric"]
+            if price_changed or offer.get("content_hash") != previous_offer.get("content_hash"):
+                change = updated_change(offer, previous_offer, self.tracked_fields)
+                if change_type(change) == "price" or change["changed_fields"]:
+                    changes.append(change)
+        self.seen_keys.update(key for key in page_keys if key is not None)
+        return changes
+
+
+def track_changes(current_data, previous_data, tracked_fields=TRACKED_FIELDS):
+    """Compare current data with previous run to detect changes"""
+    previous_offers = {item["offer_id"]: item for item in previous_data}
+    current_offers = {item["offer_id"]: item for item in current_data}
+
+    new_changes, updated_changes, removed_changes = diff_offers(
+        current_offers, previous_offers, tracked_fields
+    )
+    return report_changes(
+        new_changes, updated_changes, removed_changes, current_offers, previous_offers
+    )
+
+
 def construct_search_url(config):
 
     base_url = os.getenv("BASE_URL")
@@ -203,12 +417,88 @@ def format_offer(offer):
     return "\n".join(lines)
 
 
-def format_change(change):
-    """Unified method to format any type of offer change"""
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+DIGEST_HEADERS = {
+    "new": "🆕 <b>НОВЫЕ ПРЕДЛОЖЕНИЯ</b>",
+    "price": "<b>ИЗМЕНЕНИЯ ЦЕН</b>",
+    "terms": "📝 <b>ИЗМЕНЕНИЯ УСЛОВИЙ</b>",
+    "removed": "❌ <b>СНЯТЫЕ ПРЕДЛОЖЕНИЯ</b>",
+}
+
+FIELD_LABELS = {
+    "rental_period": "Срок аренды",
+    "utilities": "Коммунальные платежи",
+    "commission": "Комиссия",
+    "deposit": "Залог",
+    "description": "Описание",
+}
+# Longer values (descriptions) are reported as changed without the text
+FIELD_VALUE_LIMIT = 100
+DIGEST_CONTINUED = " (продолжение)"
+
+_HTML_TAG = re.compile(r"(<[^>]+>)")
+_HTML_TAG_NAME = re.compile(r"<\s*/?\s*(\w+)")
+_HTML_ENTITY = re.compile(r"&(?:\w+|#\d+);")
+
+
+def change_type(change):
+    """Classify a change as 'price', 'terms', 'new' or 'removed'
+
+    An update is 'terms' when only tracked fields changed; one where the
+    price changed too is 'price' and also lists its changed_fields.
+    """
     has_current = "current_offer" in change
     has_previous = "previous_offer" in change
 
     if has_current and has_previous:
+        if (
+            "changed_fields" in change
+            and change["current_offer"]["price_numeric"]
+            == change["previous_offer"]["price_numeric"]
+        ):
+            return "terms"
+        return "price"
+    elif has_current:
+        return "new"
+    elif has_previous:
+        return "removed"
+    else:
+        raise ValueError("Change must have either current_offer or previous_offer")
+
+
+def format_field_change(field, previous_value, current_value):
+    """One "label: old → new" line of a terms change, HTML-escaped"""
+    label = FIELD_LABELS.get(field, field)
+    values = (previous_value, current_value)
+    if any(len(str(value)) > FIELD_VALUE_LIMIT for value in values):
+        return f"📝 {label}: изменено"
+    old, new = (html.escape(str(value)) if value else "не указано" for value in values)
+    return f"📝 {label}: {old} → <b>{new}</b>"
+
+
+def format_terms(change):
+    """Lines listing a change's changed_fields, "" if it has none"""
+    current_offer = change["current_offer"]
+    previous_offer = change["previous_offer"]
+    return "\n".join(
+        format_field_change(field, previous_offer.get(field), current_offer.get(field))
+        for field in change.get("changed_fields", ())
+    )
+
+
+def format_repost(change):
+    """Line pointing a reposted offer to its original, "" for other changes"""
+    if "repost_of" not in change:
+        return ""
+    return f"🔁 Похоже на повтор: {construct_offer_url(change['repost_of'])}\n"
+
+
+def format_change(change):
+    """Unified method to format any type of offer change"""
+    kind = change_type(change)
+
+    if kind == "price":
         # Price change
         header = "<b>ИЗМЕНЕНИЕ ЦЕНЫ</b>\n\n"
         current_offer = change["current_offer"]
@@ -216,49 +506,203 @@ def format_change(change):
         price_info = (
             f"💵 <b>{previous_offer['price']} → {current_offer['price']}</b>\n\n"
         )
+        terms = format_terms(change)
+        if terms:
+            price_info += terms + "\n\n"
         offer_info = format_offer(current_offer)
         return header + price_info + offer_info
 
-    elif has_current and not has_previous:
+    elif kind == "terms":
+        # Deposit, commission, description... changed at the same price
+        header = "📝 <b>ИЗМЕНЕНИЕ УСЛОВИЙ</b>\n\n"
+        return header + format_terms(change) + "\n\n" + format_offer(change["current_offer"])
+
+    elif kind == "new":
         # New offer
         header = "🆕 <b>НОВОЕ ПРЕДЛОЖЕНИЕ</b>\n\n"
-        return header + format_offer(change["current_offer"])
+        return header + format_repost(change) + format_offer(change["current_offer"])
 
-    elif has_previous and not has_current:
+    else:
         # Removed offer
         header = "❌ <b>ПРЕДЛОЖЕНИЕ СНЯТО</b>\n\n"
         return header + format_offer(change["previous_offer"])
 
+
+def format_change_body(change):
+    """format_change without its header, for listing under a digest heading"""
+    kind = change_type(change)
+    if kind == "price":
+        current_offer = change["current_offer"]
+        previous_offer = change["previous_offer"]
+        terms = format_terms(change)
+        return (
+            f"💵 <b>{previous_offer['price']} → {current_offer['price']}</b>\n"
+            + (terms + "\n" if terms else "")
+            + format_offer(current_offer)
+        )
+    elif kind == "terms":
+        return format_terms(change) + "\n" + format_offer(change["current_offer"])
+    elif kind == "new":
+        return format_repost(change) + format_offer(change["current_offer"])
     else:
-        raise ValueError("Change must have either current_offer or previous_offer")
+        return format_offer(change["previous_offer"])
+
+
+def split_html(text, limit):
+    """Split Telegram HTML into chunks of at most `limit` chars
+
+    Splits between words where possible and never inside a tag or an
+    entity. Tags still open at a split are closed at the end of the chunk
+    and reopened at the start of the next one.
+    """
+    if len(text) <= limit:
+        return [text]
+
+    chunks = []
+    open_tags = []  # (name, opening tag) in nesting order
+    current = ""
+
+    def closing():
+        return "".join(f"</{name}>" for name, _ in reversed(open_tags))
 
+    def flush():
+        nonlocal current
+        chunks.append(current + closing())
+        current = "".join(tag for _, tag in open_tags)
 
-def parse_russian_date(time_label):
-    """Parse Russian time labels to YYYY-MM-DD HH:MM:SS format"""
+    for token in _HTML_TAG.split(text):
+        if not token:
+            continue
+
+        if token.startswith("<"):
+            name = _HTML_TAG_NAME.match(token).group(1).lower()
+            # An opening tag also needs room for its closing tag; a closing
+            # tag is already counted in closing()
+            if not token.startswith("</") and _HTML_TAG.sub("", current).strip():
+                if len(current) + len(token) + len(closing()) + len(name) + 3 > limit:
+                    flush()
+            current += token
+            if token.startswith("</"):
+                for i in range(len(open_tags) - 1, -1, -1):
+                    if open_tags[i][0] == name:
+                        del open_tags[i]
+                        break
+            else:
+                open_tags.append((name, token))
+            continue
+
+        for word in re.split(r"(\s+)", token):
+            while word:
+                room = limit - len(current) - len(closing())
+                if len(word) <= room:
+                    current += word
+                    break
+                if _HTML_TAG.sub("", current).strip():
+                    flush()
+                    continue
+                # A single word longer than a whole chunk: cut it, but not mid-entity
+                cut = max(room, 1)
+                amp = word.rfind("&", 0, cut)
+                entity = _HTML_ENTITY.match(word, amp) if amp >= 0 else None
+                if entity and entity.end() > cut:
+                    cut = amp or entity.end()
+                current += word[:cut]
+                word = word[cut:]
+                flush()
+
+    if _HTML_TAG.sub("", current).strip():
+        chunks.append(current + closing())
+    return chunks
+
+
+def pack_digest(changes, max_length=TELEGRAM_MESSAGE_LIMIT):
+    """Pack many changes into as few messages as fit under max_length
+
+    Changes are grouped by type (new, price, terms, removed) under one
+    heading per group; a group that spills into the next message repeats
+    its heading.
+    Entries are never split across messages unless a single entry is longer
+    than a whole message, in which case it is split with split_html.
+
+    Returns (text, indexes of the changes the message covers) per message.
+    """
+    groups = {kind: [] for kind in DIGEST_HEADERS}
+    for index, change in enumerate(changes):
+        groups[change_type(change)].append((index, format_change_body(change)))
+
+    packed = []
+    current, current_kind, covered = "", None, []
+
+    for kind, bodies in groups.items():
+        header = f"{DIGEST_HEADERS[kind]} ({len(bodies)})"
+        piece_limit = max_length - len(header) - len(DIGEST_CONTINUED) - 2
+
+        for index, body in bodies:
+            for piece in split_html(body, piece_limit):
+                same_group = kind == current_kind
+                block = piece if same_group else f"{header}\n\n{piece}"
+                separator = "\n\n" if same_group else "\n\n\n"
+
+                if current and len(current) + len(separator) + len(block) > max_length:
+                    packed.append((current, covered))
+                    current = (
+                        f"{header}{DIGEST_CONTINUED}\n\n{piece}" if same_group else block
+                    )
+                    covered = []
+                else:
+                    current = current + separator + block if current else block
+                current_kind = kind
+                if not covered or covered[-1] != index:
+                    covered.append(index)
+
+    if current:
+        packed.append((current, covered))
+    return packed
+
+
+def format_digest(changes, max_length=TELEGRAM_MESSAGE_LIMIT):
+    """Texts of the digest messages for changes, see pack_digest"""
+    return [text for text, _ in pack_digest(changes, max_length)]
+
+
+MONTHS = {
+    "янв": 1,
+    "фев": 2,
+    "мар": 3,
+    "апр": 4,
+    "май": 5,
+    "мая": 5,
+    "июн": 6,
+    "июл": 7,
+    "авг": 8,
+    "сен": 9,
+    "окт": 10,
+    "ноя": 11,
+    "дек": 12,
+}
+CLOCK_PATTERN = re.compile(r"(\d{1,2}):(\d{2})")
+DATE_PATTERN = re.compile(r"(\d{1,2})\s+([а-яА-Я]+),?\s+(\d{1,2}):(\d{2})")
+ROOMS_PATTERN = re.compile(r"(\d+)-комн\.")
+FLOOR_PATTERN = re.compile(r"(\d+)/(\d+)\s*этаж")
+AREA_PATTERN = re.compile(r"(\d+(?:[.,]\d+)?)\s*м²")
+
+
+def parse_russian_date(time_label, now=None):
+    """Parse Russian time labels to YYYY-MM-DD HH:MM:SS format
+
+    Relative labels ("сегодня", "вчера") are resolved against `now`
+    (default: the current time).
+    """
     if not time_label:
         return None
 
-    now = datetime.now()
-    months = {
-        "янв": 1,
-        "фев": 2,
-        "мар": 3,
-        "апр": 4,
-        "май": 5,
-        "мая": 5,
-        "июн": 6,
-        "июл": 7,
-        "авг": 8,
-        "сен": 9,
-        "окт": 10,
-        "ноя": 11,
-        "дек": 12,
-    }
+    if now is None:
+        now = datetime.now()
 
     try:
         # Pattern 1: "сегодня, HH:MM"
         if "сегодня" in time_label:
-            match = re.search(r"(\d{1,2}):(\d{2})", time_label)
+            match = CLOCK_PATTERN.search(time_label)
             if match:
                 hour, minute = int(match.group(1)), int(match.group(2))
                 result = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
@@ -266,7 +710,7 @@ def parse_russian_date(time_label):
 
         # Pattern 2: "вчера, HH:MM"
         elif "вчера" in time_label:
-            match = re.search(r"(\d{1,2}):(\d{2})", time_label)
+            match = CLOCK_PATTERN.search(time_label)
             if match:
                 hour, minute = int(match.group(1)), int(match.group(2))
                 result = now - timedelta(days=1)
@@ -277,17 +721,15 @@ def parse_russian_date(time_label):
 
         # Pattern 3: "DD месяц, HH:MM"
         else:
-            match = re.search(
-                r"(\d{1,2})\s+([а-яА-Я]+),?\s+(\d{1,2}):(\d{2})", time_label
-            )
+            match = DATE_PATTERN.search(time_label)
             if match:
                 day = int(match.group(1))
                 month_name = match.group(2).lower()
                 hour = int(match.group(3))
                 minute = int(match.group(4))
 
-                if month_name in months:
-                    month = months[month_name]
+                if month_name in MONTHS:
+                    month = MONTHS[month_name]
                     year = now.year
 
                     result = datetime(year, month, day, hour, minute, 0)
@@ -312,14 +754,14 @@ def extract_floor_and_rooms(title):
         return result
 
     # Extract room count (e.g., "1-комн.", "2-комн.", "Студия")
-    room_match = re.search(r"(\d+)-комн\.", title)
+    room_match = ROOMS_PATTERN.search(title)
     if room_match:
         result["rooms"] = int(room_match.group(1))
     elif "студия" in title.lower():
         result["rooms"] = 0  # Studio = 0 rooms
 
     # Extract floor information (e.g., "3/9 этаж")
-    floor_match = re.search(r"(\d+)/(\d+)\s*этаж", title)
+    floor_match = FLOOR_PATTERN.search(title)
     if floor_match:
         result["floor"] = int(floor_match.group(1))
         result["total_floors"] = int(floor_match.group(2))
@@ -327,15 +769,65 @@ def extract_floor_and_rooms(title):
     return result
 
 
+def extract_area(title):
+    """Total area in m² from a title like "1-комн. квартира, 35,5 м², 8/9 этаж" """
+    if not title:
+        return None
+    match = AREA_PATTERN.search(title)
+    if match:
+        return float(match.group(1).replace(",", "."))
+    return None
+
+
+class OfferNormalizer:
+    """Normalizes offers with patterns compiled once and "now" fixed per run
+
+    Create one per run and feed it pages as they arrive. Parsed time labels
+    and titles are memoized, since the same labels ("сегодня, 12:39") and
+    titles repeat across offers and across runs' pages. Each offer also
+    gets the content_hash of its tracked_fields.
+    """
+
+    def __init__(self, now=None, tracked_fields=TRACKED_FIELDS):
+        self.now = now or datetime.now()
+        self.tracked_fields = tuple(tracked_fields)
+        self._dates = {}
+        self._titles = {}
+
+    def parse_date(self, time_label):
+        parsed = self._dates.get(time_label)
+        if parsed is None:
+            parsed = self._dates[time_label] = parse_russian_date(time_label, self.now)
+        return parsed
+
+    def parse_title(self, title):
+        """rooms/floor/total_floors/area found in a title (shared, do not modify)"""
+        parsed = self._titles.get(title)
+        if parsed is None:
+            parsed = extract_floor_and_rooms(title)
+            area = extract_area(title)
+            if area is not None:
+                parsed["area"] = area
+            self._titles[title] = parsed
+        return parsed
+
+    def normalize(self, offers):
+        """Normalize offer data after parsing (modifies in-place)"""
+        for offer in offers:
+            # Parse Russian dates
+            time_label = offer.get("time_label")
+            if time_label:
+                offer["time_label_parsed"] = self.parse_date(time_label)
+
+            # Extract floor, room number and area from title
+            title = offer.get("title")
+            if title:
+                offer.update(self.parse_title(title))
+
+            offer["content_hash"] = content_hash(offer, self.tracked_fields)
+        return offers
+
+
 def normalize_offer_data(offers):
     """Normalize offer data after parsing (modifies in-place)"""
-    for offer in offers:
-        # Parse Russian dates
-        if "time_label" in offer and offer["time_label"]:
-            offer["time_label_parsed"] = parse_russian_date(offer["time_label"])
-
-        # Extract floor and room number from title
-        if "title" in offer and offer["title"]:
-            floor_info = extract_floor_and_rooms(offer["title"])
-            offer.update(floor_info)
-    return offers
+    return OfferNormalizer().normalize(offers)
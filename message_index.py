@@ -0,0 +1,52 @@
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS offer_messages (
+    offer_id TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    message_id INTEGER NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (offer_id, chat_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS offer_messages_updated ON offer_messages(updated_at);
+"""
+
+
+class MessageIndex:
+    """The last message sent about each offer to each chat
+
+    Written as messages go out, so a later price change or removal can
+    edit or reply to the offer's message instead of starting a new thread.
+    Entries untouched for retention_days are dropped on open; the offer
+    then simply gets a new message.
+    """
+
+    def __init__(self, path="data/message_index.sqlite", retention_days=30):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat()
+        with self.conn:
+            self.conn.execute("DELETE FROM offer_messages WHERE updated_at < ?", (cutoff,))
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, offer_id, chat_id):
+        """message_id of the offer's last message in the chat, or None"""
+        row = self.conn.execute(
+            "SELECT message_id FROM offer_messages WHERE offer_id = ? AND chat_id = ?",
+            (str(offer_id), str(chat_id)),
+        ).fetchone()
+        return row[0] if row else None
+
+    def record(self, offer_id, chat_id, message_id):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO offer_messages VALUES (?, ?, ?, ?)",
+                (str(offer_id), str(chat_id), message_id, datetime.now().isoformat()),
+            )
@@ -0,0 +1,160 @@
+import glob
+import json
+import os
+from datetime import datetime, timedelta
+
+FSYNC_POLICIES = ("always", "rotate", "never")
+# "Closing time" of the segment migrated from the legacy log: older than
+# any real segment, and the same on every try
+LEGACY_CLOSED_AT = datetime(1970, 1, 1)
+
+
+class MessageLog:
+    """Append-only JSONL log of sent Telegram messages with segment rotation
+
+    Entries are appended to the active segment (`path`). Once it grows past
+    `max_bytes` or its first entry is older than `max_age_days`, it is renamed
+    to `<stem>.<YYYYMMDDTHHMMSSffffff>.jsonl` (the time it was closed) and a new
+    active segment is started, so segment names sort chronologically.
+
+    fsync policy: "always" syncs every append, "rotate" only when a segment
+    is closed, "never" leaves it to the OS. A crash can at worst leave a
+    truncated last line, which the reader skips.
+
+    An old JSON array log at legacy_path is migrated by the first append
+    (or an explicit migrate_legacy call); until then readers see its
+    entries first, and reading never changes any file.
+    """
+
+    def __init__(
+        self, path, max_bytes=5_000_000, max_age_days=30, fsync="always", legacy_path=None
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"unknown fsync policy: {fsync}")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = timedelta(days=max_age_days) if max_age_days else None
+        self.fsync = fsync
+        self.legacy_path = legacy_path
+        self._stem = path[: -len(".jsonl")] if path.endswith(".jsonl") else path
+        self._active_started = None
+        self._migrated = False
+
+    def append(self, entry):
+        """Append one entry (a JSON-serializable dict) to the active segment"""
+        self._ensure_migrated()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._rotate_if_needed()
+
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+            if self.fsync == "always":
+                f.flush()
+                os.fsync(f.fileno())
+
+        if self._active_started is None:
+            self._active_started = datetime.now()
+
+    def segments(self):
+        """All segment paths, oldest first, the active segment last"""
+        rotated = sorted(
+            p for p in glob.glob(f"{glob.escape(self._stem)}.*.jsonl") if p != self.path
+        )
+        if os.path.exists(self.path):
+            rotated.append(self.path)
+        return rotated
+
+    def iter_messages(self):
+        """Stream entries from all segments in the order they were logged"""
+        legacy_segment = self._segment_name(LEGACY_CLOSED_AT)
+        if self._legacy_exists() and not os.path.exists(legacy_segment):
+            yield from self._read_legacy() or ()
+        for segment in self.segments():
+            with open(segment, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        # Truncated line from an interrupted write
+                        continue
+
+    def migrate_legacy(self):
+        """One-time conversion of the old JSON array log into a closed segment
+
+        The segment is written and synced before the old file is deleted,
+        under a fixed name that sorts before every rotated segment, so a
+        migration interrupted in between is finished, not repeated.
+        """
+        if not self._legacy_exists():
+            return 0
+        segment = self._segment_name(LEGACY_CLOSED_AT)
+        if os.path.exists(segment):
+            os.remove(self.legacy_path)
+            return 0
+        entries = self._read_legacy()
+        if entries is None:
+            print(f"⚠️  Legacy message log {self.legacy_path} is unreadable, leaving it in place")
+            return 0
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = segment + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, segment)
+        os.remove(self.legacy_path)
+
+        print(f"📦 Migrated {len(entries)} messages from {self.legacy_path} to {segment}")
+        return len(entries)
+
+    def _legacy_exists(self):
+        return bool(self.legacy_path) and os.path.exists(self.legacy_path)
+
+    def _read_legacy(self):
+        """Entries of the old JSON array log, None if it is unreadable"""
+        try:
+            with open(self.legacy_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            return None
+
+    def _ensure_migrated(self):
+        if not self._migrated:
+            self.migrate_legacy()
+            self._migrated = True
+
+    def _segment_name(self, closed_at):
+        return f"{self._stem}.{closed_at.strftime('%Y%m%dT%H%M%S%f')}.jsonl"
+
+    def _rotate_if_needed(self):
+        if not os.path.exists(self.path):
+            self._active_started = None
+            return
+
+        too_big = os.path.getsize(self.path) >= self.max_bytes
+        too_old = False
+        if self.max_age is not None:
+            started = self._active_started or self._read_started()
+            too_old = started is not None and datetime.now() - started >= self.max_age
+
+        if not (too_big or too_old):
+            return
+
+        if self.fsync != "never":
+            with open(self.path, "a", encoding="utf-8") as f:
+                os.fsync(f.fileno())
+        os.replace(self.path, self._segment_name(datetime.now()))
+        self._active_started = None
+
+    def _read_started(self):
+        """Timestamp of the first entry in the active segment"""
+        with open(self.path, "r", encoding="utf-8") as f:
+            first_line = f.readline()
+        try:
+            self._active_started = datetime.fromisoformat(json.loads(first_line)["timestamp"])
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+            self._active_started = datetime.now()
+        return self._active_started
@@ -0,0 +1,187 @@
+import json
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PROMETHEUS_PREFIX = "listing_monitor"
+
+_NO_OP = nullcontext()
+
+
+class RunMetrics:
+    """Stage timers, counters and latency histograms for one run
+
+    A single module-level instance (`metrics`) is shared by the scraper and
+    the bot. Until start_run() enables it, stage() hands back a shared
+    no-op context manager and count()/observe()/page() return at once, so
+    instrumented code costs next to nothing with metrics turned off.
+
+    Stage times are summed over calls: with pages fetched concurrently,
+    "page.goto" can add up to more than the run's wall time.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._reset()
+
+    def _reset(self):
+        self.started = None
+        self.stages = {}
+        self.counters = {}
+        self.histograms = {}
+        self.pages = []
+
+    def start_run(self, config):
+        """Enable collection for a run if config["enabled"] is set"""
+        self.enabled = bool(config.get("enabled"))
+        self.file = config.get("file", "data/run_metrics.jsonl")
+        self.prometheus_file = config.get("prometheus_file")
+        self.record_pages = config.get("record_pages", True)
+        self.max_runs = config.get("max_runs")
+        self._reset()
+        self.started = time.perf_counter()
+        self.started_at = datetime.now().isoformat()
+
+    def stage(self, name):
+        """Context manager timing one call of a stage"""
+        if not self.enabled:
+            return _NO_OP
+        return self._time_stage(name)
+
+    @contextmanager
+    def _time_stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def add_time(self, name, seconds):
+        if not self.enabled:
+            return
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = {"calls": 0, "seconds": 0.0, "max_seconds": 0.0}
+        stage["calls"] += 1
+        stage["seconds"] += seconds
+        stage["max_seconds"] = max(stage["max_seconds"], seconds)
+
+    def count(self, name, amount=1):
+        if not self.enabled:
+            return
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, seconds):
+        """Add one latency sample to a histogram with LATENCY_BUCKETS bounds"""
+        if not self.enabled:
+            return
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = {
+                "buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+                "sum": 0.0,
+                "count": 0,
+            }
+        histogram["buckets"][bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        histogram["sum"] += seconds
+        histogram["count"] += 1
+
+    def page(self, record):
+        """Keep the per-page timings of one fetched result page"""
+        if not self.enabled or not self.record_pages:
+            return
+        self.pages.append(record)
+
+    def finish_run(self, status, **fields):
+        """Append the run's line to the JSONL file (and the Prometheus textfile)"""
+        if not self.enabled:
+            return
+        line = {
+            "started_at": self.started_at,
+            "status": status,
+            "duration_seconds": round(time.perf_counter() - self.started, 3),
+            **fields,
+            "stages": {
+                name: {
+                    "calls": stage["calls"],
+                    "seconds": round(stage["seconds"], 3),
+                    "max_seconds": round(stage["max_seconds"], 3),
+                }
+                for name, stage in self.stages.items()
+            },
+            "counters": self.counters,
+            "histograms": {
+                name: dict(histogram, bounds=list(LATENCY_BUCKETS))
+                for name, histogram in self.histograms.items()
+            },
+        }
+        if self.record_pages:
+            line["pages"] = self.pages
+
+        try:
+            self._append_line(line)
+            if self.prometheus_file:
+                self._write_prometheus(line)
+        except OSError as e:
+            print(f"⚠️  Failed to write run metrics: {e}")
+
+        print(f"📈 Run metrics: {line['duration_seconds']}s, written to {self.file}")
+        self.enabled = False
+
+    def _append_line(self, line):
+        """Append a run's line, keeping only the last max_runs lines if set"""
+        os.makedirs(os.path.dirname(self.file) or ".", exist_ok=True)
+        with open(self.file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+        if not self.max_runs:
+            return
+        with open(self.file, encoding="utf-8") as f:
+            lines = f.readlines()
+        if len(lines) <= self.max_runs:
+            return
+        tmp_file = f"{self.file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.writelines(lines[-self.max_runs :])
+        os.replace(tmp_file, self.file)
+
+    def _write_prometheus(self, line):
+        """Write the last run as a node_exporter textfile, atomically"""
+        p = PROMETHEUS_PREFIX
+        out = [
+            f"# TYPE {p}_last_run_timestamp_seconds gauge",
+            f"{p}_last_run_timestamp_seconds {time.time():.0f}",
+            f"# TYPE {p}_last_run_success gauge",
+            f"{p}_last_run_success {int(line['status'] == 'ok')}",
+            f"# TYPE {p}_last_run_duration_seconds gauge",
+            f"{p}_last_run_duration_seconds {line['duration_seconds']}",
+            f"# TYPE {p}_stage_seconds gauge",
+        ]
+        for name, stage in line["stages"].items():
+            out.append(f'{p}_stage_seconds{{stage="{name}"}} {stage["seconds"]}')
+        out.append(f"# TYPE {p}_stage_calls gauge")
+        for name, stage in line["stages"].items():
+            out.append(f'{p}_stage_calls{{stage="{name}"}} {stage["calls"]}')
+        out.append(f"# TYPE {p}_run_count gauge")
+        for name, value in line["counters"].items():
+            out.append(f'{p}_run_count{{counter="{name}"}} {value}')
+        for name, histogram in line["histograms"].items():
+            metric = f"{p}_{name.replace('.', '_')}_seconds"
+            out.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, bucket in zip(LATENCY_BUCKETS + ("+Inf",), histogram["buckets"]):
+                cumulative += bucket
+                out.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            out.append(f"{metric}_sum {histogram['sum']:.3f}")
+            out.append(f"{metric}_count {histogram['count']}")
+
+        os.makedirs(os.path.dirname(self.prometheus_file) or ".", exist_ok=True)
+        tmp_file = f"{self.prometheus_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write("\n".join(out) + "\n")
+        os.replace(tmp_file, self.prometheus_file)
+
+
+metrics = RunMetrics()
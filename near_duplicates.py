@@ -0,0 +1,298 @@
+import json
+import os
+import random
+import re
+import sqlite3
+import zlib
+from array import array
+from collections import deque
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS seen (
+    seq INTEGER PRIMARY KEY,
+    offer_id TEXT NOT NULL UNIQUE,
+    building_id TEXT,
+    price_numeric INTEGER,
+    rooms INTEGER,
+    floor INTEGER,
+    signature BLOB NOT NULL,
+    seen_at TEXT NOT NULL
+);
+"""
+
+_MASK = (1 << 64) - 1
+_MIX = 0x9E3779B97F4A7C15  # Odd, so multiplying permutes 64-bit values
+_DISTANCE_SHIFT = 58
+_WORD = re.compile(r"\w+")
+
+
+def shingles(text, size=2):
+    """Hashes of the overlapping `size`-word runs of a text
+
+    Case, punctuation and ё/е do not matter, so an edited repost shares
+    most of its shingles with the original.
+    """
+    words = _WORD.findall(text.lower().replace("ё", "е"))
+    if len(words) <= size:
+        runs = [" ".join(words)] if words else []
+    else:
+        runs = [" ".join(words[i : i + size]) for i in range(len(words) - size + 1)]
+    return {zlib.crc32(run.encode("utf-8")) for run in runs}
+
+
+def _structure(offer):
+    return (
+        offer.get("building_id"),
+        offer.get("rooms"),
+        offer.get("floor"),
+        offer.get("price_numeric"),
+    )
+
+
+class NearDuplicateIndex:
+    """Finds reposts of recently seen offers by their descriptions
+
+    Each description is reduced to a MinHash signature of its word
+    shingles, computed with one hash per shingle (one-permutation hashing:
+    the hash picks one of num_perm bins and each bin keeps its minimum;
+    empty bins borrow from the next non-empty one, so that positions still
+    agree with probability equal to the Jaccard similarity). Signatures are
+    split into `bands` bands and offers sharing
+    any band land in the same bucket, so a lookup only compares against a
+    few candidates however many offers are kept. A candidate is a repost
+    when the signatures agree on at least `threshold` of their positions
+    (the estimated Jaccard similarity of the descriptions), it was seen
+    before the offer itself, and it does not contradict the offer's
+    building, rooms, floor or price (within `price_tolerance`).
+
+    The last `window` offers seen are kept in an SQLite file, in the order
+    they were first seen. Changing num_perm, shingle_size or seed empties
+    the file, since stored signatures are no longer comparable.
+    """
+
+    def __init__(self, config):
+        self.threshold = config.get("threshold", 0.6)
+        self.num_perm = config.get("num_perm", 64)
+        self.bands = config.get("bands", 16)
+        self.shingle_size = config.get("shingle_size", 2)
+        self.window = config.get("window", 20000)
+        self.price_tolerance = config.get("price_tolerance", 0.1)
+        self.action = config.get("action", "tag")
+        self.path = config.get("file", "data/near_duplicates.sqlite")
+        if self.num_perm % self.bands:
+            raise ValueError(f"num_perm {self.num_perm} is not a multiple of bands {self.bands}")
+        if self.action not in ("tag", "suppress"):
+            raise ValueError(f"Unknown near-duplicate action {self.action!r}")
+        self.rows = self.num_perm // self.bands
+
+        seed = config.get("seed", 1)
+        self._salt = random.Random(seed).getrandbits(64)
+
+        self._offers = {}  # offer_id -> (seq, structure, signature)
+        self._seqs = {}  # seq -> offer_id
+        self._order = deque()  # seqs, oldest first
+        # Per band: band key -> seq, or a list of seqs once several share it
+        self._buckets = [{} for _ in range(self.bands)]
+        self._pending = []
+        self._next_seq = 0
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.executescript(SCHEMA)
+        self._load(
+            json.dumps(
+                {"num_perm": self.num_perm, "shingle_size": self.shingle_size, "seed": seed}
+            )
+        )
+
+    def _load(self, params):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'params'").fetchone()
+        with self.conn:
+            if row is None or row[0] != params:
+                self.conn.execute("DELETE FROM seen")
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('params', ?)", (params,)
+                )
+        rows = self.conn.execute(
+            """
+            SELECT seq, offer_id, building_id, price_numeric, rooms, floor, signature
+            FROM seen ORDER BY seq DESC LIMIT ?
+            """,
+            (self.window,),
+        ).fetchall()
+        for seq, offer_id, building_id, price, rooms, floor, blob in reversed(rows):
+            signature = array("Q")
+            signature.frombytes(blob)
+            self._insert(seq, offer_id, (building_id, rooms, floor, price), signature)
+            self._next_seq = seq + 1
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self):
+        return len(self._offers)
+
+    def signature(self, text):
+        """MinHash signature of a text's shingles, None if it has no words"""
+        hashes = shingles(text, self.shingle_size)
+        if not hashes:
+            return None
+        num_perm = self.num_perm
+        bins = [None] * num_perm
+        for x in hashes:
+            h = ((x ^ self._salt) * _MIX) & _MASK
+            position, value = h % num_perm, h // num_perm
+            if bins[position] is None or value < bins[position]:
+                bins[position] = value
+
+        # Densify: an empty bin takes the next non-empty bin's minimum
+        # (wrapping around), tagged with how far away that bin was
+        signature = array("Q", bytes(8 * num_perm))
+        filled = None
+        for i in range(2 * num_perm - 1, -1, -1):
+            if bins[i % num_perm] is not None:
+                filled = i
+            if i < num_perm:
+                signature[i] = ((filled - i) << _DISTANCE_SHIFT) | bins[filled % num_perm]
+        return signature
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [hash(tuple(signature[i : i + rows])) for i in range(0, self.num_perm, rows)]
+
+    def _insert(self, seq, offer_id, structure, signature):
+        self._offers[offer_id] = (seq, structure, signature)
+        self._seqs[seq] = offer_id
+        self._order.append(seq)
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            seqs = bucket.get(key)
+            if seqs is None:
+                bucket[key] = seq
+            elif type(seqs) is int:
+                bucket[key] = [seqs, seq]
+            else:
+                seqs.append(seq)
+
+    def _evict(self):
+        while len(self._offers) > self.window:
+            seq = self._order.popleft()
+            offer_id = self._seqs.pop(seq)
+            _, _, signature = self._offers.pop(offer_id)
+            for bucket, key in zip(self._buckets, self._band_keys(signature)):
+                seqs = bucket[key]
+                if type(seqs) is int:
+                    del bucket[key]
+                else:
+                    seqs.remove(seq)
+                    if len(seqs) == 1:
+                        bucket[key] = seqs[0]
+
+    def add(self, offer):
+        """Remember an offer (once, with its first-seen order)"""
+        offer_id = offer["offer_id"]
+        if offer_id in self._offers or not offer.get("description"):
+            return
+        signature = self.signature(offer["description"])
+        if signature is None:
+            return
+        structure = _structure(offer)
+        seq = self._next_seq
+        self._next_seq += 1
+        self._insert(seq, offer_id, structure, signature)
+        building_id, rooms, floor, price = structure
+        self._pending.append(
+            (seq, offer_id, building_id, price, rooms, floor, signature.tobytes())
+        )
+        self._evict()
+
+    def _compatible(self, structure, other):
+        for value, other_value in zip(structure[:3], other[:3]):
+            if value is not None and other_value is not None and value != other_value:
+                return False
+        price, other_price = structure[3], other[3]
+        if price and other_price:
+            return abs(price - other_price) <= self.price_tolerance * max(price, other_price)
+        return True
+
+    def find(self, offer):
+        """(offer_id, similarity) of the most similar earlier offer, or None
+
+        The offer must have been added first; only offers seen before it
+        are candidates, so of two near-duplicates the later one is the repost.
+        """
+        entry = self._offers.get(offer["offer_id"])
+        if entry is None:
+            return None
+        seq, structure, signature = entry
+        return self._best_match(structure, signature, seq)
+
+    def peek(self, offer, others=()):
+        """Like find, but without adding the offer first
+
+        An offer not in the index yet is compared against every offer in
+        it, and also against `others` (offers seen before it that are not
+        in the index). The index is left as it was.
+        """
+        if not offer.get("description"):
+            return None
+        entry = self._offers.get(offer["offer_id"])
+        if entry is not None:
+            seq, structure, signature = entry
+        else:
+            signature = self.signature(offer["description"])
+            if signature is None:
+                return None
+            seq, structure = self._next_seq, _structure(offer)
+
+        best = self._best_match(structure, signature, seq)
+        for other in others:
+            if other["offer_id"] == offer["offer_id"] or not other.get("description"):
+                continue
+            other_signature = self.signature(other["description"])
+            if other_signature is None or not self._compatible(structure, _structure(other)):
+                continue
+            similarity = self._similarity(signature, other_signature)
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (other["offer_id"], similarity)
+        return best
+
+    def _similarity(self, signature, other_signature):
+        return sum(x == y for x, y in zip(signature, other_signature)) / self.num_perm
+
+    def _best_match(self, structure, signature, seq):
+        """Most similar compatible offer seen before seq, as in find"""
+        candidates = set()
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            seqs = bucket.get(key, ())
+            if type(seqs) is int:
+                seqs = (seqs,)
+            candidates.update(other for other in seqs if other < seq)
+
+        best = None
+        for other_seq in candidates:
+            other_id = self._seqs[other_seq]
+            _, other_structure, other_signature = self._offers[other_id]
+            if not self._compatible(structure, other_structure):
+                continue
+            similarity = self._similarity(signature, other_signature)
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (other_id, similarity)
+        return best
+
+    def save(self):
+        """Write offers added since the last save and drop evicted ones"""
+        now = datetime.now().isoformat()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO seen VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [row + (now,) for row in self._pending],
+            )
+            if self._order:
+                self.conn.execute("DELETE FROM seen WHERE seq < ?", (self._order[0],))
+        self._pending = []
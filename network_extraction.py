@@ -0,0 +1,185 @@
+"""Build offers from the site's structured listing payload instead of the DOM.
+
+The search page ships its results twice: rendered as cards (read by
+`primary_script`) and as JSON, either embedded in the document as the
+`frontend-serp` initial state or returned by the search API when the page
+paginates client-side. This module turns that JSON into the same offer
+dicts `primary_script` produces, so the rest of the pipeline does not care
+which engine ran.
+"""
+import json
+from fnmatch import fnmatch
+
+STATE_MARKER = "window._cianConfig['frontend-serp']"
+STATE_CONCAT = ".concat("
+
+RENTAL_PERIODS = {
+    "longTerm": "От года",
+    "fewMonths": "На несколько месяцев",
+}
+
+# Address entry type -> offer field, in the order the card shows them
+GEO_FIELDS = {
+    "location": "city",
+    "okrug": "district",
+    "raion": "sub_district",
+    "metro": "metro",
+    "street": "street",
+    "house": "building",
+}
+
+
+def _format_rubles(amount):
+    return f"{amount:,}".replace(",", " ")
+
+
+def _format_area(area):
+    value = float(area)
+    return f"{value:g}".replace(".", ",")
+
+
+def _format_title(raw):
+    if raw.get("flatType") == "studio":
+        kind = "Апартаменты-студия" if raw.get("isApartments") else "Студия"
+    else:
+        noun = "апартаменты" if raw.get("isApartments") else "квартира"
+        kind = f"{raw['roomsCount']}-комн. {noun}"
+    floors = raw.get("building", {}).get("floorsCount")
+    return f"{kind}, {_format_area(raw['totalArea'])} м², {raw['floorNumber']}/{floors} этаж"
+
+
+def _format_price_info(terms):
+    utilities = terms.get("utilitiesTerms", {})
+    if utilities.get("includedInPrice"):
+        meters = (
+            "без счётчиков"
+            if utilities.get("flowMetersNotIncludedInPrice")
+            else "счётчики включены"
+        )
+        utilities_text = f"комм. платежи включены ({meters})"
+    else:
+        utilities_text = "комм. платежи не включены"
+
+    client_fee = terms.get("clientFee") or 0
+    commission = f"комиссия {client_fee}%" if client_fee else "без комиссии"
+
+    deposit = terms.get("deposit") or 0
+    deposit_text = f"залог {_format_rubles(deposit)}\xa0₽" if deposit else "без залога"
+
+    parts = [
+        RENTAL_PERIODS.get(terms.get("leaseTermType"), terms.get("leaseTermType")),
+        utilities_text,
+        commission,
+        deposit_text,
+    ]
+    return ", ".join(part for part in parts if part)
+
+
+def build_offer(raw):
+    """Map one raw listing object to the offer schema of primary_script"""
+    offer = {
+        "offer_id": str(raw["cianId"]),
+        "price_numeric": None,
+        "time_label": raw.get("added"),
+        "title": _format_title(raw),
+    }
+
+    geo = {field: None for field in GEO_FIELDS.values()}
+    geo_ids = {field: None for field in GEO_FIELDS.values()}
+    labels = []
+    for entry in raw.get("geo", {}).get("address", []):
+        text = entry.get("shortName") or entry.get("fullName") or entry.get("name")
+        if not text:
+            continue
+        labels.append(text)
+        field = GEO_FIELDS.get(entry.get("type"))
+        # Like the card, an entry without an id only shows up in full_address
+        if field and entry.get("id") is not None:
+            geo[field] = text
+            geo_ids[field] = str(entry["id"])
+
+    for field in ("metro", "city", "district", "sub_district", "street", "building"):
+        offer[field] = geo[field]
+        offer[f"{field}_id"] = geo_ids[field]
+    offer["full_address"] = ", ".join(labels)
+
+    terms = raw.get("bargainTerms", {})
+    price_info = _format_price_info(terms)
+    parts = [part.strip() for part in price_info.split(",")]
+    offer["rental_period"] = parts[0] if len(parts) > 0 else None
+    offer["utilities"] = parts[1] if len(parts) > 1 else None
+    offer["commission"] = parts[2] if len(parts) > 2 else None
+    offer["deposit"] = parts[3] if len(parts) > 3 else None
+
+    description = raw.get("description")
+    offer["description"] = description.strip() if description else None
+    offer["price_info"] = price_info
+
+    price = terms.get("priceRur", terms.get("price"))
+    offer["price_numeric"] = price
+    offer["price"] = f"{_format_rubles(price)} ₽/мес." if price is not None else None
+    return offer
+
+
+def offers_from_html(html):
+    """Offers from the initial state embedded in a search page, or None"""
+    start = html.find(STATE_MARKER)
+    if start == -1:
+        return None
+    start = html.find(STATE_CONCAT, start)
+    if start == -1:
+        return None
+    try:
+        items, _ = json.JSONDecoder().raw_decode(html, start + len(STATE_CONCAT))
+    except json.JSONDecodeError:
+        return None
+
+    for item in items:
+        if isinstance(item, dict) and item.get("key") == "initialState":
+            offers = item.get("value", {}).get("results", {}).get("offers")
+            if offers is not None:
+                return [build_offer(raw) for raw in offers]
+    return None
+
+
+def offers_from_payload(payload):
+    """Offers from a search API JSON response, or None"""
+    offers = (payload.get("data") or {}).get("offersSerialized")
+    if offers is None:
+        return None
+    return [build_offer(raw) for raw in offers]
+
+
+class NetworkCapture:
+    """Collect a page's listing responses while it navigates"""
+
+    def __init__(self, page, url_patterns):
+        self.page = page
+        self.url_patterns = url_patterns
+        self.responses = []
+
+    def __enter__(self):
+        self.page.on("response", self._on_response)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.page.remove_listener("response", self._on_response)
+
+    def _on_response(self, response):
+        if any(fnmatch(response.url, pattern) for pattern in self.url_patterns):
+            self.responses.append(response)
+
+    async def offers(self, document_response):
+        """Latest API payload wins, then the document's embedded state"""
+        for response in reversed(self.responses):
+            try:
+                offers = offers_from_payload(await response.json())
+            except Exception as e:
+                print(f"⚠️  Unreadable listing response {response.url[:100]}: {e}")
+                continue
+            if offers is not None:
+                return offers
+
+        if document_response is not None:
+            return offers_from_html(await document_response.text())
+        return None
@@ -0,0 +1,162 @@
+import sys
+from collections.abc import Mapping, MutableMapping
+
+# Field order of primary_script's output followed by normalize_offer_data's
+# additions; to_dict() emits fields in this order
+FIELDS = (
+    "offer_id",
+    "price_numeric",
+    "time_label",
+    "title",
+    "metro",
+    "metro_id",
+    "city",
+    "city_id",
+    "district",
+    "district_id",
+    "sub_district",
+    "sub_district_id",
+    "street",
+    "street_id",
+    "building",
+    "building_id",
+    "full_address",
+    "rental_period",
+    "utilities",
+    "commission",
+    "deposit",
+    "description",
+    "price_info",
+    "price",
+    "time_label_parsed",
+    "rooms",
+    "floor",
+    "total_floors",
+    "area",
+    "content_hash",
+)
+
+# Categorical values repeated across many offers; one shared copy each
+INTERNED_FIELDS = frozenset(
+    {
+        "metro",
+        "metro_id",
+        "city",
+        "city_id",
+        "district",
+        "district_id",
+        "sub_district",
+        "sub_district_id",
+        "street",
+        "street_id",
+        "building_id",
+        "rental_period",
+        "utilities",
+        "commission",
+        "deposit",
+    }
+)
+
+_MISSING = object()
+
+
+class Offer(MutableMapping):
+    """One offer in __slots__ instead of a ~28-key dict
+
+    Behaves like the dict it was built from (offer["price"], offer.get(...),
+    `in`, update, iteration), so helpers and formatters work unchanged.
+    Fields that were absent stay absent and keys outside FIELDS are kept in
+    `extra`, so from_dict(d).to_dict() == d. Repeated categorical strings
+    are interned, so e.g. every "р-н Хамовники" is one object.
+    """
+
+    __slots__ = FIELDS + ("extra",)
+
+    def __init__(self, **fields):
+        self.extra = None
+        for key, value in fields.items():
+            self[key] = value
+
+    @classmethod
+    def from_dict(cls, data):
+        if isinstance(data, cls):
+            return data
+        return cls(**data)
+
+    def to_dict(self):
+        data = {}
+        for key in FIELDS:
+            value = getattr(self, key, _MISSING)
+            if value is not _MISSING:
+                data[key] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            value = getattr(self, key, _MISSING)
+            if value is not _MISSING:
+                return value
+        elif self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in _FIELD_SET:
+            return getattr(self, key, default)
+        if self.extra:
+            return self.extra.get(key, default)
+        return default
+
+    def __setitem__(self, key, value):
+        if key in _FIELD_SET:
+            if key in INTERNED_FIELDS and type(value) is str:
+                value = sys.intern(value)
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __delitem__(self, key):
+        if key in _FIELD_SET and hasattr(self, key):
+            delattr(self, key)
+        elif self.extra and key in self.extra:
+            del self.extra[key]
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        if key in _FIELD_SET:
+            return hasattr(self, key)
+        return bool(self.extra) and key in self.extra
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self):
+        return len(self.to_dict())
+
+    def __eq__(self, other):
+        if isinstance(other, Mapping):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Offer({self.to_dict()!r})"
+
+
+_FIELD_SET = frozenset(FIELDS)
+
+
+def offer_hook(data):
+    """`object_hook=` for json.load(s) of a snapshot: reads offers as Offers"""
+    return Offer.from_dict(data) if "offer_id" in data else data
+
+
+def json_default(obj):
+    """`default=` for json.dump(s): writes Offers as their dicts"""
+    if isinstance(obj, Offer):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
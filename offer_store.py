@@ -0,0 +1,200 @@
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+from helpers import TRACKED_FIELDS, change_type, updated_change
+from offer import Offer, json_default
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS offers (
+    offer_id TEXT PRIMARY KEY,
+    building_id TEXT,
+    price_numeric INTEGER,
+    content_hash TEXT,
+    data TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    removed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS offers_building ON offers(building_id);
+CREATE INDEX IF NOT EXISTS offers_active ON offers(removed_at);
+CREATE TABLE IF NOT EXISTS price_observations (
+    offer_id TEXT NOT NULL REFERENCES offers(offer_id),
+    price_numeric INTEGER,
+    observed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS price_observations_offer ON price_observations(offer_id);
+"""
+
+
+class OfferStore:
+    """SQLite store of every offer ever seen, with its price history
+
+    Offers with removed_at NULL form the previous snapshot. diff() compares
+    a fresh scan against it with set-based queries and apply() writes back
+    only the rows that changed, so unchanged offers cost nothing per run.
+    """
+
+    def __init__(self, path="data/offers.sqlite"):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(offers)")}
+        if "content_hash" not in columns:
+            # Stores created before content hashes: rows get theirs on next update
+            self.conn.execute("ALTER TABLE offers ADD COLUMN content_hash TEXT")
+
+    def close(self):
+        self.conn.close()
+
+    def is_empty(self):
+        return self.conn.execute("SELECT 1 FROM offers LIMIT 1").fetchone() is None
+
+    def import_snapshot(self, offers):
+        """Seed an empty store from a current_data.json style list"""
+        self.apply([{"current_offer": offer} for offer in offers], [], [])
+        print(f"📦 Imported {len(offers)} offers into {self.path}")
+
+    def active_offers(self):
+        """The previous snapshot, in the order offers were first stored"""
+        rows = self.conn.execute(
+            "SELECT data FROM offers WHERE removed_at IS NULL ORDER BY rowid"
+        )
+        return [Offer.from_dict(json.loads(data)) for (data,) in rows]
+
+    def diff(self, current_data, tracked_fields=TRACKED_FIELDS):
+        """Raw (new, updated, removed) changes of a scan against the active offers
+
+        Updated offers are those whose price or content_hash changed, see
+        helpers.updated_change.
+        """
+        current_offers = {offer["offer_id"]: offer for offer in current_data}
+
+        self.conn.execute(
+            """
+            CREATE TEMP TABLE IF NOT EXISTS current_scan (
+                offer_id TEXT PRIMARY KEY,
+                price_numeric INTEGER,
+                content_hash TEXT,
+                position INTEGER
+            )
+            """
+        )
+        self.conn.execute("DELETE FROM current_scan")
+        self.conn.executemany(
+            "INSERT INTO current_scan VALUES (?, ?, ?, ?)",
+            [
+                (offer_id, offer.get("price_numeric"), offer.get("content_hash"), position)
+                for position, (offer_id, offer) in enumerate(current_offers.items())
+            ],
+        )
+
+        new_changes = [
+            {"current_offer": current_offers[offer_id]}
+            for (offer_id,) in self.conn.execute(
+                """
+                SELECT c.offer_id FROM current_scan c
+                LEFT JOIN offers o ON o.offer_id = c.offer_id AND o.removed_at IS NULL
+                WHERE o.offer_id IS NULL
+                ORDER BY c.position
+                """
+            )
+        ]
+        updated_changes = [
+            updated_change(
+                current_offers[offer_id], Offer.from_dict(json.loads(data)), tracked_fields
+            )
+            for offer_id, data in self.conn.execute(
+                """
+                SELECT c.offer_id, o.data FROM current_scan c
+                JOIN offers o ON o.offer_id = c.offer_id AND o.removed_at IS NULL
+                WHERE c.price_numeric IS NOT o.price_numeric
+                   OR c.content_hash IS NOT o.content_hash
+                ORDER BY c.position
+                """
+            )
+        ]
+        removed_changes = [
+            {"previous_offer": Offer.from_dict(json.loads(data))}
+            for (data,) in self.conn.execute(
+                """
+                SELECT o.data FROM offers o
+                WHERE o.removed_at IS NULL
+                  AND NOT EXISTS (SELECT 1 FROM current_scan c WHERE c.offer_id = o.offer_id)
+                ORDER BY o.rowid
+                """
+            )
+        ]
+        return new_changes, updated_changes, removed_changes
+
+    def apply(self, new_changes, updated_changes, removed_changes):
+        """Upsert just the changed rows of a raw diff in one transaction"""
+        now = datetime.now().isoformat()
+        with self.conn:
+            for change in new_changes:
+                offer = change["current_offer"]
+                # A re-listed offer keeps its first_seen and gets un-removed
+                self.conn.execute(
+                    """
+                    INSERT INTO offers
+                        (offer_id, building_id, price_numeric, content_hash, data, first_seen)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(offer_id) DO UPDATE SET
+                        building_id = excluded.building_id,
+                        price_numeric = excluded.price_numeric,
+                        content_hash = excluded.content_hash,
+                        data = excluded.data,
+                        removed_at = NULL
+                    """,
+                    (
+                        offer["offer_id"],
+                        offer.get("building_id"),
+                        offer.get("price_numeric"),
+                        offer.get("content_hash"),
+                        json.dumps(offer, ensure_ascii=False, default=json_default),
+                        now,
+                    ),
+                )
+            for change in updated_changes:
+                offer = change["current_offer"]
+                self.conn.execute(
+                    """
+                    UPDATE offers
+                    SET building_id = ?, price_numeric = ?, content_hash = ?, data = ?
+                    WHERE offer_id = ?
+                    """,
+                    (
+                        offer.get("building_id"),
+                        offer.get("price_numeric"),
+                        offer.get("content_hash"),
+                        json.dumps(offer, ensure_ascii=False, default=json_default),
+                        offer["offer_id"],
+                    ),
+                )
+            self.conn.executemany(
+                "INSERT INTO price_observations VALUES (?, ?, ?)",
+                [
+                    (
+                        change["current_offer"]["offer_id"],
+                        change["current_offer"].get("price_numeric"),
+                        now,
+                    )
+                    for change in new_changes + updated_changes
+                    if change_type(change) != "terms"
+                ],
+            )
+            self.conn.executemany(
+                "UPDATE offers SET removed_at = ? WHERE offer_id = ?",
+                [(now, change["previous_offer"]["offer_id"]) for change in removed_changes],
+            )
+
+    def price_history(self, offer_id):
+        """[(observed_at, price_numeric), ...] for an offer, oldest first"""
+        return self.conn.execute(
+            """
+            SELECT observed_at, price_numeric FROM price_observations
+            WHERE offer_id = ? ORDER BY observed_at, rowid
+            """,
+            (offer_id,),
+        ).fetchall()
@@ -0,0 +1,166 @@
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+from helpers import change_type
+from offer import json_default
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    key TEXT PRIMARY KEY,
+    change TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS deliveries (
+    key TEXT NOT NULL REFERENCES messages(key) ON DELETE CASCADE,
+    chat_id TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    message_id INTEGER,
+    error_message TEXT,
+    updated_at TEXT,
+    PRIMARY KEY (key, chat_id)
+);
+CREATE INDEX IF NOT EXISTS deliveries_status ON deliveries(status, chat_id);
+"""
+
+
+def idempotency_key(change):
+    """offer_id + change type + price (content hash for terms changes),
+    stable across re-detections of a change"""
+    kind = change_type(change)
+    offer = change["previous_offer"] if kind == "removed" else change["current_offer"]
+    if kind == "terms":
+        return f"{offer['offer_id']}:{kind}:{offer.get('content_hash')}"
+    return f"{offer['offer_id']}:{kind}:{offer.get('price_numeric')}"
+
+
+class Outbox:
+    """Durable queue of notifications, delivered and acknowledged per chat
+
+    Changes are enqueued (in one transaction) before the snapshot is saved,
+    so a run that dies later neither loses nor repeats notifications: the
+    next run re-detects the same changes, the idempotency key makes the
+    enqueue a no-op, and draining only sends deliveries still pending.
+    """
+
+    def __init__(self, path="data/outbox.sqlite", max_attempts=5, retention_hours=24):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retention = timedelta(hours=retention_hours)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def enqueue(self, changes, recipients):
+        """Add each change for its chats, ignoring ones already in the outbox
+
+        recipients[i] lists the chat ids changes[i] goes to; a change with
+        no recipients is not queued at all.
+        """
+        now = datetime.now().isoformat()
+        added = 0
+        with self.conn:
+            self._prune()
+            for change, chat_ids in zip(changes, recipients):
+                if not chat_ids:
+                    continue
+                key = idempotency_key(change)
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO messages (key, change, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(change, ensure_ascii=False, default=json_default), now),
+                )
+                if cursor.rowcount:
+                    added += 1
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO deliveries (key, chat_id, updated_at) VALUES (?, ?, ?)",
+                    [(key, str(chat_id), now) for chat_id in chat_ids],
+                )
+        queued = sum(1 for chat_ids in recipients if chat_ids)
+        if added < queued:
+            print(f"📮 Outbox: {queued - added} change(s) were already queued")
+        return added
+
+    def pending(self):
+        """{chat_id: [(key, change), ...]} still to send, oldest first"""
+        rows = self.conn.execute(
+            """
+            SELECT d.chat_id, m.key, m.change
+            FROM deliveries d JOIN messages m ON m.key = d.key
+            WHERE d.status = 'pending'
+            ORDER BY m.created_at, m.rowid
+            """
+        )
+        result = {}
+        for chat_id, key, change in rows:
+            result.setdefault(chat_id, []).append((key, json.loads(change)))
+        return result
+
+    def mark_sent(self, keys, chat_id, message_id=None):
+        with self.conn:
+            self.conn.executemany(
+                """
+                UPDATE deliveries
+                SET status = 'sent', attempts = attempts + 1, message_id = ?,
+                    error_message = NULL, updated_at = ?
+                WHERE key = ? AND chat_id = ?
+                """,
+                [(message_id, datetime.now().isoformat(), key, chat_id) for key in keys],
+            )
+
+    def mark_failed(self, keys, chat_id, error_message=None):
+        """Count a failed attempt; give up on a delivery after max_attempts"""
+        with self.conn:
+            self.conn.executemany(
+                """
+                UPDATE deliveries
+                SET attempts = attempts + 1,
+                    status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END,
+                    error_message = ?, updated_at = ?
+                WHERE key = ? AND chat_id = ?
+                """,
+                [
+                    (self.max_attempts, error_message, datetime.now().isoformat(), key, chat_id)
+                    for key in keys
+                ],
+            )
+
+    def drop_pending(self, chat_ids, reason):
+        """Give up on every pending delivery to chat_ids (blocked or no
+        longer configured chats), so drains stop retrying them"""
+        with self.conn:
+            cursor = self.conn.executemany(
+                """
+                UPDATE deliveries
+                SET status = 'dropped', error_message = ?, updated_at = ?
+                WHERE chat_id = ? AND status = 'pending'
+                """,
+                [(reason, datetime.now().isoformat(), str(chat_id)) for chat_id in chat_ids],
+            )
+        if cursor.rowcount > 0:
+            print(f"🗑️  Outbox: dropped {cursor.rowcount} pending delivery(ies), {reason}")
+        return max(cursor.rowcount, 0)
+
+    def _prune(self):
+        """Forget finished messages past the retention window
+
+        Once forgotten, the same key can be enqueued again, so an offer that
+        is removed and re-listed later is announced again.
+        """
+        cutoff = (datetime.now() - self.retention).isoformat()
+        self.conn.execute(
+            """
+            DELETE FROM messages
+            WHERE created_at < ?
+              AND NOT EXISTS (
+                  SELECT 1 FROM deliveries d
+                  WHERE d.key = messages.key AND d.status = 'pending'
+              )
+            """,
+            (cutoff,),
+        )
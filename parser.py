@@ -1,10 +1,32 @@
+import argparse
 import asyncio
 import json
+import signal
+import time
 import yaml
 import os
+from contextlib import asynccontextmanager, nullcontext
 from playwright.async_api import async_playwright
 from telegram_bot import TelegramBot
-from helpers import track_changes, construct_search_url, normalize_offer_data
+from outbox import Outbox
+from helpers import (
+    diff_offers,
+    report_changes,
+    EarlyChanges,
+    construct_search_url,
+    OfferNormalizer,
+    TRACKED_FIELDS,
+)
+from offer_store import OfferStore
+from browser_session import BrowserSession
+from fetch_policy import FetchPolicy, IncompleteScrape
+from near_duplicates import NearDuplicateIndex
+from scan_policy import ScanPolicy, scan_decision
+from search_profiles import load_profiles
+from network_extraction import NetworkCapture
+from resource_blocking import ResourceBlocker, take_page_stats, format_page_stats
+from metrics import metrics
+from offer import Offer, json_default, offer_hook
 
 # Load .env file if it exists
 try:
@@ -16,102 +38,479 @@ except ImportError:
     pass
 
 
-async def parse_single_url(context, url, browser_config, scripts, max_retries=2):
-    """Parse a single URL and return offers"""
+async def extract_from_dom(page, scripts, fetch_policy, attempt=0):
+    """Wait for the offer cards to render and read them with primary_script
+
+    A wait timeout fails the attempt; fetch_page retries the whole page.
+    """
+    started = time.perf_counter()
+    with metrics.stage("page.wait_for_function"):
+        await page.wait_for_function(
+            scripts["wait_for_function"],
+            timeout=fetch_policy.timeout("wait_for_function", attempt),
+        )
+    fetch_policy.observe("wait_for_function", time.perf_counter() - started)
+
+    # Execute the primary script to extract data
+    with metrics.stage("page.evaluate"):
+        return await page.evaluate(scripts["primary_script"])
+
+
+async def parse_single_url(
+    context,
+    url,
+    browser_config,
+    scripts,
+    page=None,
+    fetch_policy=None,
+    attempt=0,
+):
+    """Parse a single URL and return offers
+
+    If a page is passed in it is reused and left open for the caller,
+    otherwise a fresh page is opened and closed around the request.
+    fetch_policy (default: the static timeouts of browser_config) sets the
+    timeouts of the attempt-th try and learns from its latencies. A
+    single try is made: retries are up to the caller (see fetch_page).
+
+    browser_config["extraction"] picks the engine: "dom" runs primary_script,
+    "network" reads the JSON listing payload and "auto" tries the payload
+    first, falling back to the DOM when none was captured.
+    """
     print(f"\nParsing: {url[:200]}...")
+    started = time.perf_counter()
+    offers_found = None
 
-    page = await context.new_page()
+    extraction = browser_config.get("extraction", "dom")
+    if fetch_policy is None:
+        fetch_policy = FetchPolicy({}, browser_config["timeouts"])
+    owns_page = page is None
+    if owns_page:
+        page = await context.new_page()
 
-    try:
-        # Navigate to URL
-        await page.goto(
-            url,
-            wait_until=browser_config["wait_until"],
-            timeout=browser_config["timeouts"]["wait_until"],
-        )
+    capture = (
+        NetworkCapture(page, browser_config.get("network_url_patterns", []))
+        if extraction != "dom"
+        else nullcontext()
+    )
 
-        # Wait for content to load using the wait function with retry logic
-        for attempt in range(max_retries):
-            try:
-                await page.wait_for_function(
-                    scripts["wait_for_function"],
-                    timeout=browser_config["timeouts"]["wait_for_function"],
+    try:
+        with capture:
+            # Navigate to URL
+            goto_started = time.perf_counter()
+            with metrics.stage("page.goto"):
+                response = await page.goto(
+                    url,
+                    wait_until=browser_config["wait_until"],
+                    timeout=fetch_policy.timeout("goto", attempt),
                 )
-                break  # Success, exit retry loop
-            except Exception as wait_error:
-                if attempt < max_retries - 1:
-                    print(f"⚠️  Wait timeout attempt {attempt + 1}/{max_retries}, retrying...")
-                    await asyncio.sleep(2)  # Wait 2 seconds before retry
-                else:
-                    print(f"❌ All {max_retries} wait attempts failed")
-                    raise wait_error
+            fetch_policy.observe("goto", time.perf_counter() - goto_started)
+
+            data = None
+            if extraction != "dom":
+                try:
+                    with metrics.stage("page.network_payload"):
+                        data = await capture.offers(response)
+                except Exception as e:
+                    if extraction == "network":
+                        raise
+                    print(f"⚠️  Unusable listing payload: {e}")
+                if data is None:
+                    if extraction == "network":
+                        raise RuntimeError("No listing payload found in page responses")
+                    print("⚠️  No listing payload found, falling back to DOM extraction")
 
-        # Execute the primary script to extract data
-        data = await page.evaluate(scripts["primary_script"])
+        if data is None:
+            data = await extract_from_dom(page, scripts, fetch_policy, attempt)
 
         print(f"Found {len(data)} offers")
+        offers_found = len(data)
         return data
 
     except Exception as e:
         print(f"Error parsing URL: {e}")
+        metrics.count("page_errors")
         raise e  # Re-raise the exception instead of returning empty array
 
     finally:
-        await page.close()
+        stats = take_page_stats(page)
+        if stats:
+            print(format_page_stats(stats))
+        if metrics.enabled:
+            metrics.count("pages_fetched")
+            metrics.count("offers_scraped", offers_found or 0)
+            metrics.page(
+                {
+                    "url": url,
+                    "seconds": round(time.perf_counter() - started, 3),
+                    "offers": offers_found,
+                    "requests": stats["requests"] if stats else None,
+                    "bytes": stats["bytes"] if stats else None,
+                }
+            )
+            if stats:
+                metrics.count("bytes_loaded", stats["bytes"])
+                metrics.count("requests_blocked", sum(stats["blocked"].values()))
+        if owns_page:
+            await page.close()
 
 
-async def parse_with_auto_pagination(base_url, browser_config, scripts, max_pages=20):
-    """Parse URL with automatic pagination detection"""
+def merge_page_offers(unique_offers, page_offers):
+    """Add unseen offers from one page to unique_offers, return how many were new"""
+    new_offers_count = 0
+    for offer in page_offers:
+        offer_id = offer.get("offer_id")
+        if offer_id and offer_id not in unique_offers:
+            unique_offers[offer_id] = offer
+            new_offers_count += 1
+    return new_offers_count
 
-    # Read scripts from YAML file
-    async with async_playwright() as p:
-        # Launch browser
-        browser = await p.chromium.launch(
-            headless=browser_config["headless"], args=browser_config["args"]
-        )
-        context = await browser.new_context(user_agent=browser_config["user_agent"])
 
+def is_last_page(page_num, page_offers, new_offers_count, known_prices):
+    """Stop rule: nothing new on the page, or (head scans) nothing unseen
+
+    known_prices maps offer_id -> price_numeric from the previous snapshot;
+    when given, a page whose offers are all known at unchanged prices ends
+    the scan, since results are sorted newest first.
+    """
+    if new_offers_count == 0:
+        return True
+    if known_prices is not None and all(
+        offer.get("offer_id") in known_prices
+        and known_prices[offer["offer_id"]] == offer.get("price_numeric")
+        for offer in page_offers
+    ):
+        print(f"⏹️  Page {page_num} has only known offers, stopping head scan")
+        return True
+    return False
+
+
+class PagePool:
+    """Reusable pages shared by every pagination of a run
+
+    Pages are opened lazily up to `size` and handed out one caller at a
+    time, so `size` caps the pages open in the browser across all search
+    profiles scraped concurrently. A page whose caller failed is closed
+    rather than handed out again, so a retry gets a fresh page. fetch_policy,
+    shared the same way, governs timeouts, retries and the circuit breaker
+    of every page load.
+    """
+
+    def __init__(self, context, size, fetch_policy):
+        self.context = context
+        self.size = size
+        self.fetch_policy = fetch_policy
+        self.idle = asyncio.Queue()
+        self.opened = 0
+        self.pages = []
+
+    @asynccontextmanager
+    async def page(self):
+        while True:
+            if self.idle.empty() and self.opened < self.size:
+                # Count the page before awaiting, so concurrent callers
+                # cannot open more than size between them
+                self.opened += 1
+                try:
+                    page = await self.context.new_page()
+                except BaseException:
+                    self.opened -= 1
+                    # Wake a caller waiting for an idle page: it may open one now
+                    self.idle.put_nowait(None)
+                    raise
+                self.pages.append(page)
+                break
+            page = await self.idle.get()
+            if page is not None:
+                break
         try:
-            unique_offers = {}
+            yield page
+        except Exception:
+            # The page may have crashed or closed: never hand it out again
+            self.pages.remove(page)
+            self.opened -= 1
+            self.idle.put_nowait(None)
+            try:
+                await page.close()
+            except Exception:
+                pass
+            raise
+        except BaseException:
+            # Cancelled (e.g. a speculative fetch past the end): the page is fine
+            self.idle.put_nowait(page)
+            raise
+        else:
+            self.idle.put_nowait(page)
 
-            print(f"\n{'='*60}")
+    async def close(self):
+        for page in self.pages:
+            await page.close()
+        self.idle = asyncio.Queue()
+        self.pages = []
+        self.opened = 0
 
-            for page_num in range(1, max_pages + 1):
-                # Generate URL for this page
-                page_url = f"{base_url}&p={page_num}"
 
-                # Parse this page
-                page_offers = await parse_single_url(
-                    context, page_url, browser_config, scripts
+def run_fetch_policy(browser_config):
+    return FetchPolicy(browser_config.get("fetch", {}), browser_config["timeouts"])
+
+
+async def fetch_page(pool, url, browser_config, scripts):
+    """parse_single_url on a pooled page, retried under the pool's FetchPolicy
+
+    This is the only retry layer for page loads: a failed attempt (goto,
+    wait or extraction) is retried after a jittered backoff with longer
+    timeouts; while the circuit breaker is open the page fails at once.
+    """
+    policy = pool.fetch_policy
+    for attempt in range(policy.max_attempts):
+        policy.check()
+        try:
+            async with pool.page() as page:
+                offers = await parse_single_url(
+                    pool.context,
+                    url,
+                    browser_config,
+                    scripts,
+                    page=page,
+                    fetch_policy=policy,
+                    attempt=attempt,
                 )
+        except Exception:
+            policy.failed()
+            if attempt == policy.max_attempts - 1:
+                raise
+            delay = policy.backoff(attempt)
+            print(
+                f"⚠️  Page attempt {attempt + 1}/{policy.max_attempts} failed, "
+                f"retrying in {delay:.1f}s"
+            )
+            metrics.count("page_retries")
+            await asyncio.sleep(delay)
+        else:
+            policy.succeeded()
+            return offers
 
-                # Check for new offers
-                new_offers_count = 0
-                for offer in page_offers:
-                    offer_id = offer.get("offer_id")
-                    if offer_id and offer_id not in unique_offers:
-                        unique_offers[offer_id] = offer
-                        new_offers_count += 1
 
-                print(f"Page {page_num}: {new_offers_count} unique offers")
+async def paginate_sequentially(
+    pool, base_url, browser_config, scripts, max_pages, known_prices=None, on_page=None
+):
+    """Fetch &p=1, &p=2, ... one at a time until is_last_page says stop
 
-                # If no new offers found, increment counter
-                if new_offers_count == 0:
-                    break
+    on_page, if given, is a coroutine function mapping each page's offers
+    (e.g. normalizing them) as soon as the page is parsed. A page failing
+    after earlier ones worked raises IncompleteScrape with their offers.
+    """
+    unique_offers = {}
 
-            unique_offers_list = list(unique_offers.values())
+    for page_num in range(1, max_pages + 1):
+        # Generate URL for this page
+        page_url = f"{base_url}&p={page_num}"
 
-            print(f"\n🎯 TOTAL UNIQUE OFFERS: {len(unique_offers_list)}")
+        # Parse this page
+        try:
+            page_offers = await fetch_page(pool, page_url, browser_config, scripts)
+        except Exception as e:
+            if not unique_offers:
+                raise
+            raise IncompleteScrape(list(unique_offers.values()), page_num, e) from e
+        if on_page is not None:
+            page_offers = await on_page(page_offers)
 
-            return unique_offers_list
+        # Check for new offers
+        new_offers_count = merge_page_offers(unique_offers, page_offers)
+        print(f"Page {page_num}: {new_offers_count} unique offers")
 
-        finally:
-            await browser.close()
+        # Stop as soon as a page brings nothing new
+        if is_last_page(page_num, page_offers, new_offers_count, known_prices):
+            break
+
+    return unique_offers
+
+
+async def paginate_concurrently(
+    pool, base_url, browser_config, scripts, max_pages, concurrency, on_page=None
+):
+    """Fetch pages speculatively through the shared page pool
+
+    Up to `concurrency` pages are in flight at once (fewer when other
+    profiles hold pages of the pool), but results are merged strictly in
+    page order, so the stop rule and the resulting offer order are the same
+    as in paginate_sequentially. Pages fetched past the end are cancelled.
+    on_page runs on each page as soon as it arrives, in whatever order,
+    while later pages are still loading. A page failing after earlier ones
+    worked raises IncompleteScrape with their offers.
+    """
+
+    async def fetch(page_num):
+        page_offers = await fetch_page(
+            pool, f"{base_url}&p={page_num}", browser_config, scripts
+        )
+        return await on_page(page_offers) if on_page is not None else page_offers
 
+    unique_offers = {}
+    in_flight = {}
+    next_page = 1
 
-async def parse_listings_auto(data_file="data/current_data.json"):
-    """Main function with automatic pagination"""
+    try:
+        for page_num in range(1, max_pages + 1):
+            # Keep the window of speculative fetches full
+            while next_page <= max_pages and next_page < page_num + concurrency:
+                in_flight[next_page] = asyncio.create_task(fetch(next_page))
+                next_page += 1
+
+            try:
+                page_offers = await in_flight.pop(page_num)
+            except Exception as e:
+                if not unique_offers:
+                    raise
+                raise IncompleteScrape(list(unique_offers.values()), page_num, e) from e
+
+            new_offers_count = merge_page_offers(unique_offers, page_offers)
+            print(f"Page {page_num}: {new_offers_count} unique offers")
+
+            if is_last_page(page_num, page_offers, new_offers_count, None):
+                break
+
+        return unique_offers
+
+    finally:
+        if in_flight:
+            print(f"🛑 Cancelling {len(in_flight)} speculative page(s) past the end")
+        for task in in_flight.values():
+            task.cancel()
+        await asyncio.gather(*in_flight.values(), return_exceptions=True)
+
+
+async def launch_browser(playwright, browser_config):
+    """Launch Chromium and open the scraping context
 
+    The context resumes the session saved by earlier runs (see
+    BrowserSession). With a session profile_dir Chromium runs on that
+    persistent profile, and the returned browser is the context itself
+    (closing it closes Chromium).
+    """
+    session = BrowserSession(browser_config.get("session", {}))
+    blocking_config = browser_config.get("blocking", {})
+    if session.profile_dir:
+        # Playwright turns the HTTP cache off while requests are routed
+        cache_args = session.cache_args()
+        if blocking_config.get("enabled"):
+            print("ℹ️  Resource blocking disables the HTTP cache: the profile keeps cookies only")
+            cache_args = []
+        context = await playwright.chromium.launch_persistent_context(
+            session.prepare_profile(),
+            headless=browser_config["headless"],
+            args=browser_config["args"] + cache_args,
+            user_agent=browser_config["user_agent"],
+        )
+        browser = context
+    else:
+        browser = await playwright.chromium.launch(
+            headless=browser_config["headless"], args=browser_config["args"]
+        )
+        storage_state = session.storage_state()
+        if storage_state:
+            print(f"🍪 Restoring browser state from {storage_state}")
+        context = await browser.new_context(
+            user_agent=browser_config["user_agent"], storage_state=storage_state
+        )
+
+    if blocking_config.get("enabled"):
+        await ResourceBlocker(blocking_config).install(context)
+
+    return browser, context
+
+
+async def close_browser(browser):
+    """Close a browser that may already have crashed"""
+    if browser is None:
+        return
+    try:
+        await browser.close()
+    except Exception as e:
+        print(f"⚠️  Failed to close browser: {e}")
+
+
+def page_pool_size(browser_config):
+    """Pages open at once across all profiles (max_open_pages, default: concurrency)"""
+    return browser_config.get("max_open_pages", browser_config.get("concurrency", 1))
+
+
+async def scrape_offers(
+    pool, base_url, browser_config, scripts, max_pages, known_prices=None, on_page=None
+):
+    """Paginate through the search results with pages from a PagePool
+
+    With known_prices this is a head scan: it stops at the first page that
+    holds only known offers, and runs sequentially since it rarely needs
+    more than a page or two.
+    """
+    concurrency = browser_config.get("concurrency", 1)
+
+    print(f"\n{'='*60}")
+
+    if known_prices is not None:
+        print("🔎 Head scan: stopping at the first page of known offers")
+        unique_offers = await paginate_sequentially(
+            pool, base_url, browser_config, scripts, max_pages, known_prices, on_page
+        )
+    elif concurrency > 1:
+        print(f"⚡ Fetching up to {concurrency} pages concurrently")
+        unique_offers = await paginate_concurrently(
+            pool, base_url, browser_config, scripts, max_pages, concurrency, on_page
+        )
+    else:
+        unique_offers = await paginate_sequentially(
+            pool, base_url, browser_config, scripts, max_pages, on_page=on_page
+        )
+
+    unique_offers_list = list(unique_offers.values())
+
+    print(f"\n🎯 TOTAL UNIQUE OFFERS: {len(unique_offers_list)}")
+
+    return unique_offers_list
+
+
+async def parse_with_auto_pagination(
+    base_url,
+    browser_config,
+    scripts,
+    max_pages=20,
+    context=None,
+    known_prices=None,
+    pool=None,
+    on_page=None,
+):
+    """Parse URL with automatic pagination detection
+
+    Pass a pool (or a context) to reuse a browser that is already running,
+    otherwise a browser is launched and closed just for this call. Pass
+    known_prices for a head scan (see scrape_offers) and on_page to process
+    each page's offers as they arrive.
+    """
+    if pool is not None:
+        return await scrape_offers(
+            pool, base_url, browser_config, scripts, max_pages, known_prices, on_page
+        )
+
+    async with async_playwright() if context is None else nullcontext() as p:
+        browser = None
+        if context is None:
+            browser, context = await launch_browser(p, browser_config)
+        pool = PagePool(
+            context, page_pool_size(browser_config), run_fetch_policy(browser_config)
+        )
+        try:
+            return await scrape_offers(
+                pool, base_url, browser_config, scripts, max_pages, known_prices, on_page
+            )
+        finally:
+            await pool.close()
+            await close_browser(browser)
+
+
+def load_configs():
+    """Load all YAML configs, applying the BOT_TOKEN override"""
     with open("configs/config_search.yaml", "r") as f:
         search_config = yaml.safe_load(f)
     with open("configs/config_browser.yaml", "r") as f:
@@ -120,70 +519,538 @@ async def parse_listings_auto(data_file="data/current_data.json"):
         scripts = yaml.safe_load(f)
     with open("configs/config_telegram.yaml", "r") as f:
         telegram_config = yaml.safe_load(f)
+    with open("configs/config_storage.yaml", "r") as f:
+        storage_config = yaml.safe_load(f)
     bot_token = os.getenv("BOT_TOKEN")
     if bot_token:
         telegram_config["token"] = bot_token
         print("🔑 Using bot token from BOT_TOKEN environment variable")
+    return search_config, browser_config, scripts, telegram_config, storage_config
 
-    print("\nSearch parameters:")
-    for key, value in search_config.items():
-        print(f"  {key}: {value}")
 
-    try:
-        # Generate base URL
-        base_url = construct_search_url(search_config)
-        current_data = await parse_with_auto_pagination(
-            base_url, browser_config, scripts
-        )
+def normalize_once(offers, normalized_offers, normalizer):
+    """Normalize only offers no other profile has normalized yet this run
+
+    normalized_offers maps offer_id -> normalized Offer and is shared by all
+    profiles of a run; offers already in it are replaced by that object.
+    """
+    with metrics.stage("normalize"):
+        # Like merge_page_offers, offers without an id are dropped
+        offers = [offer for offer in offers if offer.get("offer_id")]
+        fresh = [offer for offer in offers if offer["offer_id"] not in normalized_offers]
+        for offer in normalizer.normalize(fresh):
+            normalized_offers[offer["offer_id"]] = Offer.from_dict(offer)
+        return [normalized_offers[offer["offer_id"]] for offer in offers]
 
-        # Normalize offer data (parse dates, etc.)
-        current_data = normalize_offer_data(current_data)
 
-        # Track changes
-        with open(data_file, "r", encoding="utf-8") as f:
-            previous_data = json.load(f)
-        changes = track_changes(current_data, previous_data)
+async def scan_profile(
+    profile,
+    pool,
+    browser_config,
+    scripts,
+    storage_config,
+    outbox,
+    subscriptions,
+    normalize_page,
+    previous_data=None,
+    near_duplicates=None,
+    scan_policy=None,
+    scan_mode=None,
+    early_changes=None,
+):
+    """Scrape one search profile, queue its changes and save its snapshot
 
-        # Send Telegram notifications
-        bot = TelegramBot(telegram_config)
-        if changes:
-            bot.send_tracking_updates(changes)
+    Each change is queued for the profile's chats whose subscription filter
+    matches it. Returns (current_data, changes). previous_data skips
+    reading the profile's data file (it is not needed with the sqlite
+    storage backend, which diffs against the offer store). A profile
+    without any previous state is seeded silently instead of announcing
+    every offer as new. near_duplicates, a NearDuplicateIndex shared by
+    all profiles, tags or drops reposted offers. scan_policy and scan_mode
+    carry a decision taken before the run (see profile_scan_policy).
+    early_changes, a bounded asyncio.Queue, receives (changes, recipients)
+    for the new offers and price changes found on each page (see
+    EarlyChanges) while later pages still load; the changes reported at
+    the end of the crawl include them again, which the outbox ignores.
+    """
+    name = profile["name"]
+    data_file = profile["data_file"]
+    tracked_fields = storage_config.get("tracked_fields") or TRACKED_FIELDS
 
-        # Create workflow trigger flags only if there are actual changes
-        if changes:
-            os.makedirs("data", exist_ok=True)
+    if scan_policy is None:
+        scan_policy = profile_scan_policy(profile, browser_config)
+    if scan_mode is None:
+        scan_mode = scan_policy.next_mode()
+        print(f"\n🧭 [{name}] Scan mode: {scan_mode}")
 
-            # Categorize changes
-            has_new = any(
-                "current_offer" in change and "previous_offer" not in change
-                for change in changes
+    # Load the previous snapshot
+    store = None
+    first_run = False
+    with metrics.stage("load_previous"):
+        if storage_config.get("backend") == "sqlite":
+            store = OfferStore(profile["store_file"])
+            if store.is_empty():
+                if os.path.exists(data_file):
+                    with open(data_file, "r", encoding="utf-8") as f:
+                        store.import_snapshot(json.load(f, object_hook=offer_hook))
+                else:
+                    first_run = True
+            # A full scan diffs inside the store, only head scans need the offers
+            previous_data = store.active_offers() if scan_mode == "head" else None
+        elif previous_data is None:
+            if os.path.exists(data_file) or name == "default":
+                with open(data_file, "r", encoding="utf-8") as f:
+                    previous_data = json.load(f, object_hook=offer_hook)
+            else:
+                first_run = True
+                previous_data = []
+
+    if first_run:
+        # Nothing to compare against: sweep everything once
+        scan_mode = "full"
+
+    known_prices = None
+    if scan_mode == "head":
+        known_prices = {
+            offer["offer_id"]: offer.get("price_numeric") for offer in previous_data
+        }
+
+    early = None
+    if early_changes is not None and not first_run:
+        if previous_data is None:
+            previous_data = store.active_offers()
+        early = EarlyChanges(previous_data, tracked_fields, near_duplicates)
+
+    async def on_page(offers):
+        # Offer data is normalized (parse dates, etc.) page by page as it arrives
+        offers = normalize_page(offers)
+        if early is not None:
+            changes = early.page(offers)
+            if changes:
+                print(f"⚡ [{name}] {len(changes)} change(s) queued ahead of the crawl's end")
+                # Blocks while the notifier is behind, which slows the crawl down
+                await early_changes.put(
+                    (
+                        changes,
+                        [
+                            subscriptions.recipients(change, profile["chat_ids"])
+                            for change in changes
+                        ],
+                    )
+                )
+        return offers
+
+    # Generate base URL
+    base_url = construct_search_url(profile["search"])
+    complete = True
+    with metrics.stage("scrape"):
+        try:
+            current_data = await parse_with_auto_pagination(
+                base_url,
+                browser_config,
+                scripts,
+                known_prices=known_prices,
+                pool=pool,
+                on_page=on_page,
             )
-            has_removed = any(
-                "previous_offer" in change and "current_offer" not in change
-                for change in changes
+        except IncompleteScrape as e:
+            # Keep what the earlier pages found, but treat it like a head
+            # scan: the rest of the list was not seen, so nothing is removed
+            print(
+                f"⚠️  [{name}] Incomplete scrape, {e}: keeping {len(e.offers)} offers "
+                "from earlier pages, no removals this run"
             )
-            has_price_changes = any(
-                "current_offer" in change and "previous_offer" in change
-                for change in changes
+            metrics.count("incomplete_scrapes")
+            current_data = e.offers
+            complete = False
+            if store is not None and previous_data is None:
+                previous_data = store.active_offers()
+
+    # Track changes
+    with metrics.stage("track_changes"):
+        current_offers = {offer["offer_id"]: offer for offer in current_data}
+        if store is not None and scan_mode == "full" and complete:
+            previous_offers = {}
+            raw_changes = store.diff(current_data, tracked_fields)
+        else:
+            previous_offers = {offer["offer_id"]: offer for offer in previous_data}
+            raw_changes = diff_offers(current_offers, previous_offers, tracked_fields)
+
+        if scan_mode == "head" or not complete:
+            # A head scan only saw the newest offers, so it cannot tell what
+            # was removed: keep everything else from the previous snapshot
+            raw_changes = (raw_changes[0], raw_changes[1], [])
+            for offer_id, offer in previous_offers.items():
+                current_offers.setdefault(offer_id, offer)
+            current_data = list(current_offers.values())
+
+        if first_run:
+            print(f"🌱 [{name}] First run: saving {len(current_data)} offers without notifications")
+            changes = []
+        else:
+            changes = report_changes(
+                *raw_changes, current_offers, previous_offers, near_duplicates
             )
 
-            if has_removed:
-                with open("data/workflow_trigger", "w") as f:
-                    f.write("mode=update\nsearch=wide")
-            elif has_new or has_price_changes:
-                with open("data/workflow_trigger", "w") as f:
-                    f.write("mode=new\nsearch=narrow")
+    # Queue notifications durably before the snapshot moves on, so a
+    # crash from here on neither loses nor repeats them
+    if changes:
+        with metrics.stage("outbox.enqueue"):
+            outbox.enqueue(
+                changes,
+                [subscriptions.recipients(change, profile["chat_ids"]) for change in changes],
+            )
+
+    # Save current data
+    with metrics.stage("save_snapshot"):
+        if store is not None:
+            store.apply(*raw_changes)
+            store.close()
+        if store is None or storage_config.get("export_json", False):
+            os.makedirs(os.path.dirname(data_file) or ".", exist_ok=True)
+            tmp_file = f"{data_file}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(
+                    current_data, f, ensure_ascii=False, indent=2, default=json_default
+                )
+            os.replace(tmp_file, data_file)
+    metrics.count("changes", len(changes))
+
+    scan_policy.record(scan_mode, None if first_run else len(raw_changes[0]), complete)
+
+    return current_data, changes
+
+
+async def notify_early(early_changes, outbox, bot):
+    """Queue and send the changes scan_profile finds ahead of the crawl's end
+
+    Runs until it takes None off early_changes. Each batch is drained on
+    its own, so drains never overlap. Returns the perf_counter time of
+    the first message sent, or None.
+    """
+    first_sent = None
+    while True:
+        batch = await early_changes.get()
+        if batch is None:
+            return first_sent
+        changes, recipients = batch
+        try:
+            with metrics.stage("notify_early"):
+                outbox.enqueue(changes, recipients)
+                results = await bot.drain_outbox_async(outbox)
+        except Exception as e:
+            # Whatever was not sent goes out with the final drain
+            print(f"⚠️  Early notification failed: {e}")
+            continue
+        if first_sent is None and any(
+            message_id is not None for sent in results.values() for message_id in sent
+        ):
+            first_sent = time.perf_counter()
+
+
+def profile_scan_policy(profile, browser_config):
+    return ScanPolicy(
+        dict(browser_config.get("scan", {}), state_file=profile["scan_state_file"])
+    )
+
+
+def write_workflow_trigger(changes):
+    """Create workflow trigger flags only if there are actual changes"""
+    if not changes:
+        return
+
+    os.makedirs("data", exist_ok=True)
+
+    # Categorize changes
+    has_new = any(
+        "current_offer" in change and "previous_offer" not in change
+        for change in changes
+    )
+    has_removed = any(
+        "previous_offer" in change and "current_offer" not in change
+        for change in changes
+    )
+    has_price_changes = any(
+        "current_offer" in change and "previous_offer" in change
+        for change in changes
+    )
+
+    if has_removed:
+        with open("data/workflow_trigger", "w") as f:
+            f.write("mode=update\nsearch=wide")
+    elif has_new or has_price_changes:
+        with open("data/workflow_trigger", "w") as f:
+            f.write("mode=new\nsearch=narrow")
 
-        # Save current data
-        with open(data_file, "w", encoding="utf-8") as f:
-            json.dump(current_data, f, ensure_ascii=False, indent=2)
+
+async def parse_listings_auto(
+    data_file="data/current_data.json",
+    context=None,
+    previous_data=None,
+    exit_on_error=True,
+):
+    """Main function with automatic pagination
+
+    Scrapes every search profile concurrently over one browser (launched
+    here unless a context is passed in). previous_data is a dict
+    {profile name: offers} that skips reading the profiles' data files; it
+    is updated in place with the snapshot of every profile that finished,
+    even when another one failed, and returned. data_file is the snapshot
+    of a flat, single-profile config. With exit_on_error=False failures are
+    re-raised instead of exiting.
+    """
+
+    (
+        search_config,
+        browser_config,
+        scripts,
+        telegram_config,
+        storage_config,
+    ) = load_configs()
+
+    if previous_data is None:
+        previous_data = {}
+
+    metrics.start_run(storage_config.get("metrics", {}))
+    run_started = time.perf_counter()
+
+    try:
+        profiles = load_profiles(
+            search_config,
+            telegram_config["chat_ids"],
+            data_file,
+            storage_config.get("store_file", "data/offers.sqlite"),
+            browser_config.get("scan", {}).get("state_file", "data/scan_state.json"),
+        )
+        for profile in profiles:
+            print(f"\nSearch parameters [{profile['name']}]:")
+            for key, value in profile["search"].items():
+                print(f"  {key}: {value}")
+
+        # Decide every profile's scan up front: adaptive scheduling skips
+        # profiles where nothing new is expected, and when it skips them
+        # all the browser is not even launched
+        scan_policies = {}
+        scan_modes = {}
+        for profile in profiles:
+            name = profile["name"]
+            scan_policies[name] = profile_scan_policy(profile, browser_config)
+            scan_modes[name] = scan_policies[name].next_mode()
+            reason = scan_policies[name].reason
+            reason = f" ({reason})" if reason else ""
+            print(f"\n🧭 [{name}] Scan mode: {scan_modes[name]}{reason}")
+        scan_decision(scan_modes.values())
+        scanned = [profile for profile in profiles if scan_modes[profile["name"]] != "skip"]
+
+        # Every chat of every profile drains from one outbox, so a chat
+        # subscribed to several profiles gets each change only once
+        bot = TelegramBot(
+            dict(
+                telegram_config,
+                chat_ids=list(
+                    dict.fromkeys(
+                        chat_id for profile in profiles for chat_id in profile["chat_ids"]
+                    )
+                ),
+            )
+        )
+        outbox = Outbox(
+            telegram_config.get("outbox_file", "data/outbox.sqlite"),
+            max_attempts=telegram_config.get("outbox_max_attempts", 5),
+        )
+        # One normalizer and one offer cache for all profiles: "now" is fixed
+        # for the run and an offer found by several profiles is normalized once
+        normalizer = OfferNormalizer(
+            tracked_fields=storage_config.get("tracked_fields") or TRACKED_FIELDS
+        )
+        normalized_offers = {}
+
+        def normalize_page(offers):
+            return normalize_once(offers, normalized_offers, normalizer)
+
+        outcomes = []
+        first_sent = None
+        if scanned:
+            # Changes found on the first pages are notified while later
+            # pages load; the bounded queue holds the crawl back instead of
+            # piling up batches when Telegram is slower than the site
+            early_changes = None
+            notifier = None
+            pipeline_config = telegram_config.get("pipeline", {})
+            if pipeline_config.get("enabled"):
+                early_changes = asyncio.Queue(maxsize=pipeline_config.get("queue_size", 8))
+                notifier = asyncio.create_task(notify_early(early_changes, outbox, bot))
+
+            near_duplicates = None
+            if storage_config.get("near_duplicates", {}).get("enabled"):
+                near_duplicates = NearDuplicateIndex(storage_config["near_duplicates"])
+            # One policy for all profiles: they load pages from the same site
+            fetch_policy = run_fetch_policy(browser_config)
+
+            async with async_playwright() if context is None else nullcontext() as p:
+                browser = None
+                if context is None:
+                    browser, context = await launch_browser(p, browser_config)
+                pool = PagePool(context, page_pool_size(browser_config), fetch_policy)
+                try:
+                    outcomes = await asyncio.gather(
+                        *(
+                            scan_profile(
+                                profile,
+                                pool,
+                                browser_config,
+                                scripts,
+                                storage_config,
+                                outbox,
+                                bot.subscriptions,
+                                normalize_page,
+                                previous_data.get(profile["name"]),
+                                near_duplicates,
+                                scan_policies[profile["name"]],
+                                scan_modes[profile["name"]],
+                                early_changes,
+                            )
+                            for profile in scanned
+                        ),
+                        return_exceptions=True,
+                    )
+                    # Only a session every profile scraped fine with is worth resuming
+                    if not any(isinstance(outcome, BaseException) for outcome in outcomes):
+                        await BrowserSession(browser_config.get("session", {})).save(context)
+                finally:
+                    if notifier is not None:
+                        await early_changes.put(None)
+                        first_sent = await notifier
+                    await pool.close()
+                    await close_browser(browser)
+                    fetch_policy.save()
+                    if near_duplicates is not None:
+                        near_duplicates.save()
+                        near_duplicates.close()
+
+        changes = []
+        failures = []
+        for profile, outcome in zip(scanned, outcomes):
+            if isinstance(outcome, BaseException):
+                print(f"❌ [{profile['name']}] PARSING FAILED: {outcome}")
+                failures.append(outcome)
+            else:
+                previous_data[profile["name"]], profile_changes = outcome
+                changes.extend(profile_changes)
+
+        write_workflow_trigger(changes)
+
+        # Send whatever is pending, including leftovers of an interrupted run
+        with metrics.stage("notify"):
+            results = await bot.drain_outbox_async(outbox)
+        outbox.close()
+        if first_sent is None and any(
+            message_id is not None for sent in results.values() for message_id in sent
+        ):
+            first_sent = time.perf_counter()
+        first_notification = None
+        if first_sent is not None:
+            first_notification = round(first_sent - run_started, 3)
+            print(f"⏱️  First notification {first_notification}s into the run")
+
+        if failures:
+            raise failures[0]
+
+        metrics.finish_run(
+            "ok",
+            profiles=[profile["name"] for profile in scanned],
+            first_notification_seconds=first_notification,
+        )
+        return previous_data
 
     except Exception as e:
+        metrics.finish_run("failed", error=str(e))
         print(f"❌ PARSING FAILED: {e}")
         print("🛡️  Preserving existing data - no changes made to current_data.json")
+        if not exit_on_error:
+            raise
         # Exit with error code so GitHub Actions knows it failed
         exit(1)
 
 
+async def run_daemon(interval, recycle_after, data_file="data/current_data.json"):
+    """Run parse_listings_auto every `interval` seconds over a warm browser
+
+    The browser is relaunched after `recycle_after` runs and after any failed
+    run. Each profile's previous snapshot is kept in memory between runs; a
+    profile that fails leaves its snapshot untouched. SIGTERM/SIGINT stop
+    the loop once the current run has finished.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    _, browser_config, _, _, _ = load_configs()
+    previous_data = {}
+    browser = None
+    runs_on_browser = 0
+
+    async with async_playwright() as p:
+        try:
+            while not stop.is_set():
+                started = loop.time()
+                try:
+                    if browser is None:
+                        print("\n🚀 Launching browser")
+                        browser, context = await launch_browser(p, browser_config)
+                        runs_on_browser = 0
+
+                    await parse_listings_auto(
+                        data_file,
+                        context=context,
+                        previous_data=previous_data,
+                        exit_on_error=False,
+                    )
+                    runs_on_browser += 1
+                    if runs_on_browser >= recycle_after:
+                        print(f"♻️  Recycling browser after {runs_on_browser} runs")
+                        await close_browser(browser)
+                        browser = None
+                except Exception as e:
+                    print(f"♻️  Recycling browser after failed run: {e}")
+                    await close_browser(browser)
+                    browser = None
+
+                # Sleep until the next slot, waking early on shutdown
+                delay = max(0, interval - (loop.time() - started))
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await close_browser(browser)
+
+    print("👋 Daemon stopped")
+
+
 if __name__ == "__main__":
-    asyncio.run(parse_listings_auto())
+    ap = argparse.ArgumentParser(description="Scrape listings and notify about changes")
+    ap.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep running and scrape on a schedule over a warm browser",
+    )
+    ap.add_argument(
+        "--interval",
+        type=float,
+        default=300,
+        help="Seconds between daemon runs (default: 300)",
+    )
+    ap.add_argument(
+        "--recycle-after",
+        type=int,
+        default=50,
+        help="Relaunch the browser after this many daemon runs (default: 50)",
+    )
+    args = ap.parse_args()
+
+    if args.daemon:
+        asyncio.run(run_daemon(args.interval, args.recycle_after))
+    else:
+        asyncio.run(parse_listings_auto())
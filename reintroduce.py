@@ -6,44 +6,138 @@ recovering after a flood / extended downtime. Sending any message
 reinstates the chat entry in the user's chat list — UNLESS the user
 blocked the bot. If blocked, Telegram returns HTTP 403 and the only
 recovery is for the user to manually unblock and /start the bot.
+
+Messages go out concurrently over pooled connections under a global rate
+limit; concurrency backs off when Telegram answers 429 and grows again
+while sends succeed. Every outcome is appended to a checkpoint file, so
+rerunning with the same message only retries the chats that did not get
+it. Chats that blocked the bot are recorded in the blocked chats file,
+which TelegramBot also skips.
 """
 import argparse
+import asyncio
+import hashlib
 import json
 import os
 import sys
 import time
-from pathlib import Path
+from datetime import datetime
 
 import requests
+import requests.adapters
 import yaml
 
+from blocked_chats import BlockedChats
+from message_log import MessageLog
+from rate_limit import TokenBucket
+
+CONFIG_FILE = "configs/config_telegram.yaml"
+MESSAGE_LOG_FILE = "data/telegram_messages.jsonl"
+LEGACY_MESSAGE_LOG_FILE = "data/telegram_messages.json"
+CHECKPOINT_FILE = "data/reintroduce_checkpoint.jsonl"
+# Outcomes a rerun of the same message does not retry
+FINAL_OUTCOMES = ("ok", "blocked")
+
+
+def load_config() -> dict:
+    with open(CONFIG_FILE) as f:
+        return yaml.safe_load(f)
+
 
 def load_chat_ids(source: str) -> list[str]:
     if source == "config":
-        with open("configs/config_telegram.yaml") as f:
-            cfg = yaml.safe_load(f)
-        return [str(x) for x in cfg["chat_ids"]]
+        return [str(x) for x in load_config()["chat_ids"]]
     if source == "messages":
-        path = Path("data/telegram_messages.json")
-        if not path.exists():
-            return []
-        with open(path) as f:
-            log = json.load(f)
-        seen: list[str] = []
-        for entry in log:
+        log = MessageLog(MESSAGE_LOG_FILE, legacy_path=LEGACY_MESSAGE_LOG_FILE)
+        seen: dict[str, None] = {}
+        for entry in log.iter_messages():
             cid = str(entry.get("chat_id"))
-            if cid and cid != "None" and cid not in seen:
-                seen.append(cid)
-        return seen
+            if cid and cid != "None":
+                seen.setdefault(cid)
+        return list(seen)
     raise ValueError(f"unknown source: {source}")
 
 
-def send_one(token: str, chat_id: str, text: str) -> tuple[str, str]:
-    """Returns (outcome, detail) where outcome is 'ok' | 'blocked' | 'error'."""
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
+class Checkpoint:
+    """Append-only JSONL record of each chat's outcome, per message text"""
+
+    def __init__(self, path: str, text: str):
+        self.path = path
+        self.message = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+        self.outcomes: dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Truncated line from an interrupted run
+                        continue
+                    if entry.get("message") == self.message:
+                        self.outcomes[entry["chat_id"]] = entry["outcome"]
+
+    def done(self, chat_id: str) -> bool:
+        return self.outcomes.get(chat_id) in FINAL_OUTCOMES
+
+    def record(self, chat_id: str, outcome: str, detail: str) -> None:
+        self.outcomes[chat_id] = outcome
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        entry = {
+            "message": self.message,
+            "chat_id": chat_id,
+            "outcome": outcome,
+            "detail": detail,
+            "at": datetime.now().isoformat(),
+        }
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class AdaptiveConcurrency:
+    """Limit on sends in flight: +1 after `grow_after` successes in a row,
+    halved whenever Telegram answers 429"""
+
+    def __init__(self, initial: int, maximum: int, grow_after: int = 10):
+        self.limit = min(initial, maximum)
+        self.maximum = maximum
+        self.grow_after = grow_after
+        self.in_flight = 0
+        self.streak = 0
+        self._changed = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def __aexit__(self, *exc_info):
+        async with self._changed:
+            self.in_flight -= 1
+            self._changed.notify_all()
+
+    async def succeeded(self) -> None:
+        self.streak += 1
+        if self.streak >= self.grow_after and self.limit < self.maximum:
+            self.streak = 0
+            async with self._changed:
+                self.limit += 1
+                self._changed.notify_all()
+
+    def throttled(self) -> None:
+        self.streak = 0
+        self.limit = max(1, self.limit // 2)
+
+
+def send_one(
+    session: requests.Session, base_url: str, chat_id: str, text: str
+) -> tuple[str, str, float | None]:
+    """Returns (outcome, detail, retry_after) where outcome is
+    'ok' | 'blocked' | 'error' | 'retry'."""
     try:
-        r = requests.post(
-            url,
+        r = session.post(
+            f"{base_url}/sendMessage",
             data={
                 "chat_id": chat_id,
                 "text": text,
@@ -53,13 +147,73 @@ def send_one(token: str, chat_id: str, text: str) -> tuple[str, str]:
             timeout=10,
         )
     except requests.RequestException as e:
-        return ("error", f"network: {e}")
+        return ("retry", f"network: {e}", None)
     if r.status_code == 200:
         mid = r.json().get("result", {}).get("message_id")
-        return ("ok", f"message_id={mid}")
+        return ("ok", f"message_id={mid}", None)
     if r.status_code == 403:
-        return ("blocked", r.json().get("description", "Forbidden"))
-    return ("error", f"HTTP {r.status_code}: {r.text[:200]}")
+        return ("blocked", r.json().get("description", "Forbidden"), None)
+    if r.status_code == 429:
+        retry_after = r.json().get("parameters", {}).get("retry_after", 1)
+        return ("retry", f"HTTP 429: retry after {retry_after}s", retry_after)
+    if r.status_code >= 500:
+        return ("retry", f"HTTP {r.status_code}: {r.text[:200]}", None)
+    return ("error", f"HTTP {r.status_code}: {r.text[:200]}", None)
+
+
+async def broadcast(
+    base_url: str,
+    chat_ids: list[str],
+    text: str,
+    checkpoint: Checkpoint,
+    blocked: BlockedChats,
+    rate: float = 25,
+    max_concurrency: int = 20,
+    max_attempts: int = 5,
+) -> dict[str, list[tuple[str, str]]]:
+    """Send `text` to every chat once, recording each outcome as it happens"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=max_concurrency)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    bucket = TokenBucket(rate, capacity=max(1, int(rate)))
+    concurrency = AdaptiveConcurrency(min(4, max_concurrency), max_concurrency)
+    results: dict[str, list[tuple[str, str]]] = {"ok": [], "blocked": [], "error": []}
+
+    async def deliver(cid: str) -> None:
+        for attempt in range(max_attempts):
+            async with concurrency:
+                await bucket.acquire()
+                outcome, detail, retry_after = await asyncio.to_thread(
+                    send_one, session, base_url, cid, text
+                )
+            if outcome != "retry":
+                break
+            if retry_after is not None:
+                # Flood control applies to the whole bot: everyone waits
+                bucket.pause(retry_after)
+                concurrency.throttled()
+            else:
+                await asyncio.sleep(min(2**attempt, 30))
+        else:
+            outcome, detail = "error", f"gave up after {max_attempts} attempts: {detail}"
+
+        if outcome == "ok":
+            await concurrency.succeeded()
+            blocked.discard(cid)
+        elif outcome == "blocked":
+            blocked.add(cid, detail)
+        checkpoint.record(cid, outcome, detail)
+        results[outcome].append((cid, detail))
+        sym = {"ok": "✓", "blocked": "🚫", "error": "✗"}[outcome]
+        print(f"  {sym} {cid}: {detail}")
+
+    try:
+        await asyncio.gather(*(deliver(cid) for cid in chat_ids))
+    finally:
+        session.close()
+    return results
 
 
 def main() -> int:
@@ -72,10 +226,37 @@ def main() -> int:
         help="Where to read chat_ids from (default: config)",
     )
     ap.add_argument(
-        "--delay",
+        "--rate",
         type=float,
-        default=0.5,
-        help="Seconds between sends to avoid Telegram rate limits",
+        default=25,
+        help="Messages per second across all chats (Telegram allows ~30)",
+    )
+    ap.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=20,
+        help="Upper bound on sends in flight (starts at 4 and adapts)",
+    )
+    ap.add_argument(
+        "--max-attempts",
+        type=int,
+        default=5,
+        help="Attempts per chat on 429, 5xx and network errors",
+    )
+    ap.add_argument(
+        "--checkpoint",
+        default=CHECKPOINT_FILE,
+        help=f"Outcome log used to resume (default: {CHECKPOINT_FILE})",
+    )
+    ap.add_argument(
+        "--restart",
+        action="store_true",
+        help="Send to every chat again, ignoring the checkpoint",
+    )
+    ap.add_argument(
+        "--include-blocked",
+        action="store_true",
+        help="Also try chats recorded as having blocked the bot",
     )
     args = ap.parse_args()
 
@@ -89,20 +270,43 @@ def main() -> int:
         print(f"no chat_ids found in source={args.source}", file=sys.stderr)
         return 1
 
-    print(f"Sending reintroduction to {len(chat_ids)} chat(s) from {args.source}...")
-    results: dict[str, list[tuple[str, str]]] = {"ok": [], "blocked": [], "error": []}
-    for i, cid in enumerate(chat_ids):
-        if i:
-            time.sleep(args.delay)
-        outcome, detail = send_one(token, cid, args.message)
-        results[outcome].append((cid, detail))
-        sym = {"ok": "✓", "blocked": "🚫", "error": "✗"}[outcome]
-        print(f"  {sym} {cid}: {detail}")
+    config = load_config()
+    api_url = config.get("api_url", "https://api.telegram.org")
+    blocked = BlockedChats(config.get("blocked_chats_file", "data/blocked_chats.json"))
+    checkpoint = Checkpoint(args.checkpoint, args.message)
+    if args.restart:
+        checkpoint.outcomes = {}
+
+    pending = [cid for cid in chat_ids if not checkpoint.done(cid)]
+    already_sent = len(chat_ids) - len(pending)
+    if not args.include_blocked:
+        pending = [cid for cid in pending if cid not in blocked]
+    skipped_blocked = len(chat_ids) - already_sent - len(pending)
+
+    print(f"Sending reintroduction to {len(pending)} chat(s) from {args.source}...")
+    if already_sent:
+        print(f"  (skipping {already_sent} chat(s) already done per {args.checkpoint})")
+    if skipped_blocked:
+        print(f"  (skipping {skipped_blocked} chat(s) that blocked the bot)")
+
+    started = time.perf_counter()
+    results = asyncio.run(
+        broadcast(
+            f"{api_url}/bot{token}",
+            pending,
+            args.message,
+            checkpoint,
+            blocked,
+            rate=args.rate,
+            max_concurrency=args.max_concurrency,
+            max_attempts=args.max_attempts,
+        )
+    )
 
     print()
-    print(f"  ok:      {len(results['ok'])}")
+    print(f"  ok:      {len(results['ok'])}  in {time.perf_counter() - started:.1f}s")
     print(f"  blocked: {len(results['blocked'])}  (user must manually unblock)")
-    print(f"  errors:  {len(results['error'])}")
+    print(f"  errors:  {len(results['error'])}  (rerun to retry just these)")
     if results["blocked"]:
         print("\nBlocked chat_ids (contact out-of-band to unblock):")
         for cid, _ in results["blocked"]:
@@ -0,0 +1,71 @@
+import weakref
+from collections import Counter
+from fnmatch import fnmatch
+
+# Per-page counters, dropped automatically when Playwright releases the page
+_page_stats = weakref.WeakKeyDictionary()
+
+
+class ResourceBlocker:
+    """Abort requests the scraper does not need (images, fonts, trackers, ...)"""
+
+    def __init__(self, config):
+        self.block_resource_types = set(config.get("block_resource_types", []))
+        self.block_url_patterns = config.get("block_url_patterns", [])
+        self.allow_url_patterns = config.get("allow_url_patterns", [])
+
+    def should_block(self, resource_type, url):
+        """Allow patterns win, then resource type and URL deny lists apply"""
+        if any(fnmatch(url, pattern) for pattern in self.allow_url_patterns):
+            return False
+        if resource_type in self.block_resource_types:
+            return True
+        return any(fnmatch(url, pattern) for pattern in self.block_url_patterns)
+
+    async def install(self, context):
+        """Route every request of the context through the block list"""
+        await context.route("**/*", self._handle_route)
+        context.on("response", self._record_response)
+
+    async def _handle_route(self, route):
+        request = route.request
+        if self.should_block(request.resource_type, request.url):
+            stats = _stats_for(request)
+            if stats is not None:
+                stats["blocked"][request.resource_type] += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def _record_response(self, response):
+        stats = _stats_for(response.request)
+        if stats is None:
+            return
+        stats["requests"] += 1
+        stats["bytes"] += int(response.headers.get("content-length") or 0)
+
+
+def _stats_for(request):
+    """Counters of the page that issued the request (None for workers)"""
+    try:
+        page = request.frame.page
+    except Exception:
+        return None
+    if page not in _page_stats:
+        _page_stats[page] = {"blocked": Counter(), "requests": 0, "bytes": 0}
+    return _page_stats[page]
+
+
+def take_page_stats(page):
+    """Return and reset the counters collected for a page since the last call"""
+    return _page_stats.pop(page, None)
+
+
+def format_page_stats(stats):
+    """One-line summary of blocked and loaded requests for a page"""
+    blocked = stats["blocked"]
+    by_type = ", ".join(f"{kind}={count}" for kind, count in blocked.most_common())
+    return (
+        f"🚫 Blocked {sum(blocked.values())} requests ({by_type or 'none'}); "
+        f"loaded {stats['requests']} requests, {stats['bytes'] / 1024:.0f} KiB"
+    )
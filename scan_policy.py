@@ -0,0 +1,197 @@
+import json
+import os
+import time
+
+WEEK_HOURS = 7 * 24
+# The Unix epoch fell on a Thursday: hour 72 of a Monday-based week
+EPOCH_HOUR_OF_WEEK = 72
+
+
+def hour_of_week(timestamp):
+    """0 (Monday 00:00-01:00 UTC) to 167 (Sunday 23:00-24:00 UTC)"""
+    return (int(timestamp // 3600) + EPOCH_HOUR_OF_WEEK) % WEEK_HOURS
+
+
+def hour_spans(start, end):
+    """(hour of week, hours) for each hour slot the span [start, end) covers"""
+    spans = []
+    while start < end:
+        slot_end = min(end, (start // 3600 + 1) * 3600)
+        spans.append((hour_of_week(start), (slot_end - start) / 3600))
+        start = slot_end
+    return spans
+
+
+class ScanPolicy:
+    """Decide between a cheap head scan, a full sweep or no scan for each run
+
+    Results are sorted by creation date, so new offers always show up on the
+    first pages. In "tiered" mode most runs are head scans that stop at the
+    first page of already known offers; every `full_every`-th run is a full
+    sweep that also catches removals and price changes deep in the list.
+    "full" mode sweeps every run.
+
+    "adaptive" mode is tiered scanning that also skips runs when nothing is
+    likely to have arrived. Every run adds its count of new offers to a
+    histogram over the 168 hours of the week (UTC), kept in the state file
+    as decayed sums of offers and observed hours, so old weeks fade out.
+    A run is skipped while the offers expected since the last run stay
+    below min_expected_new. Runs are never closer than
+    min_interval_minutes nor further apart than max_interval_minutes, and
+    an hour of the week with too little history is always scanned.
+    """
+
+    def __init__(self, config):
+        self.mode = config.get("mode", "full")
+        self.full_every = config.get("full_every", 6)
+        self.state_file = config.get("state_file", "data/scan_state.json")
+        self.min_interval = config.get("min_interval_minutes", 4) * 60
+        self.max_interval = config.get("max_interval_minutes", 60) * 60
+        self.min_expected_new = config.get("min_expected_new", 0.5)
+        self.min_observed_hours = config.get("min_observed_hours", 1)
+        self.decay = config.get("decay", 0.98)
+        self.reason = ""
+        self.started_at = None
+
+    def _load_state(self):
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            return {}
+
+    def expected_new(self, state, start, end):
+        """New offers the histogram expects in [start, end), None if some
+        hour of that span has too little history"""
+        arrivals = state.get("arrivals")
+        hours = state.get("hours")
+        if arrivals is None or hours is None:
+            return None
+        expected = 0.0
+        for slot, span in hour_spans(start, end):
+            if hours[slot] < self.min_observed_hours:
+                return None
+            expected += arrivals[slot] / hours[slot] * span
+        return expected
+
+    def _skip(self, state, now):
+        last_run = state.get("last_run_at")
+        if last_run is None:
+            self.reason = "no earlier run"
+            return False
+        elapsed = now - last_run
+        if elapsed < self.min_interval:
+            self.reason = f"last run {elapsed / 60:.0f} min ago"
+            return True
+        if elapsed >= self.max_interval:
+            self.reason = f"last run {elapsed / 60:.0f} min ago, max interval reached"
+            return False
+        expected = self.expected_new(state, last_run, now)
+        if expected is None:
+            self.reason = "too little history for this hour"
+            return False
+        self.reason = f"{expected:.2f} new offers expected since {elapsed / 60:.0f} min ago"
+        return expected < self.min_expected_new
+
+    def next_mode(self, now=None):
+        """'full', 'head' or (adaptive mode only) 'skip' for the run about to
+        start; self.reason explains an adaptive decision"""
+        self.started_at = time.time() if now is None else now
+        self.reason = ""
+        if self.mode not in ("tiered", "adaptive"):
+            return "full"
+        state = self._load_state()
+        if self.mode == "adaptive" and self._skip(state, self.started_at):
+            return "skip"
+        head_runs = state.get("head_runs_since_full")
+        if head_runs is None or head_runs + 1 >= self.full_every:
+            return "full"
+        return "head"
+
+    def _record_arrivals(self, state, new_offers, now):
+        """Spread new_offers over the hours since the last run"""
+        last_run = state.get("last_run_at")
+        # A long outage says little about any particular hour
+        if new_offers is None or last_run is None or now - last_run > 24 * 3600:
+            return
+        spans = hour_spans(last_run, now)
+        total = sum(span for _, span in spans)
+        if not total:
+            return
+        arrivals = state.get("arrivals") or [0.0] * WEEK_HOURS
+        hours = state.get("hours") or [0.0] * WEEK_HOURS
+        for slot, span in spans:
+            share = span / total
+            arrivals[slot] = round(arrivals[slot] * self.decay + new_offers * share, 4)
+            hours[slot] = round(hours[slot] * self.decay + span, 4)
+        state["arrivals"] = arrivals
+        state["hours"] = hours
+
+    def record(self, scan_mode, new_offers=None, complete=True):
+        """Remember a successfully finished run and the number of new offers
+        it found (None when they do not reflect arrivals, e.g. a first run)
+
+        An incomplete run (pages failed part-way) does not count towards
+        full_every, so a sweep that was due is simply tried again.
+        """
+        state = self._load_state()
+        if complete and scan_mode == "full":
+            state["head_runs_since_full"] = 0
+        elif complete:
+            state["head_runs_since_full"] = state.get("head_runs_since_full", 0) + 1
+
+        now = time.time() if self.started_at is None else self.started_at
+        if self.mode == "adaptive":
+            self._record_arrivals(state, new_offers, now)
+        state["last_run_at"] = now
+
+        os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_file, self.state_file)
+
+
+def scan_decision(scan_modes):
+    """The run's overall decision over its profiles' scan modes: 'full' if
+    any profile sweeps fully, else 'head' if any scans, else 'skip'
+
+    Also handed to later GitHub Actions steps as the `scan_decision` output.
+    """
+    modes = set(scan_modes)
+    decision = "full" if "full" in modes else "head" if "head" in modes else "skip"
+    print(f"🧭 Scan decision: {decision}")
+    github_output = os.getenv("GITHUB_OUTPUT")
+    if github_output:
+        with open(github_output, "a", encoding="utf-8") as f:
+            f.write(f"scan_decision={decision}\n")
+    return decision
+
+
+if __name__ == "__main__":
+    # Plan step for CI: decide before the browser is even installed
+    import yaml
+
+    from search_profiles import load_profiles
+
+    with open("configs/config_search.yaml", "r") as f:
+        search_config = yaml.safe_load(f)
+    with open("configs/config_browser.yaml", "r") as f:
+        scan_config = yaml.safe_load(f).get("scan", {})
+
+    profiles = load_profiles(
+        search_config,
+        [],
+        "data/current_data.json",
+        "data/offers.sqlite",
+        scan_config.get("state_file", "data/scan_state.json"),
+    )
+    modes = []
+    for profile in profiles:
+        policy = ScanPolicy(dict(scan_config, state_file=profile["scan_state_file"]))
+        modes.append(policy.next_mode())
+        reason = f" ({policy.reason})" if policy.reason else ""
+        print(f"🧭 [{profile['name']}] Scan mode: {modes[-1]}{reason}")
+    scan_decision(modes)
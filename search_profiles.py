@@ -0,0 +1,56 @@
+import os
+import re
+
+PROFILE_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+PROFILES_DIR = "data/profiles"
+
+
+def load_profiles(search_config, chat_ids, data_file, store_file, scan_state_file):
+    """Search profiles of config_search.yaml as a list of dicts
+
+    A config with a `profiles` list defines named profiles, each with its own
+    `search` parameters and optional `chat_ids` (default: the chat_ids of
+    config_telegram.yaml). Every named profile keeps its snapshot, offer
+    store and scan state under data/profiles/<name>/. A flat config is a
+    single "default" profile that keeps using the given paths, so existing
+    setups and their data carry on unchanged.
+    """
+    if "profiles" not in search_config:
+        return [
+            {
+                "name": "default",
+                "search": search_config,
+                "chat_ids": [str(chat_id) for chat_id in chat_ids],
+                "data_file": data_file,
+                "store_file": store_file,
+                "scan_state_file": scan_state_file,
+            }
+        ]
+
+    profiles = []
+    seen = set()
+    for entry in search_config["profiles"]:
+        name = str(entry.get("name", ""))
+        if not PROFILE_NAME_PATTERN.match(name):
+            raise ValueError(f"invalid search profile name: {name!r}")
+        if name in seen:
+            raise ValueError(f"duplicate search profile name: {name!r}")
+        seen.add(name)
+
+        profile_dir = os.path.join(PROFILES_DIR, name)
+        profiles.append(
+            {
+                "name": name,
+                "search": entry.get("search", {}),
+                "chat_ids": [str(chat_id) for chat_id in entry.get("chat_ids", chat_ids)],
+                "data_file": os.path.join(profile_dir, os.path.basename(data_file)),
+                "store_file": os.path.join(profile_dir, os.path.basename(store_file)),
+                "scan_state_file": os.path.join(
+                    profile_dir, os.path.basename(scan_state_file)
+                ),
+            }
+        )
+
+    if not profiles:
+        raise ValueError("config_search.yaml defines no search profiles")
+    return profiles
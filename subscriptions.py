@@ -0,0 +1,169 @@
+from helpers import change_type
+
+FILTER_KEYS = (
+    "max_price",
+    "rooms",
+    "min_floor",
+    "max_floor",
+    "metro_ids",
+    "sub_district_ids",
+    "exclude_commission",
+)
+
+
+def has_commission(offer):
+    commission = (offer.get("commission") or "").lower()
+    return bool(commission) and "без комиссии" not in commission
+
+
+def matches_filter(offer, subscription):
+    """Check one offer against one subscriber filter (the reference predicate)"""
+    price = offer.get("price_numeric")
+    if "max_price" in subscription and (price is None or price > subscription["max_price"]):
+        return False
+    if "rooms" in subscription and offer.get("rooms") not in subscription["rooms"]:
+        return False
+    floor = offer.get("floor")
+    if "min_floor" in subscription and (floor is None or floor < subscription["min_floor"]):
+        return False
+    if "max_floor" in subscription and (floor is None or floor > subscription["max_floor"]):
+        return False
+    if "metro_ids" in subscription and offer.get("metro_id") not in subscription["metro_ids"]:
+        return False
+    if "sub_district_ids" in subscription and (
+        offer.get("sub_district_id") not in subscription["sub_district_ids"]
+    ):
+        return False
+    if subscription.get("exclude_commission") and has_commission(offer):
+        return False
+    return True
+
+
+def compile_filter(raw):
+    """Normalize a filter from config_telegram.yaml (ids as strings, rooms as ints)"""
+    unknown = set(raw) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"unknown subscription filter keys: {', '.join(sorted(unknown))}")
+    subscription = dict(raw)
+    if "rooms" in subscription:
+        subscription["rooms"] = {int(rooms) for rooms in subscription["rooms"]}
+    for key in ("metro_ids", "sub_district_ids"):
+        if key in subscription:
+            subscription[key] = {str(value) for value in subscription[key]}
+    return subscription
+
+
+class SubscriptionIndex:
+    """Inverted indexes from offer attributes to the chats whose filter allows them
+
+    metro_id, sub_district_id and rooms each map a value to the chats that
+    list it, with chats that do not filter on that attribute kept as
+    wildcards. Prices are cut into buckets of `price_bucket` rubles: a chat
+    sits in every bucket entirely below its max_price, and in the bucket
+    holding max_price as an edge that is compared exactly. Matching an
+    offer intersects these candidate sets and runs the remaining checks
+    (floors, commission) only on the chats that survive, so the cost grows
+    with the number of matching chats rather than with all subscribers.
+
+    Chats without a filter get every change.
+    """
+
+    def __init__(self, chat_ids, subscriptions=None, price_bucket=5000):
+        self.chat_ids = [str(chat_id) for chat_id in chat_ids]
+        self.price_bucket = price_bucket
+        self.filters = {
+            str(chat_id): compile_filter(raw or {})
+            for chat_id, raw in (subscriptions or {}).items()
+        }
+
+        everyone = set(self.chat_ids)
+        self.attribute_indexes = {}
+        for attribute, key in (
+            ("metro_id", "metro_ids"),
+            ("sub_district_id", "sub_district_ids"),
+            ("rooms", "rooms"),
+        ):
+            index = {}
+            for chat_id in self.chat_ids:
+                for value in self.filters.get(chat_id, {}).get(key, ()):
+                    index.setdefault(value, set()).add(chat_id)
+            wildcards = frozenset(
+                chat_id for chat_id in everyone if key not in self.filters.get(chat_id, {})
+            )
+            # Fold the wildcards into every entry once, not on every match
+            self.attribute_indexes[attribute] = (
+                {value: frozenset(chats | wildcards) for value, chats in index.items()},
+                wildcards,
+            )
+
+        price_full = {}
+        price_wildcards = set()
+        self.price_edge = {}
+        for chat_id in self.chat_ids:
+            max_price = self.filters.get(chat_id, {}).get("max_price")
+            if max_price is None:
+                price_wildcards.add(chat_id)
+                continue
+            edge_bucket = max_price // price_bucket
+            for bucket in range(edge_bucket):
+                price_full.setdefault(bucket, set()).add(chat_id)
+            self.price_edge.setdefault(edge_bucket, set()).add(chat_id)
+        self.price_wildcards = frozenset(price_wildcards)
+        self.price_full = {
+            bucket: frozenset(chats | self.price_wildcards)
+            for bucket, chats in price_full.items()
+        }
+
+        self.residual_chats = {
+            chat_id
+            for chat_id, subscription in self.filters.items()
+            if {"min_floor", "max_floor", "exclude_commission"} & set(subscription)
+        }
+
+    def _price_candidates(self, price):
+        if price is None:
+            return self.price_wildcards
+        bucket = price // self.price_bucket
+        candidates = self.price_full.get(bucket, self.price_wildcards)
+        edge = [
+            chat_id
+            for chat_id in self.price_edge.get(bucket, ())
+            if price <= self.filters[chat_id]["max_price"]
+        ]
+        return candidates.union(edge) if edge else candidates
+
+    def match(self, offer):
+        """Set of chat ids whose filter allows the offer"""
+        candidate_sets = [
+            index.get(offer.get(attribute), wildcards)
+            for attribute, (index, wildcards) in self.attribute_indexes.items()
+        ]
+        candidate_sets.append(self._price_candidates(offer.get("price_numeric")))
+
+        candidate_sets.sort(key=len)
+        matched = candidate_sets[0].intersection(*candidate_sets[1:])
+        return {
+            chat_id
+            for chat_id in matched
+            if chat_id not in self.residual_chats
+            or matches_filter(offer, self.filters[chat_id])
+        }
+
+    def recipients(self, change, chat_ids=None):
+        """Chats that should hear about a change, in chat_ids order
+
+        A change goes to a chat when its current or its previous offer
+        passes the chat's filter, so a subscriber also learns that an offer
+        they were told about got more expensive or was removed.
+        """
+        kind = change_type(change)
+        matched = set()
+        if kind != "removed":
+            matched |= self.match(change["current_offer"])
+        if kind != "new":
+            matched |= self.match(change["previous_offer"])
+        return [
+            chat_id
+            for chat_id in (self.chat_ids if chat_ids is None else chat_ids)
+            if chat_id in matched
+        ]
@@ -1,121 +1,399 @@
-import requests
-import time
+import asyncio
 import json
 import os
+import time
+import requests
+import requests.adapters
 from datetime import datetime
-from helpers import format_change
+from blocked_chats import BlockedChats
+from helpers import change_type, format_change, pack_digest
+from message_index import MessageIndex
+from message_log import MessageLog
+from metrics import metrics
+from rate_limit import TokenBucket
+from subscriptions import SubscriptionIndex
 
 
 class TelegramBot:
     def __init__(self, config):
         self.bot_token = config["token"]
         self.chat_ids = [str(id) for id in config["chat_ids"]]
-        self.base_url = f"https://api.telegram.org/bot{self.bot_token}"
+        api_url = config.get("api_url", "https://api.telegram.org")
+        self.base_url = f"{api_url}/bot{self.bot_token}"
         self.max_retries = config.get("max_retries", 3)
         self.retry_delay = config.get("retry_delay", 1)
         self.max_delay = config.get("max_delay", 30)
-        self.message_log_file = config.get("message_log_file", "data/telegram_messages.json")
+        self.message_log_file = config.get("message_log_file", "data/telegram_messages.jsonl")
+        self.message_log = MessageLog(
+            self.message_log_file,
+            max_bytes=config.get("message_log_max_bytes", 5_000_000),
+            max_age_days=config.get("message_log_max_age_days", 30),
+            fsync=config.get("message_log_fsync", "always"),
+            # The old JSON array log, next to the JSONL one by default
+            legacy_path=config.get(
+                "message_log_legacy_file", os.path.splitext(self.message_log_file)[0] + ".json"
+            ),
+        )
+
+        # Telegram allows about 1 message/s per chat and 30 messages/s overall
+        self.per_chat_rate = config.get("per_chat_rate", 1)
+        self.global_bucket = TokenBucket(
+            config.get("global_rate", 30), capacity=config.get("global_rate", 30)
+        )
+        self.chat_buckets = {}
+
+        # Chats that blocked the bot get no more requests until unblocked
+        self.blocked_chats = BlockedChats(
+            config.get("blocked_chats_file", "data/blocked_chats.json")
+        )
+
+        # How a price change, terms change or removal relates to the offer's
+        # earlier message: "message" (a new one), "edit" or "reply"
+        self.update_mode = config.get("update_mode", "message")
+        if self.update_mode not in ("message", "edit", "reply"):
+            raise ValueError(f"Unknown update_mode {self.update_mode!r}")
+        self.message_index = None
+        if self.update_mode != "message":
+            self.message_index = MessageIndex(
+                config.get("message_index_file", "data/message_index.sqlite"),
+                retention_days=config.get("message_index_retention_days", 30),
+            )
+
+        # Per-chat filters; chats without one get every change
+        self.subscriptions = SubscriptionIndex(
+            self.chat_ids,
+            config.get("subscriptions"),
+            price_bucket=config.get("subscription_price_bucket", 5000),
+        )
+
+        digest_config = config.get("digest", {})
+        self.digest_enabled = digest_config.get("enabled", False)
+        self.digest_min_changes = digest_config.get("min_changes", 5)
+
+        # One pooled session shared by all sends of this bot
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_maxsize=config.get("connection_pool_size", 10)
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
     def _log_message(self, chat_id, text, success, error_message=None, message_id=None):
-        """Log sent message to JSON file"""
+        """Append sent message to the JSONL message log"""
         try:
-            # Ensure directory exists
-            os.makedirs(os.path.dirname(self.message_log_file), exist_ok=True)
-
-            # Load existing messages
-            messages = []
-            if os.path.exists(self.message_log_file):
-                try:
-                    with open(self.message_log_file, 'r', encoding='utf-8') as f:
-                        messages = json.load(f)
-                except json.JSONDecodeError:
-                    messages = []
-
-            # Create message entry
-            message_entry = {
-                "timestamp": datetime.now().isoformat(),
-                "chat_id": chat_id,
-                "message_id": message_id,
-                "text": text,
-                "success": success,
-                "error_message": error_message
-            }
-            
-            messages.append(message_entry)
-            
-            # Save updated messages
-            with open(self.message_log_file, 'w', encoding='utf-8') as f:
-                json.dump(messages, f, ensure_ascii=False, indent=2)
-                
+            self.message_log.append(
+                {
+                    "timestamp": datetime.now().isoformat(),
+                    "chat_id": chat_id,
+                    "message_id": message_id,
+                    "text": text,
+                    "success": success,
+                    "error_message": error_message,
+                }
+            )
         except Exception as e:
             print(f"⚠️  Failed to log message: {e}")
 
-    def send_message_with_retry(self, chat_id, text, parse_mode="HTML"):
-        """Send a message to a single chat with retry logic"""
-        url = f"{self.base_url}/sendMessage"
-        data = {
-            "chat_id": chat_id,
-            "text": text,
-            "parse_mode": parse_mode,
-            "disable_web_page_preview": False,
-        }
+    def _post(self, method, data):
+        """POST to the Bot API over the pooled session (runs in a worker thread)"""
+        return self.session.post(f"{self.base_url}/{method}", data=data, timeout=10)
+
+    async def _call_async(self, method, data):
+        """POST a Bot API method under the rate limits, with retries
+
+        Returns (result, None) with Telegram's result object on success, or
+        (None, error) once retries are exhausted or the request cannot
+        succeed (the chat blocked the bot, or Telegram rejected it as a bad
+        request).
+        """
+        chat_id = data["chat_id"]
+        chat_bucket = self.chat_buckets.setdefault(
+            chat_id, TokenBucket(self.per_chat_rate)
+        )
 
         for attempt in range(self.max_retries):
+            with metrics.stage("telegram.rate_limit_wait"):
+                await chat_bucket.acquire()
+                await self.global_bucket.acquire()
             try:
-                response = requests.post(url, data=data, timeout=10)
+                started = time.perf_counter()
+                try:
+                    response = await asyncio.to_thread(self._post, method, data)
+                finally:
+                    metrics.observe("telegram_send", time.perf_counter() - started)
+
+                if response.status_code == 429:
+                    metrics.count("telegram_429")
+                    # Flood control: wait exactly as long as Telegram asks.
+                    # The limit is bot-wide, so every chat waits, not just this one
+                    retry_after = (
+                        response.json().get("parameters", {}).get("retry_after", 1)
+                    )
+                    chat_bucket.pause(retry_after)
+                    self.global_bucket.pause(retry_after)
+                    raise requests.exceptions.HTTPError(
+                        f"429 Too Many Requests, retry after {retry_after}s",
+                        response=response,
+                    )
+
+                if response.status_code == 403:
+                    # Blocked by the user: retrying cannot help
+                    reason = response.json().get("description", "Forbidden")
+                    print(f"🚫 Chat {chat_id} blocked the bot: {reason}")
+                    self.blocked_chats.add(chat_id, reason)
+                    return None, reason
+
+                if response.status_code == 400:
+                    # e.g. a message to edit that no longer exists
+                    return None, response.json().get("description", "Bad Request")
+
                 response.raise_for_status()
-                message_id = response.json().get("result", {}).get("message_id")
-                print(f"✅ Message sent to chat {chat_id} (message_id={message_id})")
-                self._log_message(chat_id, text, success=True, message_id=message_id)
-                return True
+                return response.json().get("result", {}), None
 
             except requests.exceptions.RequestException as e:
                 if attempt < self.max_retries - 1:
-                    # Calculate delay with exponential backoff
-                    delay = min(self.retry_delay * (2**attempt), self.max_delay)
                     print(f"⚠️  Attempt {attempt + 1} failed for chat {chat_id}: {e}")
-                    print(f"⏳ Retrying in {delay} seconds...")
-                    time.sleep(delay)
+                    metrics.count("telegram_retries")
+                    if e.response is None or e.response.status_code != 429:
+                        # Calculate delay with exponential backoff
+                        delay = min(self.retry_delay * (2**attempt), self.max_delay)
+                        print(f"⏳ Retrying in {delay} seconds...")
+                        await asyncio.sleep(delay)
                 else:
                     print(f"❌ All attempts failed for chat {chat_id}: {e}")
-                    self._log_message(chat_id, text, success=False, error_message=str(e))
-                    return False
+                    return None, str(e)
 
-        return False
+        return None, "no attempts made"
 
-    def send_message(self, text, parse_mode="HTML"):
-        """Send a message to all Telegram chat IDs with retry logic"""
-        success_count = 0
-        failed_chats = []
+    async def send_message_with_retry_async(
+        self, chat_id, text, parse_mode="HTML", reply_to=None
+    ):
+        """Send a message to a single chat with rate limiting and retry logic
 
-        for i, chat_id in enumerate(self.chat_ids):
-            # Add a small delay between messages to avoid rate limiting
-            if i > 0:
-                time.sleep(0.5)
+        reply_to is a message_id to answer (sent anyway if it is gone).
+        Returns the new message's message_id, or None if it was not sent.
+        """
+        if chat_id in self.blocked_chats:
+            print(f"🚫 Skipping chat {chat_id}: it blocked the bot")
+            metrics.count("messages_skipped_blocked")
+            return None
 
-            if self.send_message_with_retry(chat_id, text, parse_mode):
-                success_count += 1
-            else:
-                failed_chats.append(chat_id)
+        data = {
+            "chat_id": chat_id,
+            "text": text,
+            "parse_mode": parse_mode,
+            "disable_web_page_preview": False,
+        }
+        if reply_to is not None:
+            data["reply_parameters"] = json.dumps(
+                {"message_id": reply_to, "allow_sending_without_reply": True}
+            )
 
-        # Summary
-        if failed_chats:
-            print(
-                f"\n📊 Summary: {success_count}/{len(self.chat_ids)} messages sent successfully"
+        result, error = await self._call_async("sendMessage", data)
+        if result is None:
+            self._log_message(chat_id, text, success=False, error_message=error)
+            metrics.count("messages_failed")
+            return None
+
+        message_id = result.get("message_id")
+        print(f"✅ Message sent to chat {chat_id} (message_id={message_id})")
+        self._log_message(chat_id, text, success=True, message_id=message_id)
+        metrics.count("messages_sent")
+        return message_id
+
+    async def edit_message_async(self, chat_id, message_id, text, parse_mode="HTML"):
+        """Replace the text of an earlier message; its message_id, or None if
+        Telegram refused (e.g. the user deleted it)"""
+        data = {
+            "chat_id": chat_id,
+            "message_id": message_id,
+            "text": text,
+            "parse_mode": parse_mode,
+            "disable_web_page_preview": False,
+        }
+        result, error = await self._call_async("editMessageText", data)
+        if result is None:
+            print(f"↩️  Could not edit message {message_id} in chat {chat_id}: {error}")
+            metrics.count("telegram_edits_failed")
+            return None
+
+        print(f"✏️  Message {message_id} edited in chat {chat_id}")
+        self._log_message(chat_id, text, success=True, message_id=message_id)
+        metrics.count("messages_edited")
+        return message_id
+
+    async def send_update_async(self, chat_id, text, change=None, parse_mode="HTML"):
+        """Send a message, threaded with the offer's earlier one if it is
+        about a single change
+
+        With update_mode "edit", a price change, terms change or removal
+        rewrites the offer's last message in place, falling back to a new
+        message when the edit fails; with "reply" it answers that message.
+        Returns the message_id, or None if nothing was sent.
+        """
+        if change is None or self.message_index is None:
+            return await self.send_message_with_retry_async(chat_id, text, parse_mode)
+
+        offer_id = (change.get("current_offer") or change["previous_offer"])["offer_id"]
+        previous = None
+        if change_type(change) != "new" and chat_id not in self.blocked_chats:
+            previous = self.message_index.get(offer_id, chat_id)
+
+        message_id = None
+        if previous is not None and self.update_mode == "edit":
+            message_id = await self.edit_message_async(chat_id, previous, text, parse_mode)
+        if message_id is None:
+            reply_to = previous if self.update_mode == "reply" else None
+            message_id = await self.send_message_with_retry_async(
+                chat_id, text, parse_mode, reply_to=reply_to
             )
+        if message_id is not None:
+            self.message_index.record(offer_id, chat_id, message_id)
+        return message_id
+
+    async def deliver_async(self, outgoing, parse_mode="HTML", on_result=None):
+        """Send {chat_id: [(text, change), ...]} concurrently across chats
+
+        change is the single change a message is about, or None (digests,
+        broadcasts). Each chat's messages go out strictly in order; chats
+        proceed in parallel under the per-chat and global token buckets.
+        on_result, if given, is called as on_result(chat_id, position,
+        message_id) right after each message, message_id being None if it
+        was not sent. Returns {chat_id: [message_id, ...]} in the same order.
+        """
+
+        async def send_chat(chat_id, messages):
+            results = []
+            for position, (text, change) in enumerate(messages):
+                sent = await self.send_update_async(chat_id, text, change, parse_mode)
+                if on_result is not None:
+                    on_result(chat_id, position, sent)
+                results.append(sent)
+            return results
+
+        chat_ids = list(outgoing)
+        results = await asyncio.gather(
+            *(send_chat(chat_id, outgoing[chat_id]) for chat_id in chat_ids)
+        )
+        return dict(zip(chat_ids, results))
+
+    def _print_summary(self, results):
+        total = sum(len(sent) for sent in results.values())
+        success_count = sum(
+            message_id is not None for sent in results.values() for message_id in sent
+        )
+        failed_chats = [chat_id for chat_id, sent in results.items() if None in sent]
+
+        if failed_chats:
+            print(f"\n📊 Summary: {success_count}/{total} messages sent successfully")
             print(f"❌ Failed chats: {', '.join(failed_chats)}")
         else:
             print(f"\n✅ All {success_count} messages sent successfully!")
 
-    def send_tracking_updates(self, changes):
-        """Send all tracking updates with rate limiting"""
+    def _use_digest(self, changes):
+        return self.digest_enabled and len(changes) > self.digest_min_changes
 
-        # Process all changes with the unified formatter
-        for index, change in enumerate(changes, 1):
-            print(f"\n📨 Sending message {index}/{len(changes)}...")
-            message = format_change(change)
-            self.send_message(message)
+    def format_updates(self, changes):
+        """Messages for changes as (text, indexes of the changes it covers)
 
-            # Add delay between messages to avoid rate limiting
-            if index < len(changes):
-                time.sleep(1)
\ No newline at end of file
+        One message per change, or a digest once there are enough changes.
+        """
+        if self._use_digest(changes):
+            packed = pack_digest(changes)
+            print(f"\n🗞️  Packing {len(changes)} changes into {len(packed)} digest message(s)")
+            return packed
+        return [(format_change(change), [index]) for index, change in enumerate(changes)]
+
+    def outgoing_updates(self, changes):
+        """format_updates as (text, change, indexes), change being the one
+        change a message is about, or None for a digest message"""
+        packed = self.format_updates(changes)
+        if self._use_digest(changes):
+            return [(text, None, indexes) for text, indexes in packed]
+        return [(text, changes[indexes[0]], indexes) for text, indexes in packed]
+
+    async def send_message_async(self, text, parse_mode="HTML"):
+        """Send a message to all Telegram chat IDs with retry logic"""
+        results = await self.deliver_async(
+            {chat_id: [(text, None)] for chat_id in self.chat_ids}, parse_mode
+        )
+        self._print_summary(results)
+
+    def route_changes(self, changes, chat_ids=None):
+        """{chat_id: [change, ...]} of the changes each chat's filter matches
+
+        chat_ids (default: all chats of the bot) limits and orders the
+        result; chats with nothing matched are left out.
+        """
+        routed = {chat_id: [] for chat_id in (self.chat_ids if chat_ids is None else chat_ids)}
+        for change in changes:
+            for chat_id in self.subscriptions.recipients(change, list(routed)):
+                routed[chat_id].append(change)
+        return {chat_id: matched for chat_id, matched in routed.items() if matched}
+
+    async def send_tracking_updates_async(self, changes):
+        """Send each chat its matched updates, in order, under Telegram's rate limits"""
+        outgoing = {
+            chat_id: [(text, change) for text, change, _ in self.outgoing_updates(chat_changes)]
+            for chat_id, chat_changes in self.route_changes(changes).items()
+        }
+        total = sum(len(messages) for messages in outgoing.values())
+        print(f"\n📨 Sending {total} message(s) to {len(outgoing)} chat(s)...")
+        results = await self.deliver_async(outgoing)
+        self._print_summary(results)
+
+    async def drain_outbox_async(self, outbox):
+        """Send every pending outbox delivery, acknowledging each one as it goes
+
+        Returns {chat_id: [message_id or None, ...]} like deliver_async.
+        """
+        pending = outbox.pending()
+        self._drop_undeliverable(outbox, pending)
+        outgoing = {}
+        covered_keys = {}
+        for chat_id, entries in pending.items():
+            if chat_id not in self.chat_ids or chat_id in self.blocked_chats:
+                continue
+            keys = [key for key, _ in entries]
+            packed = self.outgoing_updates([change for _, change in entries])
+            outgoing[chat_id] = [(text, change) for text, change, _ in packed]
+            covered_keys[chat_id] = [[keys[i] for i in indexes] for _, _, indexes in packed]
+
+        if not outgoing:
+            return {}
+
+        def acknowledge(chat_id, position, message_id):
+            keys = covered_keys[chat_id][position]
+            if message_id is not None:
+                outbox.mark_sent(keys, chat_id, message_id)
+            else:
+                outbox.mark_failed(keys, chat_id)
+
+        total = sum(len(messages) for messages in outgoing.values())
+        print(f"\n📨 Draining outbox: {total} message(s) to {len(outgoing)} chat(s)...")
+        results = await self.deliver_async(outgoing, on_result=acknowledge)
+        self._print_summary(results)
+        # Chats that blocked the bot during this drain
+        self._drop_undeliverable(outbox, outgoing)
+        return results
+
+    def _drop_undeliverable(self, outbox, chat_ids):
+        """Drop outbox deliveries to blocked chats and chats no longer configured"""
+        removed = [chat_id for chat_id in chat_ids if chat_id not in self.chat_ids]
+        blocked = [chat_id for chat_id in chat_ids if chat_id in self.blocked_chats]
+        if removed:
+            outbox.drop_pending(removed, "chat no longer configured")
+        if blocked:
+            outbox.drop_pending(blocked, "chat blocked the bot")
+
+    def send_message_with_retry(self, chat_id, text, parse_mode="HTML"):
+        """Synchronous wrapper around send_message_with_retry_async"""
+        return asyncio.run(self.send_message_with_retry_async(chat_id, text, parse_mode))
+
+    def send_message(self, text, parse_mode="HTML"):
+        """Synchronous wrapper around send_message_async"""
+        asyncio.run(self.send_message_async(text, parse_mode))
+
+    def send_tracking_updates(self, changes):
+        """Synchronous wrapper around send_tracking_updates_async"""
+        asyncio.run(self.send_tracking_updates_async(changes))
@@ -0,0 +1,48 @@
+"""
+Check that the browser session is saved, restored and expired.
+"""
+
+import asyncio
+import json
+import os
+import time
+
+from browser_session import PROFILE_MARKER, BrowserSession
+
+
+class FakeContext:
+    async def storage_state(self, path):
+        with open(path, "w") as f:
+            json.dump({"cookies": [{"name": "consent", "value": "1"}], "origins": []}, f)
+
+
+def test_state_is_saved_and_expires(tmp_path):
+    state_file = tmp_path / "browser" / "storage_state.json"
+    session = BrowserSession({"state_file": str(state_file), "max_age_hours": 1})
+    assert session.storage_state() is None
+
+    asyncio.run(session.save(FakeContext()))
+    assert session.storage_state() == str(state_file)
+
+    two_hours_ago = time.time() - 7200
+    os.utime(state_file, (two_hours_ago, two_hours_ago))
+    assert session.storage_state() is None
+    assert not state_file.exists()
+
+
+def test_profile_is_wiped_when_expired(tmp_path):
+    profile_dir = tmp_path / "profile"
+    session = BrowserSession({"profile_dir": str(profile_dir), "max_age_hours": 1})
+    cached = profile_dir / "Cache" / "data_0"
+
+    session.prepare_profile()
+    cached.parent.mkdir()
+    cached.write_text("cached")
+    asyncio.run(session.save(FakeContext()))
+    session.prepare_profile()
+    assert cached.exists()
+
+    two_hours_ago = time.time() - 7200
+    os.utime(profile_dir / PROFILE_MARKER, (two_hours_ago, two_hours_ago))
+    session.prepare_profile()
+    assert profile_dir.exists() and not cached.exists()
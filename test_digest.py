@@ -0,0 +1,113 @@
+"""
+Check that digest messages and split HTML chunks stay within Telegram's
+4096-character limit without breaking tags or entities, and that
+digest.min_changes switches between per-offer messages and a digest.
+"""
+
+import html
+import json
+import random
+import re
+from pathlib import Path
+
+import pytest
+
+from helpers import (
+    TELEGRAM_MESSAGE_LIMIT,
+    format_change,
+    normalize_offer_data,
+    pack_digest,
+    split_html,
+)
+from telegram_bot import TelegramBot
+
+SNAPSHOT = Path(__file__).parent / "data" / "current_data.json"
+TAG = re.compile(r"<(/?)(\w+)[^>]*>")
+ENTITY = re.compile(r"&(?:\w+|#\d+);")
+
+
+def load_offers():
+    with open(SNAPSHOT, encoding="utf-8") as f:
+        return normalize_offer_data(json.load(f))
+
+
+def random_html(rng, words):
+    """Telegram HTML with nested tags, entities and the odd very long word"""
+    parts = []
+    for _ in range(words):
+        word = rng.choice(["квартира", "метро", "залог", "x" * rng.randint(1, 90)])
+        word = rng.choice(["", "&amp;", "&lt;", "&#8381;"]) + word
+        tag = rng.choice([None, "b", "i", "code"])
+        if tag == "b" and rng.random() < 0.3:
+            word = f'<a href="https://example.com/{rng.randint(1, 99)}">{word}</a>'
+        parts.append(f"<{tag}>{word}</{tag}>" if tag else word)
+    return rng.choice([" ", "\n"]).join(parts)
+
+
+def check_chunk(chunk, limit):
+    assert 0 < len(chunk) <= limit
+    assert chunk.strip()
+    # Every & starts a whole entity and every < a whole, balanced tag
+    assert all(ENTITY.match(chunk, i) for i in range(len(chunk)) if chunk[i] == "&")
+    assert chunk.count("<") == chunk.count(">") == len(TAG.findall(chunk))
+    stack = []
+    for closing, name in TAG.findall(chunk):
+        if closing:
+            assert stack and stack.pop() == name
+        else:
+            stack.append(name)
+    assert stack == []
+
+
+def plain(text):
+    return html.unescape(re.sub(r"\s+", "", TAG.sub("", text)))
+
+
+@pytest.mark.parametrize("limit", [100, 300, 1000])
+def test_split_html_chunks_fit_and_stay_well_formed(limit):
+    rng = random.Random(limit)
+    for _ in range(200):
+        text = random_html(rng, rng.randint(1, 60))
+        chunks = split_html(text, limit)
+        for chunk in chunks:
+            check_chunk(chunk, limit)
+        assert plain("".join(chunks)) == plain(text)
+
+
+def test_digest_messages_fit_and_cover_every_change():
+    offers = load_offers()
+    changes = [{"current_offer": offer} for offer in offers[:30]]
+    changes += [
+        {"current_offer": dict(offer, price_numeric=1), "previous_offer": offer}
+        for offer in offers[30:40]
+    ]
+    changes += [{"previous_offer": offer} for offer in offers[40:]]
+    # One entry longer than a whole message
+    changes.append({"current_offer": dict(offers[0], description="слово " * 2000)})
+
+    packed = pack_digest(changes)
+    assert len(packed) > 1
+    for text, indexes in packed:
+        check_chunk(text, TELEGRAM_MESSAGE_LIMIT)
+        assert indexes
+    assert {index for _, indexes in packed for index in indexes} == set(range(len(changes)))
+
+
+@pytest.mark.parametrize("count, digest", [(5, False), (6, True)])
+def test_min_changes_switches_to_a_digest(tmp_path, count, digest):
+    bot = TelegramBot(
+        {
+            "token": "TEST",
+            "chat_ids": ["1"],
+            "message_log_file": str(tmp_path / "telegram_messages.jsonl"),
+            "blocked_chats_file": str(tmp_path / "blocked_chats.json"),
+            "digest": {"enabled": True, "min_changes": 5},
+        }
+    )
+    changes = [{"current_offer": offer} for offer in load_offers()[:count]]
+    updates = bot.format_updates(changes)
+    if digest:
+        assert len(updates) == 1
+        assert updates[0][1] == list(range(count))
+    else:
+        assert updates == [(format_change(change), [i]) for i, change in enumerate(changes)]
@@ -0,0 +1,129 @@
+"""
+Check that the changes announced page by page during a crawl are ones the
+end-of-crawl report makes too, and that possible duplicates and removals
+wait for the end.
+"""
+
+import json
+from pathlib import Path
+
+from helpers import (
+    EarlyChanges,
+    OfferNormalizer,
+    diff_offers,
+    normalize_offer_data,
+    report_changes,
+    track_changes,
+)
+from near_duplicates import NearDuplicateIndex
+from outbox import idempotency_key
+from parser import normalize_once
+
+SNAPSHOT = Path(__file__).parent / "data" / "current_data.json"
+
+
+def load_offers():
+    with open(SNAPSHOT, encoding="utf-8") as f:
+        return normalize_offer_data(json.load(f))
+
+
+def edited(offer, **fields):
+    offer = dict(offer, **fields)
+    return normalize_offer_data([offer])[0]
+
+
+def test_early_changes_are_reported_again_at_the_end():
+    offers = load_offers()
+    previous = offers[:-1]
+    fresh = edited(offers[0], offer_id="900000001", building_id="900", description="новая")
+    # The same flat as a still listed offer, under a new id
+    relisted = edited(previous[1], offer_id="900000002")
+    cheaper = edited(previous[2], price_numeric=previous[2]["price_numeric"] - 1000)
+    current = [fresh, relisted, cheaper] + previous[3:] + [offers[-1]]
+
+    early = EarlyChanges(previous)
+    pages = [current[i : i + 5] for i in range(0, len(current), 5)]
+    announced = [change for page in pages for change in early.page(page)]
+    final = track_changes(current, previous)
+
+    assert [idempotency_key(change) for change in announced] == [
+        f"900000001:new:{fresh['price_numeric']}",
+        f"{cheaper['offer_id']}:price:{cheaper['price_numeric']}",
+        f"{offers[-1]['offer_id']}:new:{offers[-1]['price_numeric']}",
+    ]
+    final_keys = {idempotency_key(change) for change in final}
+    assert {idempotency_key(change) for change in announced} <= final_keys
+    # previous[0] and previous[1] are gone: only the end reports them
+    assert f"{previous[0]['offer_id']}:removed:{previous[0]['price_numeric']}" in final_keys
+    assert not any("current_offer" not in change for change in announced)
+
+
+def test_possible_reposts_wait_for_the_end():
+    offers = load_offers()
+    index = NearDuplicateIndex({"file": ":memory:"})
+    for offer in offers:
+        index.add(offer)
+    seen = len(index)
+
+    original = max(offers, key=lambda offer: len(offer["description"]))
+    words = original["description"].split()
+    words[2] = "отличная"
+    # Same flat, 3% cheaper: a different duplicate_key, but a near-duplicate
+    repost = edited(
+        original,
+        offer_id="900000001",
+        description=" ".join(words),
+        price_numeric=int(original["price_numeric"] * 0.97),
+    )
+    twins = [
+        edited(offers[0], offer_id=offer_id, building_id="901", description="")
+        for offer_id in ("900000002", "900000003")
+    ]
+
+    early = EarlyChanges(offers, near_duplicates=index)
+    assert early.page([repost] + twins) == []
+    assert len(index) == seen
+
+
+def test_offers_without_an_id_are_skipped():
+    offers = load_offers()
+    nameless = [
+        edited(offers[0], offer_id=offer_id, building_id="900") for offer_id in (None, "")
+    ]
+
+    early = EarlyChanges(offers[1:])
+    assert early.page(nameless) == []
+    assert early.seen_ids == set()
+
+    normalized_offers = {}
+    page = [dict(offers[0], offer_id=None), offers[1]]
+    assert normalize_once(page, normalized_offers, OfferNormalizer()) == [
+        normalized_offers[offers[1]["offer_id"]]
+    ]
+    assert list(normalized_offers) == [offers[1]["offer_id"]]
+
+
+def test_repost_of_a_new_offer_from_an_earlier_page_waits():
+    offers = load_offers()
+    index = NearDuplicateIndex({"file": ":memory:", "action": "suppress"})
+
+    original = max(offers, key=lambda offer: len(offer["description"]))
+    first = edited(original, offer_id="900000001", building_id="900")
+    words = first["description"].split()
+    words[2] = "отличная"
+    repost = edited(
+        first,
+        offer_id="900000002",
+        description=" ".join(words),
+        price_numeric=int(first["price_numeric"] * 0.97),
+    )
+
+    early = EarlyChanges(offers, near_duplicates=index)
+    announced = early.page([first]) + early.page([repost])
+    assert [change["current_offer"]["offer_id"] for change in announced] == ["900000001"]
+
+    # The end of the crawl suppresses the repost as well
+    current = {offer["offer_id"]: offer for offer in [first, repost] + offers}
+    previous = {offer["offer_id"]: offer for offer in offers}
+    final = report_changes(*diff_offers(current, previous), current, previous, index)
+    assert [change["current_offer"]["offer_id"] for change in final] == ["900000001"]
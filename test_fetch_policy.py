@@ -0,0 +1,204 @@
+"""
+Check that page-load timeouts follow observed latencies, that the circuit
+breaker opens and recovers, and that a crawl failing part-way keeps the
+offers of the pages before the failure.
+"""
+
+import asyncio
+import re
+import time
+
+import pytest
+
+from fetch_policy import CircuitOpenError, FetchPolicy, IncompleteScrape
+from parser import PagePool, fetch_page, paginate_concurrently, paginate_sequentially
+
+BROWSER_CONFIG = {
+    "wait_until": "domcontentloaded",
+    "timeouts": {"wait_until": 15000, "wait_for_function": 10000},
+}
+SCRIPTS = {"wait_for_function": "() => true", "primary_script": "() => []"}
+
+
+class FakePage:
+    """Serves three offers per result page; pages in `failing` never load"""
+
+    def __init__(self, failing, loads):
+        self.failing = failing
+        self.loads = loads
+        self.page_num = None
+
+    async def goto(self, url, wait_until, timeout):
+        self.page_num = int(re.search(r"&p=(\d+)", url).group(1))
+        self.loads.append((self.page_num, timeout))
+        if self.page_num in self.failing:
+            raise TimeoutError(f"Timeout {timeout}ms exceeded")
+
+    async def wait_for_function(self, script, timeout):
+        pass
+
+    async def evaluate(self, script):
+        return [{"offer_id": f"{self.page_num}-{i}"} for i in range(3)]
+
+    async def close(self):
+        pass
+
+
+class FakeContext:
+    def __init__(self, failing):
+        self.failing = failing
+        self.loads = []
+
+    async def new_page(self):
+        return FakePage(self.failing, self.loads)
+
+
+def make_policy(**config):
+    return FetchPolicy(
+        dict({"backoff_base": 0.001, "max_attempts": 2}, **config), BROWSER_CONFIG["timeouts"]
+    )
+
+
+def test_timeouts_follow_latency():
+    policy = make_policy(min_samples=10, multiplier=3, min_timeout_ms=1000)
+    assert policy.timeout("goto") == 15000
+
+    for n in range(100):
+        policy.observe("goto", 0.5 + n / 100)
+    # p95 of 0.5s..1.49s is 1.44s
+    assert policy.timeout("goto") == 3 * 1440
+    assert policy.timeout("goto", attempt=1) == 2 * 3 * 1440
+    assert policy.timeout("goto", attempt=10) == policy.max_timeout
+    assert policy.timeout("wait_for_function") == 10000
+
+
+def test_backoff_is_jittered_and_capped():
+    policy = make_policy(backoff_base=1, backoff_max=5, seed=3)
+    delays = [policy.backoff(attempt) for attempt in range(8) for _ in range(50)]
+    assert all(0 <= delay <= 5 for delay in delays)
+    assert len(set(delays)) == len(delays)
+
+
+def test_circuit_breaker_opens_and_recovers():
+    policy = make_policy(failure_threshold=3, cooldown_seconds=0.05)
+    for _ in range(3):
+        policy.check()
+        policy.failed()
+    with pytest.raises(CircuitOpenError):
+        policy.check()
+
+    time.sleep(0.06)
+    policy.check()
+    # A failure while half-open reopens at once
+    policy.failed()
+    with pytest.raises(CircuitOpenError):
+        policy.check()
+
+    time.sleep(0.06)
+    policy.check()
+    policy.succeeded()
+    policy.failed()
+    policy.check()
+
+
+@pytest.mark.parametrize("concurrency", [1, 3])
+def test_failed_page_keeps_earlier_offers(concurrency):
+    context = FakeContext(failing={3})
+    pool = PagePool(context, concurrency, make_policy())
+
+    async def crawl():
+        if concurrency == 1:
+            return await paginate_sequentially(
+                pool, "https://x/?a=1", BROWSER_CONFIG, SCRIPTS, 10
+            )
+        return await paginate_concurrently(
+            pool, "https://x/?a=1", BROWSER_CONFIG, SCRIPTS, 10, concurrency
+        )
+
+    with pytest.raises(IncompleteScrape) as excinfo:
+        asyncio.run(crawl())
+    assert excinfo.value.page_num == 3
+    assert [offer["offer_id"] for offer in excinfo.value.offers] == [
+        f"{page}-{i}" for page in (1, 2) for i in range(3)
+    ]
+    # Page 3 was tried max_attempts times, the retry with a longer timeout
+    assert [timeout for page, timeout in context.loads if page == 3] == [15000, 30000]
+
+
+def test_first_page_failure_is_not_partial():
+    pool = PagePool(FakeContext(failing={1}), 1, make_policy())
+    with pytest.raises(TimeoutError):
+        asyncio.run(paginate_sequentially(pool, "https://x/?a=1", BROWSER_CONFIG, SCRIPTS, 10))
+
+
+def test_wait_timeouts_are_retried_by_fetch_page_only():
+    waits = []
+
+    class SlowPage(FakePage):
+        async def wait_for_function(self, script, timeout):
+            waits.append(timeout)
+            if len(waits) == 1:
+                raise TimeoutError(f"Timeout {timeout}ms exceeded")
+
+    class SlowContext(FakeContext):
+        async def new_page(self):
+            return SlowPage(self.failing, self.loads)
+
+    context = SlowContext(failing=set())
+    pool = PagePool(context, 1, make_policy(max_attempts=3))
+    offers = asyncio.run(fetch_page(pool, "https://x/?a=1&p=1", BROWSER_CONFIG, SCRIPTS))
+    assert len(offers) == 3
+    # One wait per page load, the retry with a doubled timeout
+    assert waits == [10000, 20000]
+    assert len(context.loads) == 2
+
+
+def test_dead_context_fails_instead_of_hanging():
+    class DeadContext:
+        async def new_page(self):
+            raise RuntimeError("Target closed")
+
+    pool = PagePool(DeadContext(), 2, make_policy(max_attempts=3))
+
+    async def fetch():
+        return await asyncio.wait_for(
+            fetch_page(pool, "https://x/?a=1&p=1", BROWSER_CONFIG, SCRIPTS), timeout=5
+        )
+
+    with pytest.raises(RuntimeError, match="Target closed"):
+        asyncio.run(fetch())
+    assert pool.opened == 0
+
+
+def test_failed_page_is_replaced_by_a_fresh_one():
+    class CrashingPage(FakePage):
+        closed = False
+
+        async def goto(self, url, wait_until, timeout):
+            if self.closed:
+                raise RuntimeError("Target page, context or browser has been closed")
+            await super().goto(url, wait_until, timeout)
+
+        async def close(self):
+            self.closed = True
+
+    class CrashingContext(FakeContext):
+        opened = []
+
+        async def new_page(self):
+            page = CrashingPage(self.failing, self.loads)
+            self.opened.append(page)
+            return page
+
+    context = CrashingContext(failing=set())
+    pool = PagePool(context, 1, make_policy(max_attempts=2))
+
+    async def crawl():
+        async with pool.page() as page:
+            # The first page crashes while in use
+            await page.close()
+        return await fetch_page(pool, "https://x/?a=1&p=1", BROWSER_CONFIG, SCRIPTS)
+
+    assert len(asyncio.run(crawl())) == 3
+    assert len(context.opened) == 2
+    assert pool.pages == [context.opened[1]]
@@ -0,0 +1,90 @@
+"""
+Check that the JSONL message log rotates into chronologically named
+segments at its size cutoff, and that the old JSON array log is migrated
+only by a write, without losing or repeating entries.
+"""
+
+import json
+import os
+import re
+
+from message_log import MessageLog
+
+
+def entry(n):
+    return {"timestamp": "2026-01-01T00:00:00", "chat_id": "1", "text": f"message {n:03}"}
+
+
+def test_rotates_at_size_cutoff(tmp_path):
+    path = str(tmp_path / "telegram_messages.jsonl")
+    line_size = len(json.dumps(entry(0), ensure_ascii=False)) + 1
+    log = MessageLog(path, max_bytes=3 * line_size, max_age_days=None, fsync="never")
+    for n in range(10):
+        log.append(entry(n))
+
+    segments = log.segments()
+    assert segments[-1] == path
+    closed = segments[:-1]
+    assert len(closed) == 3
+    for segment in closed:
+        assert re.fullmatch(
+            r"telegram_messages\.\d{8}T\d{12}\.jsonl", os.path.basename(segment)
+        )
+        # A segment is closed by the first append that finds it at the cutoff
+        assert os.path.getsize(segment) == 3 * line_size
+    assert closed == sorted(closed)
+    assert [message["text"] for message in log.iter_messages()] == [
+        f"message {n:03}" for n in range(10)
+    ]
+
+
+def test_torn_last_line_is_skipped(tmp_path):
+    path = tmp_path / "telegram_messages.jsonl"
+    log = MessageLog(str(path), fsync="never")
+    log.append(entry(1))
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"timestamp": "2026-')
+    assert [message["text"] for message in log.iter_messages()] == ["message 001"]
+
+
+def test_legacy_log_is_migrated_by_the_first_write(tmp_path):
+    legacy = tmp_path / "telegram_messages.json"
+    legacy.write_text(json.dumps([entry(n) for n in range(3)]), encoding="utf-8")
+    path = str(tmp_path / "telegram_messages.jsonl")
+
+    # Reading shows the legacy entries but leaves the files alone
+    log = MessageLog(path, fsync="never", legacy_path=str(legacy))
+    assert len(list(log.iter_messages())) == 3
+    assert legacy.exists() and log.segments() == []
+
+    log.append(entry(3))
+    assert not legacy.exists()
+    segments = log.segments()
+    assert os.path.basename(segments[0]) == "telegram_messages.19700101T000000000000.jsonl"
+    assert [message["text"] for message in log.iter_messages()] == [
+        f"message {n:03}" for n in range(4)
+    ]
+
+
+def test_interrupted_migration_is_not_repeated(tmp_path):
+    legacy = tmp_path / "telegram_messages.json"
+    legacy.write_text(json.dumps([entry(n) for n in range(3)]), encoding="utf-8")
+    path = str(tmp_path / "telegram_messages.jsonl")
+    log = MessageLog(path, fsync="never", legacy_path=str(legacy))
+    log.migrate_legacy()
+
+    # The run died after writing the segment, before deleting the old file
+    legacy.write_text(json.dumps([entry(n) for n in range(3)]), encoding="utf-8")
+    log = MessageLog(path, fsync="never", legacy_path=str(legacy))
+    assert len(list(log.iter_messages())) == 3
+    assert log.migrate_legacy() == 0
+    assert not legacy.exists()
+    assert len(list(log.iter_messages())) == 3
+
+
+def test_unreadable_legacy_log_is_left_in_place(tmp_path):
+    legacy = tmp_path / "telegram_messages.json"
+    legacy.write_text("[{", encoding="utf-8")
+    log = MessageLog(str(tmp_path / "telegram_messages.jsonl"), legacy_path=str(legacy))
+    assert log.migrate_legacy() == 0
+    assert legacy.exists()
@@ -0,0 +1,65 @@
+"""
+Check the run metrics layer: nothing is collected while disabled, and a run
+produces one JSONL line and a Prometheus textfile.
+"""
+
+import json
+
+from metrics import RunMetrics
+
+
+def test_disabled_metrics_collect_nothing(tmp_path):
+    metrics = RunMetrics()
+    metrics.start_run({"enabled": False, "file": str(tmp_path / "run_metrics.jsonl")})
+
+    with metrics.stage("page.goto"):
+        pass
+    metrics.count("pages_fetched")
+    metrics.observe("telegram_send", 0.2)
+    metrics.finish_run("ok")
+
+    assert metrics.stages == {} and metrics.counters == {} and metrics.histograms == {}
+    assert not (tmp_path / "run_metrics.jsonl").exists()
+
+
+def test_run_is_written_as_jsonl_and_textfile(tmp_path):
+    metrics = RunMetrics()
+    config = {
+        "enabled": True,
+        "file": str(tmp_path / "run_metrics.jsonl"),
+        "prometheus_file": str(tmp_path / "listing_monitor.prom"),
+    }
+    for status in ("ok", "failed"):
+        metrics.start_run(config)
+        for _ in range(3):
+            with metrics.stage("page.goto"):
+                pass
+        metrics.count("offers_scraped", 28)
+        metrics.observe("telegram_send", 0.07)
+        metrics.observe("telegram_send", 30)
+        metrics.finish_run(status)
+
+    lines = [json.loads(line) for line in open(config["file"], encoding="utf-8")]
+    assert [line["status"] for line in lines] == ["ok", "failed"]
+    assert lines[0]["stages"]["page.goto"]["calls"] == 3
+    assert lines[0]["counters"] == {"offers_scraped": 28}
+    histogram = lines[0]["histograms"]["telegram_send"]
+    assert histogram["count"] == 2 and histogram["buckets"][1] == 1
+    assert histogram["buckets"][-1] == 1
+
+    textfile = open(config["prometheus_file"], encoding="utf-8").read()
+    assert "listing_monitor_last_run_success 0" in textfile
+    assert 'listing_monitor_stage_calls{stage="page.goto"} 3' in textfile
+    assert 'listing_monitor_telegram_send_seconds_bucket{le="+Inf"} 2' in textfile
+
+
+def test_file_keeps_the_last_max_runs_lines(tmp_path):
+    metrics = RunMetrics()
+    config = {"enabled": True, "file": str(tmp_path / "run_metrics.jsonl"), "max_runs": 2}
+    for status in ("ok", "failed", "ok"):
+        metrics.start_run(config)
+        metrics.finish_run(status)
+
+    lines = [json.loads(line) for line in open(config["file"], encoding="utf-8")]
+    assert [line["status"] for line in lines] == ["failed", "ok"]
+    assert not (tmp_path / "run_metrics.jsonl.tmp").exists()
@@ -0,0 +1,94 @@
+"""
+Check that reposts with an edited description are found through MinHash/LSH
+and tagged or suppressed by filter_duplicate_changes.
+"""
+
+import json
+from pathlib import Path
+
+from helpers import filter_duplicate_changes, format_change, normalize_offer_data
+from near_duplicates import NearDuplicateIndex
+
+SNAPSHOT = Path(__file__).parent / "data" / "current_data.json"
+
+
+def load_offers():
+    with open(SNAPSHOT, encoding="utf-8") as f:
+        return normalize_offer_data(json.load(f))
+
+
+def longest(offers):
+    return max(offers, key=lambda offer: len(offer["description"]))
+
+
+def repost(offer, offer_id="900000001"):
+    """The same flat under a new id, two words edited and 3% cheaper"""
+    words = offer["description"].split()
+    words[2], words[-3] = "отличная", "срочно"
+    return dict(
+        offer,
+        offer_id=offer_id,
+        description=" ".join(words),
+        price_numeric=int(offer["price_numeric"] * 0.97),
+    )
+
+
+def test_finds_reposts_only():
+    offers = load_offers()
+    index = NearDuplicateIndex({"file": ":memory:"})
+    for offer in offers:
+        index.add(offer)
+    assert all(index.find(offer) is None for offer in offers)
+
+    original = longest(offers)
+    reposted = repost(original)
+    index.add(reposted)
+    original_id, similarity = index.find(reposted)
+    assert original_id == original["offer_id"] and similarity >= index.threshold
+
+    # Same text, but a different flat
+    other_rooms = dict(reposted, offer_id="900000002", rooms=reposted["rooms"] + 1)
+    too_expensive = dict(reposted, offer_id="900000003", price_numeric=reposted["price_numeric"] * 2)
+    for offer in (other_rooms, too_expensive):
+        index.add(offer)
+        assert index.find(offer) is None
+
+
+def test_tag_and_suppress():
+    offers = load_offers()
+    original = longest(offers)
+    reposted = repost(original)
+    current = {offer["offer_id"]: offer for offer in offers if offer is not original}
+    current[reposted["offer_id"]] = reposted
+    new_changes = [{"current_offer": reposted}]
+    removed_changes = [{"previous_offer": original}]
+
+    index = NearDuplicateIndex({"file": ":memory:"})
+    new, removed = filter_duplicate_changes(new_changes, removed_changes, current, {}, index)
+    assert new == [dict(new_changes[0], repost_of=original["offer_id"])]
+    assert removed == removed_changes
+    assert f"/rent/flat/{original['offer_id']}/" in format_change(new[0])
+
+    index = NearDuplicateIndex({"file": ":memory:", "action": "suppress"})
+    assert filter_duplicate_changes(new_changes, removed_changes, current, {}, index) == ([], [])
+
+
+def test_window_persists_and_rolls(tmp_path):
+    offers = load_offers()
+    config = {"file": str(tmp_path / "near_duplicates.sqlite"), "window": 10}
+    index = NearDuplicateIndex(config)
+    for offer in offers:
+        index.add(offer)
+    index.save()
+    index.close()
+
+    index = NearDuplicateIndex(config)
+    assert len(index) == 10
+    recent, old = repost(offers[-1], "900000001"), repost(offers[0], "900000002")
+    index.add(recent)
+    index.add(old)
+    assert index.find(recent)[0] == offers[-1]["offer_id"]
+    assert index.find(old) is None
+    index.close()
+
+    assert len(NearDuplicateIndex(dict(config, num_perm=32))) == 0
@@ -0,0 +1,71 @@
+"""
+Check that the network extraction engine produces the same offers as the
+DOM engine (primary_script) for a saved search results page.
+"""
+
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+import yaml
+
+from network_extraction import offers_from_html, offers_from_payload, STATE_MARKER
+
+FIXTURES = Path(__file__).parent / "fixtures"
+SAVED_PAGE = FIXTURES / "serp_page.html"
+DOM_OFFERS = FIXTURES / "serp_page_dom_offers.json"
+
+
+def load_saved_page():
+    return SAVED_PAGE.read_text(encoding="utf-8")
+
+
+def load_dom_offers():
+    with open(DOM_OFFERS, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_embedded_state_matches_dom_offers():
+    assert offers_from_html(load_saved_page()) == load_dom_offers()
+
+
+def test_api_payload_matches_dom_offers():
+    html = load_saved_page()
+    start = html.index(".concat(", html.index(STATE_MARKER)) + len(".concat(")
+    items, _ = json.JSONDecoder().raw_decode(html, start)
+    raw_offers = next(i for i in items if i["key"] == "initialState")["value"][
+        "results"
+    ]["offers"]
+
+    payload = {"data": {"offersSerialized": raw_offers}}
+    assert offers_from_payload(payload) == load_dom_offers()
+
+
+def test_page_without_state_returns_none():
+    assert offers_from_html("<html><body>no listings here</body></html>") is None
+    assert offers_from_payload({"data": {}}) is None
+
+
+def test_dom_engine_on_saved_page():
+    """Run primary_script itself on the saved page (needs a Chromium install)"""
+    async_api = pytest.importorskip("playwright.async_api")
+    with open(Path(__file__).parent / "configs" / "config_scripts.yaml") as f:
+        scripts = yaml.safe_load(f)
+
+    async def run_primary_script():
+        async with async_api.async_playwright() as p:
+            try:
+                browser = await p.chromium.launch()
+            except Exception as e:
+                pytest.skip(f"Chromium not available: {e}")
+            try:
+                page = await browser.new_page()
+                await page.set_content(load_saved_page())
+                return await page.evaluate(scripts["primary_script"])
+            finally:
+                await browser.close()
+
+    dom_offers = asyncio.run(run_primary_script())
+    assert dom_offers == load_dom_offers()
+    assert offers_from_html(load_saved_page()) == dom_offers
@@ -0,0 +1,59 @@
+"""
+Check that OfferNormalizer matches the per-offer helpers and parses area.
+"""
+
+import json
+from datetime import datetime
+from pathlib import Path
+
+from helpers import (
+    OfferNormalizer,
+    content_hash,
+    extract_area,
+    extract_floor_and_rooms,
+    parse_russian_date,
+)
+
+SNAPSHOT = Path(__file__).parent / "data" / "current_data.json"
+NOW = datetime(2025, 10, 3, 15, 0)
+
+
+def load_snapshot():
+    with open(SNAPSHOT, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_matches_per_offer_helpers():
+    offers = load_snapshot()
+    expected = []
+    for offer in load_snapshot():
+        offer["time_label_parsed"] = parse_russian_date(offer["time_label"], NOW)
+        offer.update(extract_floor_and_rooms(offer["title"]))
+        expected.append(offer)
+
+    normalized = OfferNormalizer(now=NOW).normalize(offers)
+    for offer, before in zip(normalized, expected):
+        area = offer.pop("area", None)
+        assert offer.pop("content_hash") == content_hash(before)
+        assert offer == before
+        assert area == extract_area(before["title"])
+
+
+def test_relative_labels_use_run_time():
+    normalizer = OfferNormalizer(now=NOW)
+    assert normalizer.parse_date("сегодня, 12:39") == "2025-10-03 12:39:00"
+    assert normalizer.parse_date("вчера, 23:05") == "2025-10-02 23:05:00"
+    assert normalizer.parse_date("1 окт, 09:15") == "2025-10-01 09:15:00"
+
+
+def test_area_and_memoized_titles():
+    normalizer = OfferNormalizer(now=NOW)
+    title = "1-комн. квартира, 18,2 м², 5/9 этаж"
+    offers = [{"offer_id": "1", "title": title}, {"offer_id": "2", "title": title}]
+
+    normalizer.normalize(offers)
+    assert offers[0]["area"] == 18.2 and offers[0]["rooms"] == 1
+    assert offers[1]["floor"] == 5 and offers[1]["total_floors"] == 9
+    assert normalizer.parse_title(title) is normalizer.parse_title(title)
+    assert extract_area("Студия, 25 м², 2/5 этаж") == 25.0
+    assert extract_area("Комната в квартире") is None
@@ -0,0 +1,62 @@
+"""
+Check that Offer is a loss-free, dict-compatible stand-in for offer dicts.
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from helpers import format_offer, track_changes
+from offer import Offer, json_default, offer_hook
+
+SNAPSHOT = Path(__file__).parent / "data" / "current_data.json"
+
+
+def load_snapshot(**kwargs):
+    with open(SNAPSHOT, encoding="utf-8") as f:
+        return json.load(f, **kwargs)
+
+
+def test_round_trip_is_loss_free():
+    dicts = load_snapshot()
+    offers = load_snapshot(object_hook=offer_hook)
+
+    assert all(isinstance(offer, Offer) for offer in offers)
+    assert [offer.to_dict() for offer in offers] == dicts
+    # Same keys in the same order, so snapshot files do not churn
+    assert json.dumps(offers, ensure_ascii=False, default=json_default) == json.dumps(
+        dicts, ensure_ascii=False
+    )
+
+
+def test_behaves_like_the_dict():
+    raw = load_snapshot()[0]
+    offer = Offer.from_dict(raw)
+
+    assert offer["price"] == raw["price"] and offer.get("area") is None
+    assert "rooms" in offer and "area" not in offer
+    assert dict(offer) == raw and offer == raw
+    assert format_offer(offer) == format_offer(raw)
+
+    offer["area"] = 35.0
+    assert offer.to_dict() == dict(raw, area=35.0)
+    del offer["rooms"]
+    with pytest.raises(KeyError):
+        offer["rooms"]
+
+
+def test_repeated_strings_are_shared():
+    offers = load_snapshot(object_hook=offer_hook)
+    same_district = [offer for offer in offers if offer["sub_district_id"] == "21"]
+    assert len(same_district) > 1
+    assert all(o["sub_district"] is same_district[0]["sub_district"] for o in same_district)
+
+
+def test_track_changes_accepts_offers():
+    dicts = load_snapshot()
+    offers = load_snapshot(object_hook=offer_hook)
+    current_dicts = [dict(offer, price_numeric=1) for offer in dicts[:3]] + dicts[4:]
+    current_offers = [Offer.from_dict(offer) for offer in current_dicts]
+
+    assert track_changes(current_offers, offers) == track_changes(current_dicts, dicts)
@@ -0,0 +1,111 @@
+"""
+Check that the SQLite offer store diffs a scan like diff_offers does, that
+applying a diff round-trips, and that it keeps each offer's price history.
+"""
+
+import json
+from pathlib import Path
+
+from helpers import diff_offers, normalize_offer_data
+from offer_store import OfferStore
+
+SNAPSHOT = Path(__file__).parent / "data" / "current_data.json"
+
+
+def load_offers():
+    with open(SNAPSHOT, encoding="utf-8") as f:
+        return normalize_offer_data(json.load(f))
+
+
+def edited(offer, **fields):
+    offer = dict(offer, **fields)
+    return normalize_offer_data([offer])[0]
+
+
+def scan(previous):
+    """A later scan: one offer gone, one cheaper, one with new terms, one new"""
+    return [
+        edited(previous[1], price_numeric=previous[1]["price_numeric"] - 5000),
+        edited(previous[2], deposit="без залога"),
+        *previous[3:],
+        edited(previous[0], offer_id="900000001", building_id="900"),
+    ]
+
+
+def ids(changes, key):
+    return [change[key]["offer_id"] for change in changes]
+
+
+def test_diff_matches_diff_offers(tmp_path):
+    previous = load_offers()
+    current = scan(previous)
+    store = OfferStore(str(tmp_path / "offers.sqlite"))
+    store.import_snapshot(previous)
+
+    new, updated, removed = store.diff(current)
+    expected = diff_offers(
+        {offer["offer_id"]: offer for offer in current},
+        {offer["offer_id"]: offer for offer in previous},
+    )
+    assert ids(new, "current_offer") == ids(expected[0], "current_offer")
+    assert ids(updated, "current_offer") == ids(expected[1], "current_offer")
+    assert [change.get("changed_fields") for change in updated] == [
+        change.get("changed_fields") for change in expected[1]
+    ]
+    assert ids(removed, "previous_offer") == ids(expected[2], "previous_offer")
+    assert ids(new, "current_offer") == ["900000001"]
+    assert ids(removed, "previous_offer") == [previous[0]["offer_id"]]
+
+    # The temp table of one scan does not leak into the next diff
+    assert store.diff(previous) == ([], [], [])
+    store.close()
+
+
+def test_apply_round_trips(tmp_path):
+    previous = load_offers()
+    current = scan(previous)
+    path = str(tmp_path / "offers.sqlite")
+    store = OfferStore(path)
+    store.import_snapshot(previous)
+
+    store.apply(*store.diff(current))
+    assert store.diff(current) == ([], [], [])
+    store.close()
+
+    # Reopened, the active offers are the scan, with all their fields
+    store = OfferStore(path)
+    active = {offer["offer_id"]: offer for offer in store.active_offers()}
+    assert active == {offer["offer_id"]: offer for offer in current}
+
+    # Updated offers keep their indexed columns in step with the data
+    moved = edited(current[0], building_id="901", price_numeric=current[0]["price_numeric"] - 1000)
+    store.apply(*store.diff([moved] + current[1:]))
+    assert store.conn.execute(
+        "SELECT building_id FROM offers WHERE offer_id = ?", (moved["offer_id"],)
+    ).fetchone() == ("901",)
+
+    # A removed offer listed again is new once more
+    new, _, _ = store.diff(current + [previous[0]])
+    assert ids(new, "current_offer") == [previous[0]["offer_id"]]
+    store.close()
+
+
+def test_price_observations(tmp_path):
+    previous = load_offers()
+    store = OfferStore(str(tmp_path / "offers.sqlite"))
+    store.import_snapshot(previous)
+    current = scan(previous)
+    store.apply(*store.diff(current))
+
+    cheaper, terms = current[0], current[1]
+    assert [price for _, price in store.price_history(cheaper["offer_id"])] == [
+        previous[1]["price_numeric"],
+        cheaper["price_numeric"],
+    ]
+    # A terms change is not a price observation
+    assert [price for _, price in store.price_history(terms["offer_id"])] == [
+        terms["price_numeric"]
+    ]
+    assert len(store.price_history("900000001")) == 1
+    assert store.price_history("unknown") == []
+    store.close()
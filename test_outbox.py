@@ -0,0 +1,143 @@
+"""
+Check the outbox's idempotent enqueue, retries and drain, its 24h
+retention, and that deliveries to blocked or removed chats are dropped;
+also that Telegram's flood control holds back every chat of a drain.
+"""
+
+import asyncio
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from bench.telegram_stub import TelegramStub
+from helpers import normalize_offer_data
+from outbox import Outbox
+from telegram_bot import TelegramBot
+
+SNAPSHOT = Path(__file__).parent / "data" / "current_data.json"
+
+
+def load_offers():
+    with open(SNAPSHOT, encoding="utf-8") as f:
+        return normalize_offer_data(json.load(f))
+
+
+def make_bot(stub, tmp_path, chat_ids, **config):
+    defaults = {
+        "token": "TEST",
+        "chat_ids": chat_ids,
+        "api_url": stub.api_url,
+        "per_chat_rate": 100,
+        "max_retries": 1,
+        "retry_delay": 0,
+        "message_log_file": str(tmp_path / "telegram_messages.jsonl"),
+        "message_log_fsync": "never",
+        "blocked_chats_file": str(tmp_path / "blocked_chats.json"),
+    }
+    return TelegramBot(dict(defaults, **config))
+
+
+def statuses(outbox):
+    return dict(
+        outbox.conn.execute("SELECT chat_id || ':' || key, status FROM deliveries").fetchall()
+    )
+
+
+def test_enqueue_is_idempotent(tmp_path):
+    offers = load_offers()
+    outbox = Outbox(str(tmp_path / "outbox.sqlite"))
+    changes = [{"current_offer": offer} for offer in offers[:3]]
+
+    assert outbox.enqueue(changes, [["1", "2"]] * 3) == 3
+    # Re-detected on the next run, and once more with a new chat
+    assert outbox.enqueue(changes, [["1", "2"]] * 3) == 0
+    assert outbox.enqueue(changes[:1], [["1", "3"]]) == 0
+    pending = outbox.pending()
+    assert {chat_id: len(entries) for chat_id, entries in pending.items()} == {
+        "1": 3,
+        "2": 3,
+        "3": 1,
+    }
+    # A price change of the same offer is a different message
+    cheaper = dict(offers[0], price_numeric=1)
+    assert outbox.enqueue([{"current_offer": cheaper, "previous_offer": offers[0]}], [["1"]]) == 1
+    # Nothing to queue without recipients
+    assert outbox.enqueue([{"previous_offer": offers[5]}], [[]]) == 0
+    outbox.close()
+
+
+def test_failed_deliveries_are_retried_then_given_up(tmp_path):
+    offer = load_offers()[0]
+    outbox = Outbox(str(tmp_path / "outbox.sqlite"), max_attempts=2)
+    outbox.enqueue([{"current_offer": offer}], [["1"]])
+    (key, _), = outbox.pending()["1"]
+
+    outbox.mark_failed([key], "1", "timeout")
+    assert list(outbox.pending()) == ["1"]
+    outbox.mark_failed([key], "1", "timeout")
+    assert outbox.pending() == {}
+    assert statuses(outbox) == {f"1:{key}": "failed"}
+    outbox.close()
+
+
+def test_drain_sends_pending_once(tmp_path):
+    offers = load_offers()
+    outbox = Outbox(str(tmp_path / "outbox.sqlite"))
+    outbox.enqueue([{"current_offer": offer} for offer in offers[:2]], [["1"], ["1", "2"]])
+    with TelegramStub() as stub:
+        bot = make_bot(stub, tmp_path, ["1", "2"])
+        results = asyncio.run(bot.drain_outbox_async(outbox))
+        assert {chat_id: len(sent) for chat_id, sent in results.items()} == {"1": 2, "2": 1}
+        assert stub.delivered == 3
+        assert outbox.pending() == {}
+        assert asyncio.run(bot.drain_outbox_async(outbox)) == {}
+        assert stub.delivered == 3
+    outbox.close()
+
+
+def test_finished_messages_are_pruned_after_retention(tmp_path):
+    offers = load_offers()
+    outbox = Outbox(str(tmp_path / "outbox.sqlite"), retention_hours=24)
+    outbox.enqueue([{"current_offer": offer} for offer in offers[:2]], [["1"], ["1"]])
+    (sent_key, _), (pending_key, _) = outbox.pending()["1"]
+    outbox.mark_sent([sent_key], "1", 7)
+    old = (datetime.now() - timedelta(hours=25)).isoformat()
+    outbox.conn.execute("UPDATE messages SET created_at = ?", (old,))
+    outbox.conn.commit()
+
+    # The sent message is forgotten and can be queued again; the pending one stays
+    assert outbox.enqueue([{"current_offer": offers[0]}], [["1"]]) == 1
+    assert outbox.enqueue([{"current_offer": offers[1]}], [["1"]]) == 0
+    assert statuses(outbox) == {f"1:{sent_key}": "pending", f"1:{pending_key}": "pending"}
+    outbox.close()
+
+
+def test_blocked_and_removed_chats_are_dropped(tmp_path):
+    offers = load_offers()
+    outbox = Outbox(str(tmp_path / "outbox.sqlite"))
+    outbox.enqueue([{"current_offer": offer} for offer in offers[:2]], [["1", "2", "3"]] * 2)
+    with TelegramStub() as stub:
+        stub.blocked.add("2")
+        # Chat 3 was removed from the config
+        bot = make_bot(stub, tmp_path, ["1", "2"])
+        asyncio.run(bot.drain_outbox_async(outbox))
+
+        assert "2" in bot.blocked_chats
+        assert outbox.pending() == {}
+        assert sorted(statuses(outbox).values()) == ["dropped"] * 4 + ["sent"] * 2
+        assert stub.sent_to.count("2") <= 1
+    outbox.close()
+
+
+def test_flood_control_pauses_every_chat(tmp_path):
+    chat_ids = [str(n) for n in range(1, 7)]
+    with TelegramStub(flood_every=12, retry_after=1) as stub:
+        bot = make_bot(stub, tmp_path, chat_ids, global_rate=10, max_retries=3)
+        outgoing = {chat_id: [(f"message {n}", None) for n in range(4)] for chat_id in chat_ids}
+        results = asyncio.run(bot.deliver_async(outgoing))
+        assert all(None not in sent for sent in results.values())
+
+        # Apart from requests already in flight, no chat sends anything
+        # while the first retry_after runs
+        flooded_at = stub.flooded_at[0]
+        assert not [t for t in stub.received_at if flooded_at + 0.1 < t < flooded_at + 0.9]
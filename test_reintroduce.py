@@ -0,0 +1,91 @@
+"""
+Check that a broadcast reaches every chat once, resumes from its
+checkpoint and remembers chats that blocked the bot.
+"""
+
+import asyncio
+import json
+
+from bench.telegram_stub import TelegramStub
+from blocked_chats import BlockedChats
+from reintroduce import Checkpoint, broadcast
+from telegram_bot import TelegramBot
+
+CHATS = [str(1000 + i) for i in range(60)]
+BLOCKED = {"1007", "1042"}
+
+
+def run_broadcast(stub, tmp_path, text="👋"):
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.jsonl"), text)
+    blocked = BlockedChats(str(tmp_path / "blocked_chats.json"))
+    pending = [cid for cid in CHATS if not checkpoint.done(cid) and cid not in blocked]
+    results = asyncio.run(
+        broadcast(
+            f"{stub.api_url}/botTEST",
+            pending,
+            text,
+            checkpoint,
+            blocked,
+            rate=500,
+            max_concurrency=8,
+        )
+    )
+    return results, blocked
+
+
+def test_broadcast_resumes_and_records_blocked_chats(tmp_path):
+    with TelegramStub(flood_every=15, retry_after=0.05, blocked=BLOCKED) as stub:
+        results, blocked = run_broadcast(stub, tmp_path)
+        assert {cid for cid, _ in results["blocked"]} == BLOCKED
+        assert not results["error"]
+        assert stub.flooded > 0
+        # Each chat got the message exactly once despite the 429s
+        assert sorted(stub.sent_to) == sorted(set(CHATS) - BLOCKED)
+        assert set(blocked.chats) == BLOCKED
+
+        received = stub.received
+        results, _ = run_broadcast(stub, tmp_path)
+        assert stub.received == received
+        assert not any(results.values())
+
+        # A different message goes out again
+        results, _ = run_broadcast(stub, tmp_path, text="🔁")
+        assert len(results["ok"]) == len(CHATS) - len(BLOCKED)
+
+
+def test_torn_checkpoint_line_is_ignored(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    checkpoint = Checkpoint(str(path), "👋")
+    checkpoint.record("1", "ok", "message_id=1")
+    checkpoint.record("2", "error", "HTTP 400")
+    with open(path, "a") as f:
+        f.write(json.dumps({"message": checkpoint.message, "chat_id": "3"})[:20])
+
+    checkpoint = Checkpoint(str(path), "👋")
+    assert checkpoint.done("1")
+    assert not checkpoint.done("2")
+    assert not checkpoint.done("3")
+
+
+def test_bot_stops_sending_to_blocked_chats(tmp_path):
+    with TelegramStub(blocked={"1"}) as stub:
+        bot = TelegramBot(
+            {
+                "token": "TEST",
+                "chat_ids": ["1", "2"],
+                "api_url": stub.api_url,
+                "message_log_file": str(tmp_path / "telegram_messages.jsonl"),
+                "message_log_fsync": "never",
+                "blocked_chats_file": str(tmp_path / "blocked_chats.json"),
+            }
+        )
+
+        async def send_twice():
+            for _ in range(2):
+                for chat_id in bot.chat_ids:
+                    await bot.send_message_with_retry_async(chat_id, "hi")
+
+        asyncio.run(send_twice())
+        # One 403 for chat 1, then no further requests to it
+        assert stub.received == 3
+        assert "1" in BlockedChats(str(tmp_path / "blocked_chats.json"))
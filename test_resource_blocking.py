@@ -0,0 +1,68 @@
+"""
+Check which requests the resource blocker aborts: allow patterns win over
+both deny lists, then resource types and tracker URL patterns apply.
+"""
+
+from pathlib import Path
+
+import pytest
+import yaml
+
+from resource_blocking import ResourceBlocker
+
+CONFIG = Path(__file__).parent / "configs" / "config_browser.yaml"
+SITE = "https://www.example.ru"
+
+
+def load_blocker(**overrides):
+    with open(CONFIG, encoding="utf-8") as f:
+        config = yaml.safe_load(f)["blocking"]
+    return ResourceBlocker(dict(config, **overrides))
+
+
+@pytest.mark.parametrize(
+    "resource_type, url, blocked",
+    [
+        # The listing itself and its scripts load
+        ("document", f"{SITE}/cat.php?deal_type=rent&p=2", False),
+        ("script", f"{SITE}/static/app.js", False),
+        ("xhr", f"{SITE}/search-offers/v2/search-offers-desktop/", False),
+        # Blocked resource types, wherever they come from
+        ("image", f"{SITE}/photos/1.jpg", True),
+        ("font", "https://fonts.example.com/roboto.woff2", True),
+        ("stylesheet", f"{SITE}/static/app.css", True),
+        ("media", f"{SITE}/video/tour.mp4", True),
+        # Trackers, whatever their resource type
+        ("script", "https://mc.yandex.ru/metrika/tag.js", True),
+        ("xhr", "https://www.google-analytics.com/g/collect?v=2", True),
+        ("script", "https://www.googletagmanager.com/gtm.js?id=GTM-1", True),
+        ("ping", "https://top-fwz1.mail.ru/counter?id=1", True),
+        ("image", "https://vk.com/rtrg?p=VK-RTRG-1", True),
+    ],
+)
+def test_shipped_block_lists(resource_type, url, blocked):
+    assert load_blocker().should_block(resource_type, url) is blocked
+
+
+@pytest.mark.parametrize(
+    "resource_type, url, blocked",
+    [
+        # Allow patterns override the resource type...
+        ("image", f"{SITE}/captcha/challenge.png", False),
+        ("stylesheet", f"{SITE}/captcha/widget.css", False),
+        # ...and the tracker patterns
+        ("script", "https://mc.yandex.ru/metrika/tag.js", False),
+        # Requests the allow list does not match are still blocked
+        ("image", f"{SITE}/photos/1.jpg", True),
+        ("script", "https://www.google-analytics.com/analytics.js", True),
+    ],
+)
+def test_allow_patterns_win(resource_type, url, blocked):
+    blocker = load_blocker(allow_url_patterns=["*/captcha/*", "*mc.yandex.ru/metrika/*"])
+    assert blocker.should_block(resource_type, url) is blocked
+
+
+def test_empty_config_blocks_nothing():
+    blocker = ResourceBlocker({})
+    assert not blocker.should_block("image", f"{SITE}/photos/1.jpg")
+    assert not blocker.should_block("script", "https://mc.yandex.ru/metrika/tag.js")
@@ -0,0 +1,107 @@
+"""
+Replay synthetic arrival traces through the adaptive scan policy: it
+should poll busy hours as before, skip most quiet ones and never leave
+more than max_interval between runs.
+"""
+
+import random
+
+from scan_policy import WEEK_HOURS, ScanPolicy, hour_of_week
+
+MONDAY = 1704067200  # 2024-01-01 00:00 UTC
+WEEK = WEEK_HOURS * 3600
+TICK = 300  # The workflow's cron period
+
+
+def arrival_rate(hour):
+    """New offers per hour: busy weekday daytime, quiet nights"""
+    day, hour = divmod(hour, 24)
+    if 0 <= hour < 5:
+        return 0.05
+    if 7 <= hour < 17 and day < 5:
+        return 12
+    return 2
+
+
+def make_trace(weeks, seed):
+    rng = random.Random(seed)
+    arrivals = []
+    for hour in range(weeks * WEEK_HOURS):
+        t = MONDAY + hour * 3600 + rng.expovariate(arrival_rate(hour % WEEK_HOURS)) * 3600
+        while t < MONDAY + (hour + 1) * 3600:
+            arrivals.append(t)
+            t += rng.expovariate(arrival_rate(hour % WEEK_HOURS)) * 3600
+    return arrivals
+
+
+def replay(policy, arrivals, weeks):
+    """Poll every TICK; returns (run timestamps, detection delays per arrival)"""
+    runs = []
+    delays = []
+    unseen = 0
+    for t in range(MONDAY, MONDAY + weeks * WEEK, TICK):
+        mode = policy.next_mode(now=t)
+        if mode == "skip":
+            continue
+        seen = unseen
+        while seen < len(arrivals) and arrivals[seen] <= t:
+            seen += 1
+        delays.extend((t - arrival, arrival) for arrival in arrivals[unseen:seen])
+        policy.record(mode, seen - unseen)
+        unseen = seen
+        runs.append(t)
+    return runs, delays
+
+
+def test_hour_of_week():
+    assert hour_of_week(MONDAY) == 0
+    assert hour_of_week(MONDAY + 3 * 86400 + 13 * 3600 + 59) == 3 * 24 + 13
+    assert hour_of_week(MONDAY - 1) == WEEK_HOURS - 1
+
+
+def test_replay_skips_quiet_hours(tmp_path):
+    weeks = 4
+    policy = ScanPolicy(
+        {
+            "mode": "adaptive",
+            "state_file": str(tmp_path / "scan_state.json"),
+            "min_interval_minutes": 4,
+            "max_interval_minutes": 60,
+            "min_expected_new": 0.5,
+        }
+    )
+    runs, delays = replay(policy, make_trace(weeks, seed=7), weeks)
+
+    last_week = [t for t in runs if t >= MONDAY + (weeks - 1) * WEEK]
+    ticks_per_week = WEEK // TICK
+    assert len(last_week) < 0.6 * ticks_per_week
+
+    gaps = [later - earlier for earlier, later in zip(runs, runs[1:])]
+    assert max(gaps) <= 60 * 60
+
+    def hours_runs(first, last):
+        return [t for t in last_week if first <= (t - MONDAY) // 3600 % 24 < last]
+
+    # A busy weekday morning is polled on every tick, a night about hourly
+    busy = [t for t in hours_runs(8, 16) if hour_of_week(t) < 5 * 24]
+    assert len(busy) >= 0.9 * 5 * 8 * 12
+    assert len(hours_runs(0, 5)) <= 7 * 5 * 2
+
+    busy_delays = [
+        delay
+        for delay, arrival in delays
+        if arrival >= MONDAY + (weeks - 1) * WEEK and 8 <= hour_of_week(arrival) % 24 < 16
+    ]
+    busy_delays.sort()
+    assert busy_delays[len(busy_delays) // 2] <= TICK
+
+
+def test_tiered_mode_never_skips(tmp_path):
+    policy = ScanPolicy(
+        {"mode": "tiered", "full_every": 3, "state_file": str(tmp_path / "scan_state.json")}
+    )
+    modes = []
+    for n in range(6):
+        modes.append(policy.next_mode(now=MONDAY + n * 60))
+        policy.record(modes[-1], 0)
+    assert modes == ["full", "head", "head", "full", "head", "head"]
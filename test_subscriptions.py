@@ -0,0 +1,76 @@
+"""
+Check that the indexed subscription matcher picks exactly the chats the
+plain per-subscriber predicate would, and how changes are routed.
+"""
+
+import random
+
+from subscriptions import SubscriptionIndex, compile_filter, matches_filter
+
+
+def random_offer(rng, offer_id):
+    return {
+        "offer_id": str(offer_id),
+        "price_numeric": rng.choice([None, rng.randrange(30_000, 200_000, 500)]),
+        "rooms": rng.choice([None, 0, 1, 2, 3, 4]),
+        "floor": rng.choice([None, 1, 2, 5, 9, 17]),
+        "metro_id": rng.choice([None, "46", "100", "112", "236"]),
+        "sub_district_id": rng.choice([None, "13", "21", "22", "113"]),
+        "commission": rng.choice([None, "без комиссии", "комиссия 50%"]),
+    }
+
+
+def random_filter(rng):
+    subscription = {}
+    if rng.random() < 0.8:
+        subscription["max_price"] = rng.randrange(40_000, 180_000, 2_500)
+    if rng.random() < 0.5:
+        subscription["rooms"] = rng.sample([0, 1, 2, 3, 4], rng.randint(1, 3))
+    if rng.random() < 0.3:
+        subscription["min_floor"] = rng.choice([2, 3])
+    if rng.random() < 0.2:
+        subscription["max_floor"] = rng.choice([9, 12])
+    if rng.random() < 0.5:
+        subscription["metro_ids"] = rng.sample([46, 100, 112, 236], rng.randint(1, 2))
+    if rng.random() < 0.5:
+        subscription["sub_district_ids"] = rng.sample([13, 21, 22, 113], rng.randint(1, 2))
+    if rng.random() < 0.3:
+        subscription["exclude_commission"] = True
+    return subscription
+
+
+def test_index_matches_linear_scan():
+    rng = random.Random(13)
+    chat_ids = [str(1000 + i) for i in range(300)]
+    subscriptions = {chat_id: random_filter(rng) for chat_id in chat_ids[:250]}
+    index = SubscriptionIndex(chat_ids, subscriptions)
+
+    for offer_id in range(2000):
+        offer = random_offer(rng, offer_id)
+        expected = {
+            chat_id
+            for chat_id in chat_ids
+            if matches_filter(offer, compile_filter(subscriptions.get(chat_id, {})))
+        }
+        assert index.match(offer) == expected
+
+
+def test_price_bucket_edges():
+    index = SubscriptionIndex(["1", "2"], {"1": {"max_price": 85_000}}, price_bucket=5_000)
+    assert index.match({"price_numeric": 85_000}) == {"1", "2"}
+    assert index.match({"price_numeric": 85_001}) == {"2"}
+    assert index.match({"price_numeric": 84_999}) == {"1", "2"}
+
+
+def test_recipients_follow_previous_offer():
+    index = SubscriptionIndex(["1", "2"], {"1": {"max_price": 80_000}})
+    cheap = {"offer_id": "a", "price_numeric": 75_000}
+    expensive = {"offer_id": "a", "price_numeric": 95_000}
+
+    assert index.recipients({"current_offer": expensive}) == ["2"]
+    # A subscriber who saw the offer hears that it went up or disappeared
+    assert index.recipients({"current_offer": expensive, "previous_offer": cheap}) == [
+        "1",
+        "2",
+    ]
+    assert index.recipients({"previous_offer": cheap}, ["2", "1"]) == ["2", "1"]
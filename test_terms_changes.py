@@ -0,0 +1,106 @@
+"""
+Check that changed deposit/commission/description terms are detected through
+content hashes, by diff_offers and the sqlite store alike, and rendered.
+"""
+
+import json
+from pathlib import Path
+
+from helpers import (
+    OfferNormalizer,
+    change_type,
+    diff_offers,
+    format_change,
+    format_digest,
+    normalize_offer_data,
+    track_changes,
+)
+from offer_store import OfferStore
+from outbox import idempotency_key
+
+SNAPSHOT = Path(__file__).parent / "data" / "current_data.json"
+
+
+def load_offers():
+    with open(SNAPSHOT, encoding="utf-8") as f:
+        return normalize_offer_data(json.load(f))
+
+
+def edited(offer, **fields):
+    offer = dict(offer, **fields)
+    return normalize_offer_data([offer])[0]
+
+
+def test_terms_change_is_detected_and_rendered():
+    previous = load_offers()
+    current = [edited(previous[0], deposit="залог 100 000 ₽")] + previous[1:]
+
+    changes = track_changes(current, previous)
+    assert len(changes) == 1
+    change = changes[0]
+    assert change_type(change) == "terms"
+    assert change["changed_fields"] == ["deposit"]
+
+    text = format_change(change)
+    assert "ИЗМЕНЕНИЕ УСЛОВИЙ" in text and "<b>залог 100 000 ₽</b>" in text
+    assert "ИЗМЕНЕНИЯ УСЛОВИЙ</b> (1)" in format_digest(changes)[0]
+    assert idempotency_key(change) == (
+        f"{current[0]['offer_id']}:terms:{current[0]['content_hash']}"
+    )
+
+
+def test_price_change_lists_changed_terms():
+    previous = load_offers()
+    current = [
+        edited(previous[0], price_numeric=1, commission="без комиссии", description="x" * 500)
+    ] + previous[1:]
+
+    (change,) = track_changes(current, previous)
+    assert change_type(change) == "price"
+    assert change["changed_fields"] == ["commission", "description"]
+    assert "Описание: изменено" in format_change(change)
+
+
+def test_untracked_or_unhashed_offers_are_not_reported():
+    previous = load_offers()
+    current = [edited(previous[0], title=previous[0]["title"] + " ")] + previous[1:]
+    assert track_changes(current, previous) == []
+
+    # A snapshot saved before content hashes: updated silently, not notified
+    unhashed = [dict(offer) for offer in previous]
+    for offer in unhashed:
+        del offer["content_hash"]
+    current_offers = {offer["offer_id"]: offer for offer in previous}
+    _, updated, _ = diff_offers(
+        current_offers, {offer["offer_id"]: offer for offer in unhashed}
+    )
+    assert len(updated) == len(previous)
+    assert all(change["changed_fields"] == [] for change in updated)
+    assert track_changes(previous, unhashed) == []
+
+
+def test_store_diffs_content_hashes(tmp_path):
+    previous = load_offers()
+    store = OfferStore(str(tmp_path / "offers.sqlite"))
+    store.import_snapshot(previous)
+
+    current = [edited(previous[0], utilities="комм. платежи не включены")] + previous[1:]
+    new, updated, removed = store.diff(current)
+    assert (new, removed) == ([], [])
+    assert [change["changed_fields"] for change in updated] == [["utilities"]]
+
+    store.apply(new, updated, removed)
+    assert store.diff(current) == ([], [], [])
+    assert len(store.price_history(current[0]["offer_id"])) == 1
+    store.close()
+
+
+def test_tracked_fields_are_configurable():
+    tracked_fields = ("commission",)
+    previous = OfferNormalizer(tracked_fields=tracked_fields).normalize(load_offers())
+    current = OfferNormalizer(tracked_fields=tracked_fields).normalize(
+        [dict(previous[0], deposit="другой залог", commission="без комиссии")]
+    )
+
+    (change,) = track_changes(current + previous[1:], previous, tracked_fields)
+    assert change["changed_fields"] == ["commission"]
@@ -0,0 +1,79 @@
+"""
+Check that price changes and removals edit or answer the offer's earlier
+message, and fall back to a new message when that one is gone.
+"""
+
+import asyncio
+
+from bench.telegram_stub import TelegramStub
+from telegram_bot import TelegramBot
+
+OFFER = {
+    "offer_id": "101",
+    "price": "70 000 ₽/мес.",
+    "price_numeric": 70000,
+    "time_label": "сегодня, 12:30",
+    "sub_district": "Хамовники",
+    "metro": "Спортивная",
+    "price_info": "залог 70 000 ₽",
+}
+CHEAPER = dict(OFFER, price="65 000 ₽/мес.", price_numeric=65000)
+CHEAPEST = dict(OFFER, price="60 000 ₽/мес.", price_numeric=60000)
+
+
+def make_bot(stub, tmp_path, update_mode):
+    return TelegramBot(
+        {
+            "token": "TEST",
+            "chat_ids": ["1"],
+            "api_url": stub.api_url,
+            "per_chat_rate": 100,
+            "message_log_file": str(tmp_path / "telegram_messages.jsonl"),
+            "message_log_fsync": "never",
+            "blocked_chats_file": str(tmp_path / "blocked_chats.json"),
+            "update_mode": update_mode,
+            "message_index_file": str(tmp_path / "message_index.sqlite"),
+        }
+    )
+
+
+def test_price_change_edits_the_original_message(tmp_path):
+    with TelegramStub() as stub:
+        bot = make_bot(stub, tmp_path, "edit")
+        asyncio.run(bot.send_tracking_updates_async([{"current_offer": OFFER}]))
+        asyncio.run(
+            bot.send_tracking_updates_async(
+                [{"current_offer": CHEAPER, "previous_offer": OFFER}]
+            )
+        )
+        assert stub.delivered == 1
+        assert stub.edited == 1
+        assert "65 000" in stub.messages[1]["text"]
+
+        # The user deleted the message: the next change is sent anew
+        del stub.messages[1]
+        asyncio.run(
+            bot.send_tracking_updates_async(
+                [{"current_offer": CHEAPEST, "previous_offer": CHEAPER}]
+            )
+        )
+        assert stub.delivered == 2
+        assert bot.message_index.get("101", "1") == 2
+
+        # ... and later ones edit that new message
+        asyncio.run(bot.send_tracking_updates_async([{"previous_offer": CHEAPEST}]))
+        assert stub.delivered == 2
+        assert stub.edited == 2
+
+
+def test_removal_replies_to_the_original_message(tmp_path):
+    with TelegramStub() as stub:
+        bot = make_bot(stub, tmp_path, "reply")
+        asyncio.run(bot.send_tracking_updates_async([{"current_offer": OFFER}]))
+        asyncio.run(bot.send_tracking_updates_async([{"previous_offer": OFFER}]))
+        assert stub.delivered == 2
+        assert stub.messages[2]["reply_to"] == 1
+
+        # The index survives a restart
+        bot = make_bot(stub, tmp_path, "reply")
+        assert bot.message_index.get("101", "1") == 2